@@ -0,0 +1,92 @@
+"""Compares formatting connection services with a per row and a shared subnet index.
+
+Usage:
+    python benchmarks/connection_services.py [connections] [endpoints] [services per endpoint]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syntropycli.records import compact
+from syntropycli.utils import collect_connection_services, service_subnet_index
+
+SUBNETS_PER_SERVICE = 2
+
+
+def agent(id, services):
+    return {
+        "agent_id": id,
+        "agent_services": [
+            {
+                "agent_service_name": f"service-{index}",
+                "agent_service_subnets": [
+                    {
+                        "agent_service_subnet_id": (id * services + index)
+                        * SUBNETS_PER_SERVICE
+                        + subnet
+                    }
+                    for subnet in range(SUBNETS_PER_SERVICE)
+                ],
+            }
+            for index in range(services)
+        ],
+    }
+
+
+def connections_services(count, endpoints, services):
+    rng = random.Random(42)
+    result = []
+    for id in range(count):
+        agents = [agent(rng.randrange(endpoints), services) for _ in range(2)]
+        result.append(
+            {
+                "agent_connection_group_id": id,
+                "agent_1": agents[0],
+                "agent_2": agents[1],
+                "agent_connection_subnets": [
+                    {
+                        "agent_service_subnet_id": subnet["agent_service_subnet_id"],
+                        "agent_connection_subnet_is_enabled": True,
+                        "agent_connection_subnet_status": "OK",
+                    }
+                    for agent in agents
+                    for service in agent["agent_services"]
+                    for subnet in service["agent_service_subnets"]
+                ],
+            }
+        )
+    return compact(result)
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    endpoints = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    services = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    data = connections_services(count, endpoints, services)
+    print(f"{count} connections, {endpoints} endpoints, {services} services each")
+    per_row, before = measure(
+        "per row", lambda: [collect_connection_services(row) for row in data]
+    )
+
+    def shared():
+        index = service_subnet_index(data)
+        return [collect_connection_services(row, subnet_index=index) for row in data]
+
+    indexed, after = measure("shared index", shared)
+    assert per_row == indexed
+    print(f"speedup        {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
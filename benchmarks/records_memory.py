@@ -0,0 +1,81 @@
+"""Compares peak RSS of keeping a connection listing as dicts and as compact records.
+
+Every variant runs in a separate process, so peak RSS is not shared between them.
+
+Usage:
+    python benchmarks/records_memory.py [number of connections]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGE_SIZE = 100
+PROVIDERS = ["AWS", "GCP", "Azure", "DigitalOcean", "Hetzner"]
+CITIES = ["Vilnius", "Frankfurt", "London", "New York", "Singapore"]
+
+
+def agent(id):
+    return {
+        "agent_id": id,
+        "agent_name": f"endpoint-{id}",
+        "agent_public_ipv4": f"10.{id >> 16 & 255}.{id >> 8 & 255}.{id & 255}",
+        "agent_provider": {
+            "agent_provider_id": id % len(PROVIDERS),
+            "agent_provider_name": PROVIDERS[id % len(PROVIDERS)],
+        },
+        "agent_location_city": CITIES[id % len(CITIES)],
+        "agent_status": "CONNECTED",
+        "agent_tags": [{"agent_tag_id": 1, "agent_tag_name": "production"}],
+    }
+
+
+def page(skip, count):
+    return json.dumps(
+        {
+            "data": [
+                {
+                    "agent_connection_group_id": id,
+                    "agent_connection_group_status": "CONNECTED",
+                    "agent_connection_group_updated_at": "2022-05-01T10:00:00.000Z",
+                    "agent_connection_latency_ms": 12.5,
+                    "agent_connection_packet_loss": 0.0,
+                    "agent_1": agent(id),
+                    "agent_2": agent(id + 1),
+                }
+                for id in range(skip, skip + count)
+            ]
+        }
+    ).encode()
+
+
+def run(variant, count):
+    from syntropycli.records import compact
+
+    convert = compact if variant == "compact" else (lambda data: data)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connections = []
+    for skip in range(0, count, PAGE_SIZE):
+        connections += convert(json.loads(page(skip, PAGE_SIZE))["data"])
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{variant}: {len(connections)} connections, peak RSS +{(peak - before) / 1024:.1f} MiB"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for variant in ("dict", "compact"):
+        subprocess.run(
+            [sys.executable, __file__, "--run", variant, str(count)], check=True
+        )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,59 @@
+"""Measures comparing two large snapshots with `diff_snapshots`.
+
+Usage:
+    python benchmarks/snapshot_diff.py [number of records] [changed percent]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syntropycli.snapshots import diff_snapshots, load_snapshot
+
+PROVIDERS = ["AWS", "GCP", "Azure"]
+
+
+def endpoint(id, rng, changed):
+    return {
+        "agent_id": id,
+        "agent_name": f"endpoint-{id}",
+        "agent_public_ipv4": f"10.{id >> 16 & 255}.{id >> 8 & 255}.{id & 255}",
+        "agent_provider": {
+            "agent_provider_id": id % len(PROVIDERS),
+            "agent_provider_name": PROVIDERS[(id + changed) % len(PROVIDERS)],
+        },
+        "agent_location_city": "Vilnius",
+        "agent_is_online": True,
+        "agent_modified_at": f"2022-01-01T00:00:{rng.randrange(60):02d}",
+        "agent_tags": [{"agent_tag_id": 1, "agent_tag_name": "production"}],
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    percent = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(42)
+    old = [endpoint(id, rng, 0) for id in range(count)]
+    new = [endpoint(id, rng, rng.random() * 100 < percent) for id in range(count)]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for name, records in (("old.json", old), ("new.json", new)):
+            paths.append(os.path.join(directory, name))
+            with open(paths[-1], "w") as f:
+                json.dump(records, f, indent=4)
+        start = time.perf_counter()
+        snapshots = [load_snapshot(path) for path in paths]
+        loaded = time.perf_counter()
+        changes = diff_snapshots(*snapshots)
+        done = time.perf_counter()
+    print(f"{count} records, {len(changes)} changed")
+    print(f"load  {loaded - start:8.3f}s")
+    print(f"diff  {done - loaded:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
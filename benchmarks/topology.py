@@ -0,0 +1,61 @@
+"""Measures building and analysing the connection graph of a large network.
+
+Usage:
+    python benchmarks/topology.py [number of endpoints] [number of connections]
+"""
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syntropycli.records import compact
+from syntropycli.topology import Graph
+
+
+def connections(endpoints, count):
+    rng = random.Random(42)
+    agents = [
+        {"agent_id": id, "agent_name": f"endpoint-{id}"} for id in range(endpoints)
+    ]
+    return (
+        compact(agents),
+        compact(
+            [
+                {
+                    "agent_connection_group_id": index,
+                    "agent_1": agents[rng.randrange(endpoints)],
+                    "agent_2": agents[rng.randrange(endpoints)],
+                    "agent_connection_group_status": "CONNECTED",
+                }
+                for index in range(count)
+            ]
+        ),
+    )
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<22} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    endpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    agents, data = connections(endpoints, count)
+    print(f"{endpoints} endpoints, {count} connections")
+    graph = measure("build", lambda: Graph.from_connections(data, agents))
+    measure("components", graph.components)
+    measure("degrees", graph.degrees)
+    measure("isolated", graph.isolated)
+    measure("articulation points", graph.articulation_points)
+    measure("dot", lambda: graph.write_dot(io.StringIO()))
+    measure("graphml", lambda: graph.write_graphml(io.StringIO()))
+
+
+if __name__ == "__main__":
+    main()
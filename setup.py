@@ -36,8 +36,9 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=requirements,
+    extras_require={"fast": ["orjson"], "arrow": ["pyarrow"], "yaml": ["PyYAML"]},
     packages=find_packages(exclude=["tests*"]),
-    entry_points={"console_scripts": ["syntropyctl = syntropycli.__main__:main"]},
+    entry_points={"console_scripts": ["syntropyctl = syntropycli.completion:main"]},
     python_requires=">=3.6",
     include_package_data=True,
     zip_safe=False,
@@ -1,18 +1,45 @@
 #!/usr/bin/env python
+import functools
+import time
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 import click
 import syntropy_sdk as sdk
 from syntropy_sdk import models
 
+from syntropycli import completion, export
 from syntropycli.decorators import *
+from syntropycli.health import aggregate_health, health_report
+from syntropycli.progress import *
+from syntropycli.snapshots import VOLATILE_FIELDS, diff_snapshots, load_snapshot
+from syntropycli.state import *
+from syntropycli.topology import Graph
 from syntropycli.utils import *
+from syntropycli.where import WHERE, has_criteria, matches_nothing
 
 
 @click.group()
-def apis():
+@click.option(
+    "--timings",
+    is_flag=True,
+    default=False,
+    help="Print timings of API client setup and requests to stderr.",
+)
+@click.pass_context
+def apis(ctx, timings):
     """Syntropy Networks Command Line Interface."""
+    if timings:
+        start_timings()
+        ctx.call_on_close(report_timings)
+
+
+def _is_complete(items, skip, take):
+    """Checks if an unfiltered listing returned all existing items.
+
+    Listings of a single profile are never complete, as the completion index is shared by all profiles.
+    """
+    return current_profile() is None and not skip and (not take or len(items) < take)
 
 
 @apis.command()
@@ -25,13 +52,18 @@ def apis():
     default=False,
     help="Outputs a JSON instead of a table.",
 )
+@with_profiles
 @syntropy_api
 def get_providers(skip, take, json, api):
     """Retrieve a list of endpoint providers."""
     api = sdk.AgentsApi(api)
-    providers = WithPagination(api.v1_network_agents_providers_get)(
+    providers = WithPagination(raw_records(api.v1_network_agents_providers_get))(
         skip=skip, take=take, _preload_content=False
     )["data"]
+    completion.refresh_index(
+        providers=[provider["agent_provider_name"] for provider in providers],
+        replace=_is_complete(providers, skip, take),
+    )
     fields = [
         ("ID", "agent_provider_id"),
         ("Name", "agent_provider_name"),
@@ -49,6 +81,7 @@ def get_providers(skip, take, json, api):
     default=False,
     help="Outputs a JSON instead of a table.",
 )
+@with_profiles
 @syntropy_api
 def get_api_keys(skip, take, json, api):
     """List all API keys.
@@ -59,9 +92,13 @@ def get_api_keys(skip, take, json, api):
     """
 
     api = sdk.AuthApi(api)
-    keys = WithPagination(api.v1_network_auth_api_keys_get)(
+    keys = WithPagination(raw_records(api.v1_network_auth_api_keys_get))(
         skip=skip, take=take, _preload_content=False
     )["data"]
+    completion.refresh_index(
+        api_keys=[key["api_key_name"] for key in keys],
+        replace=_is_complete(keys, skip, take),
+    )
 
     fields = [
         ("ID", "api_key_id", lambda x: int(x)),
@@ -107,7 +144,9 @@ def confirm_deletion(name, id):
 
 
 @apis.command()
-@click.option("--name", default=None, type=str)
+@click.option(
+    "--name", default=None, type=str, shell_complete=completion.complete_api_keys
+)
 @click.option("--id", default=None, type=int)
 @click.option(
     "--yes",
@@ -126,9 +165,9 @@ def delete_api_key(name, id, yes, api):
     api = sdk.AuthApi(api)
 
     if id is None:
-        keys = WithPagination(api.v1_network_auth_api_keys_get)(_preload_content=False)[
-            "data"
-        ]
+        keys = WithPagination(raw_records(api.v1_network_auth_api_keys_get))(
+            _preload_content=False
+        )["data"]
         for key in keys:
             if key["api_key_name"] != name:
                 continue
@@ -144,45 +183,357 @@ def delete_api_key(name, id, yes, api):
         click.secho(f"Deleted API key: id={id}.", fg="green")
 
 
-def _get_endpoints(
-    name, id, tag, skip, take, show_services, online, offline, json, api
+def _duration_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+
+
+def _report_orphan_keys(auth_api, known, names):
+    """Lists keys again and reports keys with the names that were created without receiving
+    their secret, e.g. if the response of a create request was lost."""
+    keys = WithPagination(raw_records(auth_api.v1_network_auth_api_keys_get))(
+        _preload_content=False
+    )["data"]
+    for key in keys:
+        if key["api_key_id"] not in known and key["api_key_name"] in names:
+            click.secho(
+                f"API key {key['api_key_name']} (id={key['api_key_id']}) was created, but its "
+                f"secret was not received. Delete it with "
+                f"`syntropyctl delete-api-key --id {key['api_key_id']}`.",
+                err=True,
+                fg="yellow",
+            )
+
+
+def _expires_before(key, deadline):
+    try:
+        return parse_timestamp(key["api_key_valid_until"]) < deadline
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+@apis.command()
+@click.option(
+    "--expires-before",
+    type=click.DateTime(formats=["%Y-%m-%d", "%Y-%m-%d %H:%M:%S"]),
+    default=(datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S"),
+    help="Rotate keys that expire before the date. Defaults to a week from now.",
+)
+@click.option(
+    "--name",
+    default=None,
+    type=str,
+    help="Rotate only keys having the name.",
+    shell_complete=completion.complete_api_keys,
+)
+@click.option(
+    "--valid-for",
+    default="30d",
+    callback=_duration_option,
+    help="Validity of the new keys, e.g. 30d, 12w.",
+)
+@click.option(
+    "--output",
+    "-o",
+    required=True,
+    type=click.Path(dir_okay=False),
+    help="File the new secrets are written to. It must not exist.",
+)
+@click.option(
+    "--delete-old",
+    is_flag=True,
+    default=False,
+    help="Delete the old keys once their replacements are created.",
+)
+@click.option(
+    "--grace",
+    default=None,
+    callback=_duration_option,
+    help="Time to wait before deleting the old keys, e.g. 10m, 1h.",
+)
+@click.option(
+    "--yes",
+    "-y",
+    is_flag=True,
+    default=False,
+    help="Do not ask for confirmation when deleting the old keys.",
+)
+@click.option(
+    "--concurrency",
+    default=DEFAULT_CONCURRENCY,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight.",
+)
+@syntropy_api
+def rotate_api_keys(
+    expires_before,
+    name,
+    valid_for,
+    output,
+    delete_old,
+    grace,
+    yes,
+    concurrency,
+    api,
 ):
-    if not name and not id and not tag and not online and not offline:
-        agents = WithPagination(sdk.AgentsApi(api).v1_network_agents_get)(
-            skip=skip,
-            take=take,
-            _preload_content=False,
-        )["data"]
-    else:
-        filters = models.V1AgentFilter()
-        if name:
-            filters.agent_name = name
-        elif id:
-            filters.agent_id = [id]
-        if tag:
-            filters.agent_tag_name = [tag]
-
-        if online:
-            filters.agent_status = [models.AgentFilterAgentStatus.CONNECTED]
-        elif offline:
-            filters.agent_status = [
-                models.AgentFilterAgentStatus.DISCONNECTED,
-                models.AgentFilterAgentStatus.CONNECTED_WITH_ERRORS,
-            ]
+    """Replace API keys that are about to expire.
 
-        agents = (
-            sdk.AgentsApi(api)
-            .v1_network_agents_search(
-                models.V1NetworkAgentsSearchRequest(
-                    filter=filters,
-                    skip=skip,
-                    take=take,
-                ),
-                # _preload_content=False,
+    Keys are listed once and a replacement with the same name and description is created for every
+    key that expires before --expires-before. The new secrets are written to --output as JSON lines,
+    together with the ID of the key they replace, as soon as they are created. The file is readable
+    by the owner only.
+
+    With --delete-old, the replaced keys are deleted after --grace, so that endpoint agents can be
+    switched to the new keys in the meantime. Keys whose replacement could not be created are kept.
+
+    Create requests are not retried after a timeout, as the key may have been created already. If a
+    create request fails, keys are listed again to report keys that were created without receiving
+    their secret.
+    """
+    auth_api = sdk.AuthApi(api)
+    keys = WithPagination(raw_records(auth_api.v1_network_auth_api_keys_get))(
+        _preload_content=False
+    )["data"]
+    deadline = expires_before.astimezone()
+    selected = [
+        key
+        for key in keys
+        if (name is None or key["api_key_name"] == name)
+        and _expires_before(key, deadline)
+    ]
+    if not selected:
+        click.secho(f"No API keys expire before {expires_before}.", fg="yellow")
+        return
+    if (
+        delete_old
+        and not yes
+        and not click.confirm(
+            f"Do you want to rotate {len(selected)} API keys and delete the old ones?"
+        )
+    ):
+        raise SystemExit(1)
+
+    try:
+        secrets = open_private(output)
+    except OSError as err:
+        click.secho(f"Cannot create {output}: {err.strerror}.", err=True, fg="red")
+        raise SystemExit(1)
+
+    valid_until = datetime.now() + valid_for
+    progress = Progress("Creating API keys", total=len(selected), unit="keys")
+    create = progress.wrap(auth_api.v1_network_auth_api_keys_create, lambda *_: 1)
+
+    def replace(key):
+        return attempt(
+            create,
+            body=models.V1NetworkAuthApiKeysCreateRequest(
+                api_key_name=key["api_key_name"],
+                api_key_valid_until=valid_until,
+                api_key_description=key.get("api_key_description"),
+            ),
+        )
+
+    rotated = []
+    failed = []
+    known = {key["api_key_id"] for key in keys}
+    failures = 0
+    with secrets:
+        for key, (result, err) in run_bounded(replace, selected, concurrency):
+            if err is not None:
+                failures += 1
+                failed.append(key)
+                click.secho(
+                    f"Failed to replace API key {key['api_key_name']} (id={key['api_key_id']}): "
+                    f"{describe_error(err)}",
+                    err=True,
+                    fg="red",
+                )
+                continue
+            write_ndjson(
+                secrets,
+                {
+                    "api_key_id": result.data.api_key_id,
+                    "api_key_name": result.data.api_key_name,
+                    "api_key_secret": result.data.api_key_secret,
+                    "api_key_valid_until": valid_until.isoformat(),
+                    "replaces": key["api_key_id"],
+                },
+            )
+            known.add(result.data.api_key_id)
+            rotated.append(key)
+    progress.close()
+    click.secho(
+        f"Created {len(rotated)} API keys, secrets were written to {output}.",
+        fg="red" if failures else "green",
+    )
+    if failed:
+        _report_orphan_keys(auth_api, known, {key["api_key_name"] for key in failed})
+
+    if delete_old and rotated:
+        if grace:
+            click.secho(
+                f"Waiting {format_duration(grace.total_seconds())} before deleting the old keys.",
+                err=True,
+            )
+            time.sleep(grace.total_seconds())
+        progress = Progress("Deleting API keys", total=len(rotated), unit="keys")
+        delete = progress.wrap(auth_api.v1_network_auth_api_keys_delete, lambda *_: 1)
+        deleted = 0
+        for key, (_, err) in run_bounded(
+            lambda key: attempt(delete, int(key["api_key_id"])), rotated, concurrency
+        ):
+            if err is not None:
+                failures += 1
+                click.secho(
+                    f"Failed to delete API key {key['api_key_name']} (id={key['api_key_id']}): "
+                    f"{describe_error(err)}",
+                    err=True,
+                    fg="red",
+                )
+            else:
+                deleted += 1
+        progress.close()
+        click.secho(
+            f"Deleted {deleted} old API keys.",
+            fg="red" if deleted < len(rotated) else "green",
+        )
+    if failures:
+        raise SystemExit(2)
+
+
+def _output_plan(
+    changes,
+    path,
+    stats,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    concurrency=DEFAULT_CONCURRENCY,
+):
+    plan = make_plan(changes, chunk_size, concurrency, stats.latency)
+    with click.open_file(path, "w") as f:
+        save_plan(plan, f)
+    click.secho(
+        f"Plan: {plan['requests']} update calls for {plan['endpoints']} endpoints, "
+        f"{plan['subnets']} service subnets touched, "
+        f"{len(changes['create'])} connections to create, "
+        f"{len(changes['delete'])} connections to delete. "
+        f"Estimated wall time: {plan['estimated_seconds']}s.",
+        err=path == "-",
+    )
+
+
+def _agent_filter(
+    name=None, id=None, tags=None, provider_ids=None, online=False, offline=False
+):
+    """Builds an agent search filter. Different criteria are combined with AND."""
+    filters = models.V1AgentFilter()
+    if name:
+        filters.agent_name = name
+    elif id:
+        filters.agent_id = [id]
+    if tags:
+        filters.agent_tag_name = list(tags)
+    if provider_ids:
+        filters.agent_provider_id = list(provider_ids)
+
+    if online:
+        filters.agent_status = [models.AgentFilterAgentStatus.CONNECTED]
+    elif offline:
+        filters.agent_status = [
+            models.AgentFilterAgentStatus.DISCONNECTED,
+            models.AgentFilterAgentStatus.CONNECTED_WITH_ERRORS,
+        ]
+    return filters
+
+
+def _get_provider_ids(api, names):
+    providers = WithPagination(
+        raw_records(sdk.AgentsApi(api).v1_network_agents_providers_get)
+    )(_preload_content=False)["data"]
+    index = index_by_name(providers, "agent_provider")
+    missing = [name for name in names if index.get(name) is None]
+    if missing:
+        click.secho(
+            f"Could not find providers: {', '.join(missing)}", err=True, fg="red"
+        )
+        raise SystemExit(1)
+    return [index[name] for name in names]
+
+
+def _get_endpoints(
+    name, id, tag, skip, take, show_services, online, offline, json, api, where=None
+):
+    if where is not None:
+        filters = where.agent_filter(
+            _agent_filter(
+                name=name, id=id, tags=tag and [tag], online=online, offline=offline
             )
-            .to_dict()["data"]
         )
+        with Progress("Filtering endpoints") as progress:
+            if matches_nothing(filters):
+                pages = []
+            elif has_criteria(filters):
+                pages = WithSearchPagination(
+                    sdk.AgentsApi(api).v1_network_agents_search,
+                    models.V1NetworkAgentsSearchRequest,
+                    progress=progress,
+                ).pages(filter=filters)
+            else:
+                pages = iter_pages(
+                    progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+                )
+            agents = where.select(pages, skip, take)
+    elif not name and not id and not tag and not online and not offline:
+        with Progress("Retrieving endpoints", total=take or None) as progress:
+            agents = WithPagination(
+                progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+            )(skip=skip, take=take, _preload_content=False,)["data"]
+    else:
+        filters = _agent_filter(
+            name=name, id=id, tags=tag and [tag], online=online, offline=offline
+        )
+
+        with Progress("Searching endpoints", total=take or None) as progress:
+            agents = WithSearchPagination(
+                sdk.AgentsApi(api).v1_network_agents_search,
+                models.V1NetworkAgentsSearchRequest,
+                progress=progress,
+                model=models.V1Agent,
+            )(filter=filters, skip=skip, take=take)["data"]
+
+    filtered = name or id or tag or online or offline or where is not None
+    completion.refresh_index(
+        endpoints=agents, replace=not filtered and _is_complete(agents, skip, take)
+    )
+    agent_services = (
+        _get_agents_services(api, [agent["agent_id"] for agent in agents])
+        if show_services
+        else None
+    )
+    _print_endpoints(agents, agent_services, json)
+
+
+def _get_agents_services(api, ids):
+    """Retrieves services of the agents and groups them by agent ID."""
+    with Progress("Retrieving services", total=len(ids), unit="endpoints") as progress:
+        agents_services = BatchedFilter(
+            progress.wrap(
+                raw_records(sdk.AgentsApi(api).v1_network_agents_services_get),
+                count_filter,
+            ),
+            max_query_size=MAX_QUERY_FIELD_SIZE,
+        )(filter=ids, _preload_content=False)["data"]
+    agent_services = defaultdict(list)
+    for agent in agents_services:
+        agent_services[agent["agent_id"]].append(agent)
+    return agent_services
+
 
+def _print_endpoints(agents, agent_services, json):
+    """Prints endpoints. Services column is added if agent_services is not None."""
     fields = [
         ("Agent ID", "agent_id"),
         ("Name", "agent_name"),
@@ -197,31 +548,36 @@ def _get_endpoints(
         ),
     ]
 
-    if show_services:
-        ids = [agent["agent_id"] for agent in agents]
-        agents_services = BatchedRequestFilter(
-            sdk.AgentsApi(api).v1_network_agents_services_get,
-            max_query_size=MAX_QUERY_FIELD_SIZE,
-        )(filter=ids, _preload_content=False)["data"]
-        agent_services = defaultdict(list)
-        for agent in agents_services:
-            agent_services[agent["agent_id"]].append(agent)
-        agents = [
-            {
-                **agent,
-                "agent_services": agent_services.get(agent["agent_id"], []),
-            }
-            for agent in agents
-        ]
+    if agent_services is not None:
+        for agent in agents:
+            agent["agent_services"] = agent_services.get(agent["agent_id"], [])
         fields.append(("Services", "agent_services", collect_endpoint_services))
 
     print_table(agents, fields, to_json=json)
 
 
 @apis.command()
-@click.option("--name", default=None, type=str, help="Filter endpoints by name.")
-@click.option("--id", default=None, type=int, help="Filter endpoints by IDs.")
-@click.option("--tag", default=None, type=str, help="Filter endpoints by tag.")
+@click.option(
+    "--name",
+    default=None,
+    type=str,
+    help="Filter endpoints by name.",
+    shell_complete=completion.complete_endpoint_names,
+)
+@click.option(
+    "--id",
+    default=None,
+    type=int,
+    help="Filter endpoints by IDs.",
+    shell_complete=completion.complete_endpoint_ids,
+)
+@click.option(
+    "--tag",
+    default=None,
+    type=str,
+    help="Filter endpoints by tag.",
+    shell_complete=completion.complete_tags,
+)
 @click.option("--skip", default=0, type=int, help="Skip N endpoints.")
 @click.option("--take", default=42, type=int, help="Take N endpoints.")
 @click.option(
@@ -236,6 +592,12 @@ def _get_endpoints(
 @click.option(
     "--offline", is_flag=True, default=False, help="List only offline endpoints."
 )
+@click.option(
+    "--where",
+    type=WHERE,
+    default=None,
+    help="Filter expression, e.g. 'agent_location_city == \"Vilnius\" and agent_is_online == false'.",
+)
 @click.option(
     "--json",
     "-j",
@@ -243,8 +605,11 @@ def _get_endpoints(
     default=False,
     help="Outputs a JSON instead of a table.",
 )
+@with_profiles
 @syntropy_api
-def get_endpoints(name, id, tag, skip, take, show_services, online, offline, json, api):
+def get_endpoints(
+    name, id, tag, skip, take, show_services, online, offline, where, json, api
+):
     """List all endpoints.
 
     By default this command will retrieve up to 42 endpoints. You can use --take parameter to get more endpoints.
@@ -263,6 +628,8 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
         `nginx!~` - the service is disabled, but some subnets are enabled.
         `nginx!!` - the service and subnets are disabled.
 
+    --where filters endpoints by an expression over their fields, see the README for the syntax. Parts of the
+    expression that the API supports are evaluated by the server. --skip and --take apply to matching endpoints.
     """
     _get_endpoints(
         name,
@@ -275,11 +642,14 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
         offline,
         json,
         api,
+        where=where,
     )
 
 
 @apis.command()
-@click.argument("endpoint")
+@click.argument(
+    "endpoint", required=False, shell_complete=completion.complete_endpoints
+)
 @click.option(
     "--name",
     "-n",
@@ -287,6 +657,28 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
     default=False,
     help="Use endpoint name instead of id.",
 )
+@click.option(
+    "--tag",
+    "tags",
+    type=str,
+    multiple=True,
+    help="Select endpoints having the tag. Supports multiple options.",
+    shell_complete=completion.complete_tags,
+)
+@click.option(
+    "--provider",
+    "providers",
+    type=str,
+    multiple=True,
+    help="Select endpoints of the provider. Supports multiple options.",
+    shell_complete=completion.complete_providers,
+)
+@click.option(
+    "--online", is_flag=True, default=False, help="Select only online endpoints."
+)
+@click.option(
+    "--offline", is_flag=True, default=False, help="Select only offline endpoints."
+)
 @click.option(
     "--json",
     "-j",
@@ -300,6 +692,7 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
     type=str,
     default=None,
     help="Set a provider to the endpoint.",
+    shell_complete=completion.complete_providers,
 )
 @click.option(
     "--set-tag",
@@ -308,6 +701,7 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
     default=None,
     multiple=True,
     help="Set a tag to the endpoint(removes all other tags). Supports multiple options.",
+    shell_complete=completion.complete_tags,
 )
 @click.option(
     "--set-service",
@@ -324,6 +718,7 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
     default=None,
     multiple=True,
     help="Add a tag to the endpoint(won't affect other tags). Supports multiple options.",
+    shell_complete=completion.complete_tags,
 )
 @click.option(
     "--enable-service",
@@ -340,6 +735,7 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
     default=None,
     multiple=True,
     help="Remove a tag from the endpoint(won't affect other tags). Supports multiple options.",
+    shell_complete=completion.complete_tags,
 )
 @click.option("--clear-tags", is_flag=True, default=False, help="Removes all tags.")
 @click.option(
@@ -358,10 +754,20 @@ def get_endpoints(name, id, tag, skip, take, show_services, online, offline, jso
 )
 @click.option("--skip", default=0, type=int, help="Skip N endpoints.")
 @click.option("--take", default=42, type=int, help="Take N endpoints.")
+@click.option(
+    "--plan",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Write the planned changes to a file (use - for stdout) instead of applying them.",
+)
 @syntropy_api
 def configure_endpoints(
     api,
     endpoint,
+    tags,
+    providers,
+    online,
+    offline,
     set_provider,
     set_tag,
     set_service,
@@ -375,6 +781,7 @@ def configure_endpoints(
     name,
     take,
     skip,
+    plan,
     json,
 ):
     """Configures an endpoint with provided provider, tags. Also, allows to enable/disable services.
@@ -392,19 +799,40 @@ def configure_endpoints(
         3. remove tag1.
 
     The same applies to services.
+
+    Instead of (or in addition to) the endpoint, endpoints can be selected using --tag, --provider,
+    --online and --offline options. Different selectors are combined, e.g. `--tag edge --provider AWS --offline`
+    selects offline AWS endpoints tagged `edge`. All matching endpoints are configured.
+
+    With --plan the endpoints and services are retrieved and the changes are computed, but nothing is
+    written. Instead, the plan is saved to a file and a summary of API calls is printed.
+    The plan can be executed later with `syntropyctl execute-plan`.
     """
-    body = models.V1NetworkAgentsSearchRequest(
-        filter=models.V1AgentFilter(agent_name=endpoint)
-        if name
-        else models.V1AgentFilter(agent_id=endpoint)
-    )
-    agents = (
-        sdk.AgentsApi(api)
-        .v1_network_agents_search(
-            body,
+    stats = api.request_stats
+    if not endpoint and not (tags or providers or online or offline):
+        click.secho(
+            "Either endpoint or --tag, --provider, --online, --offline must be specified.",
+            err=True,
+            fg="red",
         )
-        .to_dict()["data"]
+        raise SystemExit(1)
+
+    filters = _agent_filter(
+        name=endpoint if name else None,
+        id=None if name else endpoint,
+        tags=tags,
+        provider_ids=providers and _get_provider_ids(api, providers),
+        online=online,
+        offline=offline,
     )
+    with Progress("Searching endpoints") as progress:
+        agents = WithSearchPagination(
+            sdk.AgentsApi(api).v1_network_agents_search,
+            models.V1NetworkAgentsSearchRequest,
+            concurrency=DEFAULT_CONCURRENCY,
+            progress=progress,
+            model=models.V1Agent,
+        )(filter=filters)["data"]
 
     if not agents:
         click.secho("Could not find any endpoints.", err=True, fg="red")
@@ -412,10 +840,12 @@ def configure_endpoints(
     else:
         click.secho(f"Found {len(agents)} endpoints.", fg="green")
 
-    if set_provider or set_tag or add_tag or remove_tag or clear_tags:
+    changes = {"agents": {}, "subnets": [], "create": [], "delete": []}
+    configure_tags = set_provider or set_tag or add_tag or remove_tag or clear_tags
+    if configure_tags:
         agents_tags = {
             agent["agent_id"]: [
-                tag["agent_tag_name"] for tag in agent.get("agent_tags", []) if tag
+                tag["agent_tag_name"] for tag in agent.get("agent_tags") or [] if tag
             ]
             for agent in agents
             if "agent_tags" in agent
@@ -436,31 +866,21 @@ def configure_endpoints(
             ) != set(tags):
                 payload["agent_tags"] = tags
             if payload:
-                sdk.AgentsApi(api).v1_network_agents_update(payload, agent["agent_id"])
-                click.secho("Tags and provider configured.", fg="green")
-            else:
-                click.secho(
-                    "Nothing to do for tags and provider configuration.", fg="yellow"
-                )
+                changes["agents"][agent["agent_id"]] = payload
 
     show_services = False
-    if (
+    configure_services = (
         set_service
         or enable_service
         or disable_service
         or enable_all_services
         or disable_all_services
-    ):
+    )
+    if configure_services:
         show_services = True
-        ids = [agent["agent_id"] for agent in agents]
-        agents_services_all = sdk.utils.BatchedRequestFilter(
-            sdk.AgentsApi(api).v1_network_agents_services_get,
-            max_query_size=MAX_QUERY_FIELD_SIZE,
-        )(filter=ids, _preload_content=False)["data"]
-
-        agents_services = defaultdict(list)
-        for agent in agents_services_all:
-            agents_services[agent["agent_id"]].append(agent)
+        agents_services = _get_agents_services(
+            api, [agent["agent_id"] for agent in agents]
+        )
         for agent in agents:
             services = {
                 service["agent_service_name"]: service
@@ -497,48 +917,163 @@ def configure_endpoints(
                     err=True,
                     fg="yellow",
                 )
-            subnets = [
-                models.V1NetworkAgentsServicesUpdateRequestSubnetsToUpdate(
-                    is_enabled=name in enabled_services,
-                    agent_service_subnet_id=subnet["agent_service_subnet_id"],
+            changes["subnets"] += [
+                {
+                    "agent_id": agent["agent_id"],
+                    "agent_service_subnet_id": subnet_id,
+                    "is_enabled": is_enabled,
+                }
+                for subnet_id, is_enabled in subnet_changes(
+                    services.values(), enabled_services
                 )
-                for name, service in services.items()
-                for subnet in service["agent_service_subnets"]
-                if subnet["agent_service_subnet_is_user_enabled"]
-                != (name in enabled_services)
             ]
-            if subnets:
-                payload = models.V1NetworkAgentsServicesUpdateRequest(
-                    subnets_to_update=subnets
+
+    if plan:
+        _output_plan(changes, plan, stats, MAX_SUBNETS_PER_REQUEST, concurrency=1)
+        return
+
+    failures = 0
+    updated_agents = set()
+    updated_services = set()
+    if configure_tags:
+        progress = Progress(
+            "Configuring endpoints", total=len(changes["agents"]), unit="endpoints"
+        )
+        for agent in agents:
+            payload = changes["agents"].get(agent["agent_id"])
+            if payload:
+                _, err = attempt(
+                    progress.wrap(
+                        sdk.AgentsApi(api).v1_network_agents_update,
+                        count_call,
+                    ),
+                    payload,
+                    agent["agent_id"],
                 )
-                sdk.AgentsApi(api).v1_network_agents_services_update(payload)
-                click.secho("Service subnets updated.", fg="green")
+                if err is not None:
+                    failures += 1
+                    click.secho(
+                        f"Failed to configure endpoint {agent['agent_id']}: {describe_error(err)}",
+                        err=True,
+                        fg="red",
+                    )
+                    continue
+                updated_agents.add(agent["agent_id"])
+                click.secho("Tags and provider configured.", fg="green")
             else:
-                click.secho("Nothing to do for service configuration.", fg="yellow")
-
-    name_param, id_param = None, None
-    if name:
-        name_param = endpoint
-    else:
-        id_param = endpoint
+                click.secho(
+                    "Nothing to do for tags and provider configuration.", fg="yellow"
+                )
+        progress.close()
 
-    _get_endpoints(
-        name_param,
-        id_param,
-        None,
-        skip,
-        take,
-        show_services,
-        None,
-        None,
+    if configure_services:
+        if not changes["subnets"]:
+            click.secho("Nothing to do for service configuration.", fg="yellow")
+        progress = Progress(
+            "Updating services", total=len(changes["subnets"]), unit="subnets"
+        )
+        for batch in iter_chunks(changes["subnets"], MAX_SUBNETS_PER_REQUEST):
+            ids = sorted({subnet["agent_id"] for subnet in batch})
+            with progress.request():
+                _, err = attempt(
+                    sdk.AgentsApi(api).v1_network_agents_services_update,
+                    _services_update_request(batch),
+                )
+            progress.advance(len(batch))
+            if err is not None:
+                failures += 1
+                click.secho(
+                    f"Failed to update {len(batch)} service subnets of endpoints "
+                    f"{', '.join(str(id) for id in ids)}: {describe_error(err)}",
+                    err=True,
+                    fg="red",
+                )
+                continue
+            updated_services.update(ids)
+            click.secho(
+                f"Updated {len(batch)} service subnets of endpoints "
+                f"{', '.join(str(id) for id in ids)}.",
+                fg="green",
+            )
+        progress.close()
+
+    # Reuse the retrieved endpoints and services, only the changed ones are retrieved again.
+    if updated_agents:
+        refreshed = {
+            agent["agent_id"]: agent
+            for agent in WithSearchPagination(
+                sdk.AgentsApi(api).v1_network_agents_search,
+                models.V1NetworkAgentsSearchRequest,
+                model=models.V1Agent,
+            )(filter=models.V1AgentFilter(agent_id=sorted(updated_agents)))["data"]
+        }
+        agents = [refreshed.get(agent["agent_id"], agent) for agent in agents]
+    if updated_services:
+        for id in updated_services:
+            agents_services.pop(id, None)
+        agents_services.update(_get_agents_services(api, sorted(updated_services)))
+
+    completion.refresh_index(endpoints=agents)
+    _print_endpoints(
+        agents[skip : skip + take] if take else agents[skip:],
+        agents_services if show_services else None,
         json,
-        api,
     )
+    if failures:
+        raise SystemExit(2)
+
+
+def _search_connections(
+    api, agent_ids, chunk_size=DEFAULT_CHUNK_SIZE, concurrency=DEFAULT_CONCURRENCY
+):
+    """Retrieves all connections of the given endpoints.
+
+    Endpoint IDs are split into chunks of `chunk_size` that are searched in parallel. Connections
+    between endpoints of different chunks are returned by both searches, so the results are
+    deduplicated by connection group ID while preserving order of the chunks.
+
+    Returns:
+        list[dict]: Connections.
+    """
+    chunks = list(iter_chunks(agent_ids, chunk_size))
+    with Progress("Searching connections") as progress:
+        search = WithSearchPagination(
+            sdk.ConnectionsApi(api).v1_network_connections_search,
+            models.V1NetworkConnectionsSearchRequest,
+            progress=progress,
+            model=models.V1Connection,
+        )
+        results = dict(
+            run_bounded(
+                lambda index: search(
+                    filter=models.V1ConnectionFilter(agent_id=chunks[index])
+                )["data"],
+                range(len(chunks)),
+                concurrency,
+            )
+        )
+    connections = {}
+    for index in range(len(chunks)):
+        for connection in results[index]:
+            connections.setdefault(connection["agent_connection_group_id"], connection)
+    return list(connections.values())
 
 
 @apis.command()
-@click.option("--id", default=None, type=int, help="Filter endpoints by ID.")
-@click.option("--name", default=None, type=str, help="Filter endpoints by ID or name.")
+@click.option(
+    "--id",
+    default=None,
+    type=int,
+    help="Filter endpoints by ID.",
+    shell_complete=completion.complete_endpoint_ids,
+)
+@click.option(
+    "--name",
+    default=None,
+    type=str,
+    help="Filter endpoints by ID or name.",
+    shell_complete=completion.complete_endpoint_names,
+)
 @click.option("--skip", default=0, type=int, help="Skip N connections.")
 @click.option("--take", default=42, type=int, help="Take N connections.")
 @click.option(
@@ -554,8 +1089,15 @@ def configure_endpoints(
     default=False,
     help="Outputs a JSON instead of a table.",
 )
+@click.option(
+    "--where",
+    type=WHERE,
+    default=None,
+    help="Filter expression, e.g. 'agent_connection_latency_ms > 150'.",
+)
+@with_profiles
 @syntropy_api
-def get_connections(id, name, skip, take, show_services, json, api):
+def get_connections(id, name, skip, take, show_services, where, json, api):
     """Retrieves connections.
 
     Connection service status is added to the end of the service name with the following possible symbols:
@@ -567,39 +1109,62 @@ def get_connections(id, name, skip, take, show_services, json, api):
     ? - Unknown state
 
     By default this command will retrieve up to 42 connections. You can use --take parameter to get more connections.
+    When filtering by --name or --id, all connections of the matching endpoints are retrieved and --skip and --take
+    are applied to the merged result. --where filters connections by an expression over their fields, see the README
+    for the syntax; --skip and --take apply to matching connections.
     """
     if name or id:
         if name:
-            agents = (
-                sdk.AgentsApi(api)
-                .v1_network_agents_search(
-                    models.V1NetworkAgentsSearchRequest(
-                        filter=models.V1AgentFilter(agent_name=name)
-                    ),
-                )
-                .to_dict()["data"]
-            )
+            agents = WithSearchPagination(
+                sdk.AgentsApi(api).v1_network_agents_search,
+                models.V1NetworkAgentsSearchRequest,
+                concurrency=DEFAULT_CONCURRENCY,
+            )(filter=models.V1AgentFilter(agent_name=name))["data"]
             id = [agent["agent_id"] for agent in agents]
         else:
             id = [int(id)]
 
-        filters = models.V1ConnectionFilter(agent_id=id)
-
-        connections = (
-            sdk.ConnectionsApi(api)
-            .v1_network_connections_search(
-                body=models.V1NetworkConnectionsSearchRequest(
-                    filter=filters,
-                    skip=skip,
-                    take=take,
-                ),
+        connections = _search_connections(api, id)
+        if where is not None:
+            connections = where.select([connections], skip, take)
+        else:
+            connections = (
+                connections[skip : skip + take] if take else connections[skip:]
             )
-            .to_dict()["data"]
-        )
+    elif where is not None:
+        filters = where.connection_filter()
+        with Progress("Filtering connections") as progress:
+            if matches_nothing(filters):
+                pages = []
+            elif has_criteria(filters):
+                pages = WithSearchPagination(
+                    sdk.ConnectionsApi(api).v1_network_connections_search,
+                    models.V1NetworkConnectionsSearchRequest,
+                    progress=progress,
+                ).pages(filter=filters)
+            else:
+                pages = iter_pages(
+                    progress.wrap(
+                        raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+                    )
+                )
+            connections = where.select(pages, skip, take)
     else:
-        connections = WithPagination(
-            sdk.ConnectionsApi(api).v1_network_connections_get
-        )(skip=skip, take=take, _preload_content=False,)["data"]
+        with Progress("Retrieving connections", total=take or None) as progress:
+            connections = WithPagination(
+                progress.wrap(
+                    raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+                )
+            )(skip=skip, take=take, _preload_content=False,)["data"]
+
+    completion.refresh_index(
+        endpoints=[
+            connection[side]
+            for connection in connections
+            for side in ("agent_1", "agent_2")
+            if connection.get(side)
+        ]
+    )
 
     fields = [
         ("ID", "agent_connection_group_id"),
@@ -617,37 +1182,44 @@ def get_connections(id, name, skip, take, show_services, json, api):
 
     if show_services:
         ids = [connection["agent_connection_group_id"] for connection in connections]
-        connections_services = BatchedRequestFilter(
-            sdk.ConnectionsApi(api).v1_network_connections_services_get,
+        connections_services = BatchedFilter(
+            raw_records(sdk.ConnectionsApi(api).v1_network_connections_services_get),
             max_query_size=MAX_QUERY_FIELD_SIZE,
         )(filter=ids, _preload_content=False)["data"]
         connection_services = {
             connection["agent_connection_group_id"]: connection
             for connection in connections_services
         }
-        connections = [
-            {
-                **connection,
-                "agent_connection_services": connection_services[
-                    connection["agent_connection_group_id"]
-                ],
-            }
-            for connection in connections
-        ]
+        for connection in connections:
+            connection["agent_connection_services"] = connection_services[
+                connection["agent_connection_group_id"]
+            ]
         fields.append(
-            ("Services", "agent_connection_services", collect_connection_services)
+            (
+                "Services",
+                "agent_connection_services",
+                functools.partial(
+                    collect_connection_services,
+                    subnet_index=service_subnet_index(connections_services),
+                ),
+            )
         )
 
     print_table(connections, fields, to_json=json)
 
 
 @apis.command()
-@click.argument("agents", nargs=-1)
 @click.option(
-    "--use-names",
-    is_flag=True,
-    default=False,
-    help="Use endpoint names instead of ids. Will not work with name duplicates.",
+    "--dot",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Export the graph in Graphviz DOT format to a file (use - for stdout).",
+)
+@click.option(
+    "--graphml",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Export the graph in GraphML format to a file (use - for stdout).",
 )
 @click.option(
     "--json",
@@ -657,8 +1229,539 @@ def get_connections(id, name, skip, take, show_services, json, api):
     help="Outputs a JSON instead of a table.",
 )
 @syntropy_api
-def create_connections(agents, use_names, json, api):
-    """Create connections between endpoints. Number of endpoints must be even.
+def topology(dot, graphml, json, api):
+    """Analyses the shape of the connection network.
+
+    All endpoints and connections are retrieved and reported are connected components, degree
+    distribution, isolated endpoints (without connections) and articulation points (endpoints
+    whose removal would split the network). The summary is not printed when the graph is
+    exported to stdout.
+    """
+    with Progress("Retrieving endpoints") as progress:
+        agents = WithPagination(
+            progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+        )(_preload_content=False)["data"]
+    with Progress("Retrieving connections") as progress:
+        connections = WithPagination(
+            progress.wrap(
+                raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+            )
+        )(_preload_content=False)["data"]
+
+    graph = Graph.from_connections(connections, agents)
+    for path, write in ((dot, graph.write_dot), (graphml, graph.write_graphml)):
+        if path:
+            with click.open_file(path, "w") as f:
+                write(f)
+    if "-" in (dot, graphml):
+        return
+
+    components = graph.components()
+    degrees = graph.degrees()
+    isolated = graph.isolated()
+    articulation_points = graph.articulation_points()
+    if json:
+        print_table(
+            [
+                {
+                    "endpoints": len(graph.adjacency),
+                    "connections": len(graph.edges),
+                    "components": [len(component) for component in components],
+                    "degrees": degrees,
+                    "isolated": isolated,
+                    "articulation_points": articulation_points,
+                }
+            ],
+            [],
+            to_json=True,
+        )
+        return
+
+    summary = [
+        ("Endpoints", len(graph.adjacency)),
+        ("Connections", len(graph.edges)),
+        ("Components", len(components)),
+        ("Largest component", len(components[0]) if components else 0),
+        ("Isolated endpoints", len(isolated)),
+        ("Articulation points", len(articulation_points)),
+    ]
+    print_table(
+        [{"metric": metric, "value": value} for metric, value in summary],
+        [("Metric", "metric"), ("Value", "value")],
+    )
+    print_table(
+        [{"degree": degree, "count": count} for degree, count in degrees.items()],
+        [("Degree", "degree"), ("Endpoints", "count")],
+    )
+    endpoints = [
+        {"agent_id": id, "role": "articulation point"} for id in articulation_points
+    ] + [{"agent_id": id, "role": "isolated"} for id in isolated]
+    if endpoints:
+        print_table(
+            endpoints,
+            [
+                ("Agent ID", "agent_id"),
+                ("Name", lambda x: graph.names.get(x["agent_id"])),
+                ("Connections", lambda x: len(graph.adjacency[x["agent_id"]])),
+                ("Role", "role"),
+            ],
+        )
+
+
+def _format_number(value):
+    return "-" if value is None else f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+@apis.command()
+@click.option(
+    "--provider",
+    "providers",
+    multiple=True,
+    help="Show only endpoints of the provider. Supports multiple options.",
+    shell_complete=completion.complete_providers,
+)
+@click.option(
+    "--take",
+    default=42,
+    type=int,
+    help="Show N least healthy endpoints, 0 shows all.",
+)
+@click.option(
+    "--json",
+    "-j",
+    is_flag=True,
+    default=False,
+    help="Outputs a JSON instead of a table.",
+)
+@syntropy_api
+def endpoint_health(providers, take, json, api):
+    """Ranks endpoints by health of their connections.
+
+    Connections are streamed page by page and aggregated per endpoint in a single pass. The health score
+    ranges from 0 (all connections failing) to 100 (all connections connected); WARNING and PENDING
+    connections count as half. Endpoints are listed from the least healthy, ties are broken by packet loss
+    and latency. Endpoints without connections are listed last.
+    """
+    with Progress("Retrieving endpoints") as progress:
+        agents = WithPagination(
+            progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+        )(_preload_content=False)["data"]
+    with Progress("Aggregating connections") as progress:
+        health = aggregate_health(
+            iter_pages(
+                progress.wrap(
+                    raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+                )
+            )
+        )
+
+    rows = health_report(health, agents)
+    if providers:
+        providers = set(providers)
+        rows = [row for row in rows if row["agent_provider_name"] in providers]
+    if take:
+        rows = rows[:take]
+
+    fields = [
+        ("Agent ID", "agent_id"),
+        ("Name", "agent_name"),
+        ("Provider", "agent_provider_name"),
+        ("Location", "agent_location_city"),
+        ("Tags", "agent_tags", lambda x: ", ".join(x) or "-"),
+        ("Connections", "connections"),
+        (
+            "Degraded",
+            "degraded",
+            lambda x: ", ".join(f"{status}: {count}" for status, count in x.items())
+            or "-",
+        ),
+        ("Mean Latency", "mean_latency_ms", _format_number),
+        ("Max Latency", "max_latency_ms", _format_number),
+        ("Mean Loss", "mean_loss", _format_number),
+        ("Max Loss", "max_loss", _format_number),
+        ("Score", "score"),
+    ]
+    print_table(rows, fields, to_json=json)
+
+
+@apis.command()
+@click.option(
+    "--missing",
+    default=None,
+    type=str,
+    help="List endpoints that do not expose the service.",
+)
+@click.option(
+    "--json",
+    "-j",
+    is_flag=True,
+    default=False,
+    help="Outputs a JSON instead of a table.",
+)
+@syntropy_api
+def services_summary(missing, json, api):
+    """Summarizes services across all endpoints.
+
+    For every service the number of endpoints exposing it is shown, split by whether all, some or none of the
+    service subnets are enabled, together with the number of endpoints where the service is not running and the
+    number of endpoints that do not expose it at all. Use --missing to list the endpoints without a service.
+    """
+    with Progress("Retrieving endpoints") as progress:
+        agents = WithPagination(
+            progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+        )(_preload_content=False)["data"]
+    agent_services = _get_agents_services(api, [agent["agent_id"] for agent in agents])
+    counts, endpoints = service_matrix(agent_services)
+
+    if missing is not None:
+        exposing = endpoints.get(missing, set())
+        print_table(
+            [agent for agent in agents if agent["agent_id"] not in exposing],
+            [("Agent ID", "agent_id"), ("Name", "agent_name")],
+            to_json=json,
+        )
+        return
+
+    rows = [
+        {
+            "service": name,
+            "endpoints": len(endpoints[name]),
+            **{state: counts[name, state] for state in SERVICE_STATES},
+            "inactive": counts[name, "inactive"],
+            "missing": len(agents) - len(endpoints[name]),
+        }
+        for name in sorted(endpoints)
+    ]
+    fields = [
+        ("Service", "service"),
+        ("Endpoints", "endpoints"),
+        ("Enabled", SERVICE_ENABLED),
+        ("Partial", SERVICE_PARTIAL),
+        ("Disabled", SERVICE_DISABLED),
+        ("Not Running", "inactive"),
+        ("Missing", "missing"),
+    ]
+    print_table(rows, fields, to_json=json)
+
+
+def _format_value(value):
+    if value is None:
+        return "-"
+    return ", ".join(str(item) for item in value) if isinstance(value, list) else value
+
+
+@apis.command()
+@click.argument("old", type=click.Path(exists=True, dir_okay=False))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--ignore",
+    multiple=True,
+    help="Do not compare the field. Supports multiple options.",
+)
+@click.option(
+    "--all-fields",
+    is_flag=True,
+    default=False,
+    help=f"Compare also fields that change on every listing: {', '.join(VOLATILE_FIELDS)}.",
+)
+@click.option(
+    "--json",
+    "-j",
+    is_flag=True,
+    default=False,
+    help="Outputs a JSON instead of a table.",
+)
+def diff(old, new, ignore, all_fields, json):
+    """Shows what changed between two snapshots.
+
+    Snapshots are outputs of get-endpoints and get-connections with --json, either JSON arrays or NDJSON lines
+    of --profiles. Endpoints and connections are matched by ID and reported as added, removed or modified
+    together with the changed fields, e.g. tags, provider, service states and connection status.
+
+    \b
+    Example:
+        syntropyctl get-endpoints --take 0 --show-services --json > before.json
+        syntropyctl get-endpoints --take 0 --show-services --json > after.json
+        syntropyctl diff before.json after.json
+    """
+    ignored = set(ignore) | (set() if all_fields else set(VOLATILE_FIELDS))
+    changes = diff_snapshots(load_snapshot(old), load_snapshot(new), ignored)
+    if json:
+        print_table(changes, [], to_json=True)
+        return
+
+    rows = [
+        {**change, **field}
+        for change in changes
+        for field in change.get("fields") or [{}]
+    ]
+    fields = [
+        ("Kind", "kind"),
+        ("ID", "id"),
+        ("Name", "name"),
+        ("Change", "change"),
+        ("Field", "field"),
+        ("Old", "old", _format_value),
+        ("New", "new", _format_value),
+    ]
+    if any(change["profile"] for change in changes):
+        fields.insert(0, ("Profile", "profile"))
+    print_table(rows, fields)
+
+
+EXPORT_DATASETS = ("agents", "services", "connections")
+
+
+@apis.command("export")
+@click.argument("directory", type=click.Path(file_okay=False))
+@click.option(
+    "--format",
+    "format",
+    type=click.Choice(export.FORMATS),
+    default=None,
+    help="Output format. Defaults to arrow if pyarrow is installed, npy otherwise.",
+)
+@click.option(
+    "--dataset",
+    "datasets",
+    type=click.Choice(EXPORT_DATASETS),
+    multiple=True,
+    help="Export only the dataset. Supports multiple options, defaults to all.",
+)
+@syntropy_api
+def export_data(directory, format, datasets, api):
+    """Exports endpoints, services and connections as columnar files for analytics.
+
+    Nested fields are flattened into columns, e.g. agent_1.agent_name, and tags into comma separated names.
+    Pages are streamed to disk as they arrive, so memory use does not depend on the size of the network.
+
+    \b
+    Formats:
+        arrow    Arrow IPC file per dataset, e.g. connections.arrow (requires pyarrow).
+        parquet  Parquet file per dataset (requires pyarrow).
+        npy      Directory per dataset with a NumPy .npy file per column.
+
+    Arrow and npy outputs can be loaded memory-mapped, e.g. with pyarrow.memory_map or
+    numpy.load(path, mmap_mode="r").
+    """
+    datasets = datasets or EXPORT_DATASETS
+    format = format or export.default_format()
+    if format in (export.ARROW, export.PARQUET) and export.pyarrow is None:
+        click.secho(
+            f"pyarrow must be installed in order to export {format} files.",
+            err=True,
+            fg="red",
+        )
+        raise SystemExit(1)
+
+    with export.Exporter(directory, format) as exporter:
+        if "agents" in datasets or "services" in datasets:
+            with Progress("Exporting endpoints") as progress:
+                pages = iter_pages(
+                    progress.wrap(raw_records(sdk.AgentsApi(api).v1_network_agents_get))
+                )
+                for agents in pages:
+                    if "agents" in datasets:
+                        exporter.append("agents", agents)
+                    if "services" in datasets:
+                        services = _get_agents_services(
+                            api, [agent["agent_id"] for agent in agents]
+                        )
+                        exporter.append(
+                            "services",
+                            (
+                                {
+                                    **service,
+                                    "agent_service_state": service_state(service),
+                                }
+                                for items in services.values()
+                                for service in items
+                            ),
+                        )
+        if "connections" in datasets:
+            with Progress("Exporting connections") as progress:
+                for connections in iter_pages(
+                    progress.wrap(
+                        raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+                    )
+                ):
+                    exporter.append("connections", connections)
+
+    for name, dataset in exporter.datasets.items():
+        click.echo(f"Exported {dataset.rows} {name} to {exporter.paths[name]}.")
+
+
+def _resolve_pairs(pairs, use_names, name_index):
+    for index, (line_number, pair) in pairs:
+        try:
+            if use_names:
+                resolved = tuple(name_index[endpoint] for endpoint in pair)
+                if None in resolved:
+                    raise KeyError
+            else:
+                resolved = tuple(int(endpoint) for endpoint in pair)
+        except (KeyError, ValueError):
+            click.secho(
+                f"Error: could not resolve endpoints {pair} on line {line_number}.",
+                err=True,
+                fg="red",
+            )
+            raise SystemExit(1)
+        yield index, resolved
+
+
+def _create_connections_chunk(api, chunk):
+    body = models.V1NetworkConnectionsCreateP2PRequest(
+        agent_pairs=[
+            models.V1NetworkConnectionsCreateP2PRequestAgentPairs(
+                agent_1_id=a,
+                agent_2_id=b,
+            )
+            for _, (a, b) in chunk
+        ],
+    )
+    result = sdk.ConnectionsApi(api).v1_network_connections_create_p2_p(
+        body=body, _preload_content=False
+    )
+    return deserialize_result(result)
+
+
+def _submit_pairs(api, pairs, chunk_size, concurrency, checkpoint):
+    """Creates connections for (index, (agent_1_id, agent_2_id)) pairs in chunks.
+
+    Chunks that fail after all retries are reported as errors and are not recorded
+    as processed, so that they are retried on the next run. Chunks the API responded to
+    are recorded as processed. If the API reports errors for a chunk, the pairs it does
+    not return as created are rejected; they are returned so they can be reported and
+    are not sent again on the next run.
+
+    Returns the number of submitted pairs, the number of requests, a list of errors,
+    the number of failed requests and a list of rejected pairs.
+    """
+    errors = []
+    rejected = []
+    failures = 0
+    requests = 0
+    submitted = 0
+    chunks = iter_chunks(
+        (pair for pair in pairs if pair[0] not in checkpoint), chunk_size
+    )
+    progress = Progress("Creating connections", unit="pairs")
+
+    def submit(chunk):
+        with progress.request():
+            return attempt(_create_connections_chunk, api, chunk)
+
+    for chunk, (result, err) in run_bounded(submit, chunks, concurrency):
+        requests += 1
+        progress.advance(len(chunk))
+        if err is not None:
+            failures += 1
+            errors.append({"message": describe_error(err)})
+            continue
+        submitted += len(chunk)
+        if result and "errors" in result:
+            errors += result["errors"]
+            created = {
+                frozenset((item.get("agent_1_id"), item.get("agent_2_id")))
+                for item in result.get("data") or []
+            }
+            rejected += [pair for _, pair in chunk if frozenset(pair) not in created]
+        checkpoint.mark(index for index, _ in chunk)
+    progress.close()
+    return submitted, requests, errors, failures, rejected
+
+
+def _get_tagged_agent_ids(api, tag):
+    agents = WithSearchPagination(
+        sdk.AgentsApi(api).v1_network_agents_search,
+        models.V1NetworkAgentsSearchRequest,
+    )(filter=models.V1AgentFilter(agent_tag_name=[tag]))["data"]
+    return sorted({agent["agent_id"] for agent in agents})
+
+
+@apis.command()
+@click.argument("agents", nargs=-1, shell_complete=completion.complete_endpoints)
+@click.option(
+    "--use-names",
+    is_flag=True,
+    default=False,
+    help="Use endpoint names instead of ids. Will not work with name duplicates.",
+)
+@click.option(
+    "--from-file",
+    "-f",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Read endpoint pairs from a CSV file with two endpoints per line.",
+)
+@click.option(
+    "--mesh",
+    is_flag=True,
+    default=False,
+    help="Connect every endpoint having --tag with each other.",
+)
+@click.option(
+    "--hub",
+    type=int,
+    default=None,
+    help="Connect endpoint with this ID to every endpoint having --tag.",
+    shell_complete=completion.complete_endpoint_ids,
+)
+@click.option(
+    "--tag",
+    type=str,
+    default=None,
+    help="Endpoint tag used with --mesh and --hub.",
+    shell_complete=completion.complete_tags,
+)
+@click.option(
+    "--chunk-size",
+    default=DEFAULT_CHUNK_SIZE,
+    type=click.IntRange(min=1),
+    help="Maximum number of pairs per request.",
+)
+@click.option(
+    "--concurrency",
+    default=DEFAULT_CONCURRENCY,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Progress file used to resume interrupted runs. Defaults to <file>.checkpoint with --from-file.",
+)
+@click.option(
+    "--plan",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Write the planned changes to a file (use - for stdout) instead of applying them.",
+)
+@click.option(
+    "--json",
+    "-j",
+    is_flag=True,
+    default=False,
+    help="Outputs a JSON instead of a table.",
+)
+@syntropy_api
+def create_connections(
+    agents,
+    use_names,
+    from_file,
+    mesh,
+    hub,
+    tag,
+    chunk_size,
+    concurrency,
+    checkpoint,
+    plan,
+    json,
+    api,
+):
+    """Create connections between endpoints. Number of endpoints must be even.
 
     \b
     Arguments:
@@ -678,52 +1781,505 @@ def create_connections(agents, use_names, json, api):
         3             | 4
         5             | 6
         7             | 8
+
+    Pairs can also be read from a CSV file with --from-file, one pair per line. Pairs are sent
+    in chunks of --chunk-size with up to --concurrency requests in flight. Pairs the API created
+    or rejected are recorded to the checkpoint file, so rerunning the same command resumes where
+    it stopped. Rejected pairs are listed at the end and are not sent again. The checkpoint file
+    is deleted once every pair is created or rejected.
+
+    Alternatively, --mesh --tag X connects all endpoints tagged X with each other and
+    --hub ID --tag X connects endpoint ID to all endpoints tagged X. Pairs that are
+    already connected are skipped, so rerunning these commands only creates missing connections.
+    --checkpoint is not supported with them, as the pairs depend on the current tag members.
+
+    With --plan the pairs are resolved, but no connections are created. Instead, the plan is
+    saved to a file, which can be executed later with `syntropyctl execute-plan`.
     """
+    stats = api.request_stats
+    topology = mesh or hub is not None
+    if sum(bool(i) for i in (agents, from_file, topology)) != 1 or (mesh and hub):
+        click.secho(
+            "Exactly one of endpoints, --from-file, --mesh or --hub must be specified.",
+            err=True,
+            fg="red",
+        )
+        raise SystemExit(1)
+    if topology and not tag:
+        click.secho("--tag must be specified with --mesh or --hub.", err=True, fg="red")
+        raise SystemExit(1)
+    if topology and checkpoint:
+        # Pairs are derived from the current tag members and connections, so their positions
+        # change between runs. Rerunning without a checkpoint creates only missing connections.
+        click.secho(
+            "--checkpoint cannot be used with --mesh or --hub.", err=True, fg="red"
+        )
+        raise SystemExit(1)
 
-    if use_names:
-        all_agents = WithPagination(sdk.AgentsApi(api).v1_network_agents_get)(
-            _preload_content=False
-        )["data"]
-        agents = find_by_name(all_agents, agents, "agent")
-        if any(i is None for i in agents):
+    file = None
+    if topology:
+        ids = _get_tagged_agent_ids(api, tag)
+        connections = WithPagination(
+            raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+        )(_preload_content=False)["data"]
+        existing = connection_pairs(connections)
+        pairs = mesh_pairs(ids, existing) if mesh else star_pairs(hub, ids, existing)
+        pairs = enumerate(pairs)
+    elif from_file:
+        if checkpoint is None:
+            checkpoint = f"{from_file}.checkpoint"
+        name_index = (
+            index_by_name(
+                WithPagination(raw_records(sdk.AgentsApi(api).v1_network_agents_get))(
+                    _preload_content=False
+                )["data"],
+                "agent",
+            )
+            if use_names
+            else None
+        )
+        file = open(from_file, encoding="utf-8", newline="")
+        pairs = _resolve_pairs(enumerate(read_pairs(file)), use_names, name_index)
+    else:
+        if use_names:
+            all_agents = WithPagination(
+                raw_records(sdk.AgentsApi(api).v1_network_agents_get)
+            )(_preload_content=False)["data"]
+            agents = find_by_name(all_agents, agents, "agent")
+            if any(i is None for i in agents):
+                raise SystemExit(1)
+        else:
+            try:
+                agents = [int(i) for i in agents]
+            except ValueError:
+                click.secho("Invalid agent id", err=True, fg="red")
+                raise SystemExit(1)
+
+        if len(agents) == 0 or len(agents) % 2 != 0:
+            click.secho("Number of agents must be even.", err=True, fg="red")
             raise SystemExit(1)
+        pairs = enumerate(zip(agents[:-1:2], agents[1::2]))
+
+    processed = Checkpoint(checkpoint)
+    if len(processed):
+        click.secho(
+            f"Resuming: {len(processed)} pairs were already processed.", fg="yellow"
+        )
+
+    try:
+        if plan:
+            changes = {
+                "agents": {},
+                "subnets": [],
+                "create": [
+                    list(pair) for index, pair in pairs if index not in processed
+                ],
+                "delete": [],
+            }
+            _output_plan(changes, plan, stats, chunk_size, concurrency)
+            return
+        submitted, requests, errors, failures, rejected = _submit_pairs(
+            api, pairs, chunk_size, concurrency, processed
+        )
+    finally:
+        if file is not None:
+            file.close()
+
+    if not failures:
+        processed.remove()
+    for error in errors:
+        click.secho(f"Error: {error.get('message')}", err=True, fg="red")
+    if rejected:
+        click.secho(
+            f"Rejected pairs: {', '.join(f'{a}-{b}' for a, b in rejected)}",
+            err=True,
+            fg="red",
+        )
+    if requests > 1 or from_file or topology:
+        click.secho(
+            f"Submitted {submitted} pairs in {requests} requests, {len(errors)} errors.",
+            fg="red" if errors else "green",
+        )
+    if failures:
+        raise SystemExit(2)
+
+
+CONNECTION_STATUSES = [
+    value for key, value in vars(models.V1ConnectionStatus).items() if key.isupper()
+]
+
+
+def _remove_connections(api, ids, chunk_size, concurrency):
+    """Removes connections in chunks of `chunk_size` running in parallel and reports every chunk.
+
+    Returns:
+        tuple: Number of removed connections and number of failed chunks.
+    """
+    connections_api = sdk.ConnectionsApi(api)
+    chunks = list(enumerate(iter_chunks(ids, chunk_size), 1))
+
+    progress = Progress("Removing connections", total=len(ids), unit="connections")
+
+    def remove(chunk):
+        return attempt(
+            progress.wrap(
+                connections_api.v1_network_connections_remove,
+                lambda *_: len(chunk[1]),
+            ),
+            models.V1NetworkConnectionsRemoveRequest(
+                agent_connection_group_ids=chunk[1]
+            ),
+        )
+
+    removed = 0
+    failures = 0
+    for (index, chunk), (_, err) in sorted(
+        run_bounded(remove, chunks, concurrency), key=lambda item: item[0][0]
+    ):
+        if err is not None:
+            failures += 1
+            click.secho(
+                f"Chunk {index}/{len(chunks)}: failed to remove {len(chunk)} connections: "
+                f"{describe_error(err)}",
+                err=True,
+                fg="red",
+            )
+        else:
+            removed += len(chunk)
+            if len(chunks) > 1:
+                click.secho(
+                    f"Chunk {index}/{len(chunks)}: removed {len(chunk)} connections.",
+                    fg="green",
+                )
+    progress.close()
+    return removed, failures
+
+
+@apis.command()
+@click.argument("ids", type=int, nargs=-1)
+@click.option(
+    "--status",
+    "statuses",
+    type=click.Choice(CONNECTION_STATUSES, case_sensitive=False),
+    multiple=True,
+    help="Delete connections having the status. Supports multiple options.",
+)
+@click.option(
+    "--tag",
+    default=None,
+    type=str,
+    help="Delete connections of endpoints having the tag.",
+    shell_complete=completion.complete_tags,
+)
+@click.option(
+    "--endpoint",
+    default=None,
+    type=str,
+    help="Delete connections of endpoints matching the name.",
+    shell_complete=completion.complete_endpoint_names,
+)
+@click.option(
+    "--min-latency",
+    default=None,
+    type=float,
+    help="Delete connections with latency of at least N milliseconds.",
+)
+@click.option(
+    "--min-packet-loss",
+    default=None,
+    type=float,
+    help="Delete connections with packet loss of at least N.",
+)
+@click.option(
+    "--older-than",
+    default=None,
+    callback=_duration_option,
+    help="Delete connections not updated for a duration, e.g. 12h, 7d, 2w.",
+)
+@click.option(
+    "--yes",
+    "-y",
+    is_flag=True,
+    default=False,
+    help="Do not ask for confirmation when deleting by criteria.",
+)
+@click.option(
+    "--chunk-size",
+    default=DEFAULT_CHUNK_SIZE,
+    type=click.IntRange(min=1),
+    help="Maximum number of connections per request.",
+)
+@click.option(
+    "--concurrency",
+    default=DEFAULT_CONCURRENCY,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight.",
+)
+@click.option(
+    "--plan",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Write the planned changes to a file (use - for stdout) instead of applying them.",
+)
+@syntropy_api
+def delete_connection(
+    ids,
+    statuses,
+    tag,
+    endpoint,
+    min_latency,
+    min_packet_loss,
+    older_than,
+    yes,
+    chunk_size,
+    concurrency,
+    plan,
+    api,
+):
+    """Delete connections using their ID or by criteria.
+
+    Connections can be selected using --status, --tag, --endpoint, --min-latency, --min-packet-loss and --older-than
+    options. All given criteria must match, e.g. `--status ERROR --older-than 7d` deletes connections that have been
+    in ERROR state for at least a week. If IDs are given as well, only these connections are considered.
+
+    Matching connections are listed once and, after a confirmation, removed in chunks running in parallel.
+    """
+    stats = api.request_stats
+    by_criteria = bool(statuses or tag or endpoint) or any(
+        value is not None for value in (min_latency, min_packet_loss, older_than)
+    )
+    if by_criteria:
+        agent_ids = None
+        if tag or endpoint:
+            agent_ids = [
+                agent["agent_id"]
+                for agent in WithSearchPagination(
+                    sdk.AgentsApi(api).v1_network_agents_search,
+                    models.V1NetworkAgentsSearchRequest,
+                    concurrency=concurrency,
+                )(filter=_agent_filter(name=endpoint, tags=tag and [tag]))["data"]
+            ]
+        match = connection_matcher(
+            statuses=[status.upper() for status in statuses],
+            agent_ids=agent_ids,
+            min_latency=min_latency,
+            min_packet_loss=min_packet_loss,
+            updated_before=older_than and datetime.now(timezone.utc) - older_than,
+        )
+        connections = WithPagination(
+            raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+        )(_preload_content=False)["data"]
+        selected = set(ids)
+        ids = [
+            connection["agent_connection_group_id"]
+            for connection in connections
+            if (not selected or connection["agent_connection_group_id"] in selected)
+            and match(connection)
+        ]
+        if not ids:
+            click.secho("No matching connections found.", fg="yellow")
+            return
     else:
+        ids = list(ids)
+
+    if plan:
+        changes = {"agents": {}, "subnets": [], "create": [], "delete": ids}
+        _output_plan(changes, plan, stats, chunk_size, concurrency)
+        return
+
+    if by_criteria and not yes:
         try:
-            agents = [int(i) for i in agents]
-        except ValueError:
-            click.secho("Invalid agent id", err=True, fg="red")
+            if not click.confirm(f"Do you want to delete {len(ids)} connections?"):
+                return
+        except click.Abort:
             raise SystemExit(1)
 
-    if len(agents) == 0 or len(agents) % 2 != 0:
-        click.secho("Number of agents must be even.", err=True, fg="red")
-        raise SystemExit(1)
-    agents = list(zip(agents[:-1:2], agents[1::2]))
+    removed, failures = _remove_connections(api, ids, chunk_size, concurrency)
+    if len(ids) > chunk_size or by_criteria:
+        click.secho(
+            f"Removed {removed} of {len(ids)} connections.",
+            fg="red" if failures else "green",
+        )
+    if failures:
+        raise SystemExit(2)
 
-    body = models.V1NetworkConnectionsCreateP2PRequest(
-        agent_pairs=[
-            models.V1NetworkConnectionsCreateP2PRequestAgentPairs(
-                agent_1_id=a,
-                agent_2_id=b,
+
+def _services_update_request(subnets):
+    return models.V1NetworkAgentsServicesUpdateRequest(
+        subnets_to_update=[
+            models.V1NetworkAgentsServicesUpdateRequestSubnetsToUpdate(
+                is_enabled=subnet["is_enabled"],
+                agent_service_subnet_id=subnet["agent_service_subnet_id"],
             )
-            for a, b in agents
-        ],
+            for subnet in subnets
+        ]
     )
-    result = sdk.ConnectionsApi(api).v1_network_connections_create_p2_p(
-        body=body, _preload_content=False
+
+
+def _apply_changes(api, changes, chunk_size, concurrency):
+    """Executes a change set computed by `plan_changes` using batched parallel calls.
+
+    Returns the number of requests made, a list of errors and the number of failed requests.
+    """
+    agents_api = sdk.AgentsApi(api)
+    connections_api = sdk.ConnectionsApi(api)
+    tasks = [
+        functools.partial(agents_api.v1_network_agents_update, payload, id)
+        for id, payload in changes["agents"].items()
+    ]
+    tasks += [
+        functools.partial(
+            agents_api.v1_network_agents_services_update,
+            _services_update_request(chunk),
+        )
+        for chunk in iter_chunks(changes["subnets"], chunk_size)
+    ]
+    tasks += [
+        functools.partial(_create_connections_chunk, api, list(enumerate(chunk)))
+        for chunk in iter_chunks(changes["create"], chunk_size)
+    ]
+    tasks += [
+        functools.partial(
+            connections_api.v1_network_connections_remove,
+            models.V1NetworkConnectionsRemoveRequest(agent_connection_group_ids=chunk),
+        )
+        for chunk in iter_chunks(changes["delete"], chunk_size)
+    ]
+
+    errors = []
+    failures = 0
+    progress = Progress("Applying changes", total=len(tasks), unit="requests")
+    for _, (result, err) in run_bounded(
+        lambda task: attempt(progress.wrap(task, count_call)), tasks, concurrency
+    ):
+        if err is not None:
+            failures += 1
+            errors.append({"message": describe_error(err)})
+            continue
+        result = deserialize_result(result)
+        if isinstance(result, dict) and "errors" in result:
+            errors += result["errors"]
+    progress.close()
+    return len(tasks), errors, failures
+
+
+def _report_applied(requests, errors, failures):
+    for error in errors:
+        click.secho(f"Error: {error.get('message')}", err=True, fg="red")
+    click.secho(
+        f"Applied changes in {requests} requests, {len(errors)} errors.",
+        fg="red" if errors else "green",
     )
+    if failures:
+        raise SystemExit(2)
 
-    if result and "errors" in result:
-        for error in result["errors"]:
-            click.secho(f"Error: {error.get('message')}", err=True, fg="red")
+
+@apis.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--prune",
+    is_flag=True,
+    default=False,
+    help="Remove connections between listed endpoints that are not in the file.",
+)
+@click.option(
+    "--chunk-size",
+    default=DEFAULT_CHUNK_SIZE,
+    type=click.IntRange(min=1),
+    help="Maximum number of items per request.",
+)
+@click.option(
+    "--concurrency",
+    default=DEFAULT_CONCURRENCY,
+    type=click.IntRange(min=1),
+    help="Maximum number of requests in flight.",
+)
+@click.option(
+    "--plan",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help="Write the planned changes to a file (use - for stdout) instead of applying them.",
+)
+@syntropy_api
+def apply(path, prune, chunk_size, concurrency, plan, api):
+    """Brings endpoints and connections to the state described in a YAML or JSON file.
+
+    \b
+    Example file:
+        endpoints:
+          - name: endpoint-1
+            provider: AWS
+            tags: [tag1, tag2]
+            services: [nginx]
+        connections:
+          - [endpoint-1, endpoint-2]
+
+    Only the fields that are present are managed, e.g. if `tags` is omitted, endpoint tags are left intact.
+    `services` is the exact list of services to enable, all other services of the endpoint are disabled.
+
+    Current state is retrieved once and only the differences are applied, so the number of API calls
+    is proportional to the number of changes.
+
+    With --plan nothing is written. Instead, the plan is saved to a file, which can be executed later
+    with `syntropyctl execute-plan`.
+    """
+    stats = api.request_stats
+    desired = load_state(path)
+
+    agents = WithPagination(raw_records(sdk.AgentsApi(api).v1_network_agents_get))(
+        _preload_content=False
+    )["data"]
+    connections = WithPagination(
+        raw_records(sdk.ConnectionsApi(api).v1_network_connections_get)
+    )(_preload_content=False)["data"]
+
+    name_index = index_by_name(agents, "agent")
+    ids = {agent["agent_id"] for agent in agents}
+    services_ids = [
+        resolve_endpoint(endpoint, name_index, ids)
+        for endpoint in desired["endpoints"]
+        if "services" in endpoint
+    ]
+    services = defaultdict(list)
+    if services_ids:
+        for service in BatchedFilter(
+            raw_records(sdk.AgentsApi(api).v1_network_agents_services_get),
+            max_query_size=MAX_QUERY_FIELD_SIZE,
+        )(filter=services_ids, _preload_content=False)["data"]:
+            services[service["agent_id"]].append(service)
+
+    changes = plan_changes(desired, agents, services, connections, prune=prune)
+    if plan:
+        _output_plan(changes, plan, stats, chunk_size, concurrency)
+        return
+
+    click.secho(
+        f"Endpoints to update: {len(changes['agents'])}, "
+        f"service subnets to update: {len(changes['subnets'])}, "
+        f"connections to create: {len(changes['create'])}, "
+        f"connections to delete: {len(changes['delete'])}.",
+    )
+    if not any(changes.values()):
+        click.secho("Nothing to do.", fg="yellow")
+        return
+
+    _report_applied(*_apply_changes(api, changes, chunk_size, concurrency))
 
 
 @apis.command()
-@click.argument("ids", type=int, nargs=-1)
+@click.argument("path", type=click.File("r"))
 @syntropy_api
-def delete_connection(ids, api):
-    """Delete connections using their ID."""
-    body = models.V1NetworkConnectionsRemoveRequest(agent_connection_group_ids=ids)
-    sdk.ConnectionsApi(api).v1_network_connections_remove(body)
+def execute_plan(path, api):
+    """Executes a plan saved with the --plan option of configure-endpoints, create-connections,
+    delete-connection or apply. Use - to read the plan from stdin.
+    """
+    plan = load_plan(path)
+    if not any(plan["changes"].values()):
+        click.secho("Nothing to do.", fg="yellow")
+        return
+    _report_applied(
+        *_apply_changes(api, plan["changes"], plan["chunk_size"], plan["concurrency"])
+    )
 
 
 def main():
@@ -0,0 +1,348 @@
+import contextlib
+import copy
+import glob
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+
+from urllib3.response import HTTPResponse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+AGENTS = (
+    "/v1/network/agents",
+    "/v1/network/agents/search",
+    "/v1/network/agents/tags",
+    "/v1/network/agents/providers",
+)
+AGENT_SERVICES = (
+    "/v1/network/agents/services",
+    "/v1/network/connections/services",
+)
+CONNECTIONS = (
+    "/v1/network/connections",
+    "/v1/network/connections/search",
+    "/v1/network/connections/services",
+)
+API_KEYS = ("/v1/network/auth/api-keys",)
+
+# Maps mutating requests to read resources they affect. Mutations that are
+# not listed here invalidate the whole cache.
+INVALIDATES = {
+    ("/v1/network/agents/{agent_id}", "PATCH"): AGENTS,
+    ("/v1/network/agents/services/bulk", "PATCH"): AGENTS + AGENT_SERVICES,
+    ("/v1/network/agents/remove", "POST"): AGENTS + AGENT_SERVICES + CONNECTIONS,
+    ("/v1/network/connections/point-to-point", "POST"): CONNECTIONS,
+    ("/v1/network/connections/mesh", "POST"): CONNECTIONS,
+    ("/v1/network/connections/remove", "POST"): CONNECTIONS,
+    ("/v1/network/connections/services", "PATCH"): CONNECTIONS,
+    ("/v1/network/auth/api-keys", "POST"): API_KEYS,
+    ("/v1/network/auth/api-keys/{api_key_id}", "DELETE"): API_KEYS,
+}
+
+
+def is_read(resource_path, method):
+    return method == "GET" or (method == "POST" and resource_path.endswith("/search"))
+
+
+def request_key(api, resource_path, method, args, kwargs):
+    params = {
+        "args": args,
+        "body": api.sanitize_for_serialization(kwargs.get("body")),
+        "response_type": kwargs.get("response_type"),
+        "preload_content": kwargs.get("_preload_content", True),
+    }
+    return (
+        resource_path,
+        method,
+        json.dumps(params, sort_keys=True, default=str),
+    )
+
+
+class RequestCache:
+    """Memoizes read requests made through an ApiClient for the duration of a single invocation.
+
+    Reads are GET requests and POST requests to search endpoints. They are keyed by resource path,
+    parameters and body. Concurrent identical reads are coalesced, i.e. only the first one is sent
+    and the rest wait for its result. Mutating requests invalidate the reads of the resources they
+    affect according to INVALIDATES.
+
+    Example:
+        RequestCache().install(api)
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _store(result):
+        if isinstance(result, HTTPResponse):
+            return (result.data, result.status, result.headers)
+        return copy.deepcopy(result)
+
+    @staticmethod
+    def _load(entry):
+        if isinstance(entry, tuple) and len(entry) == 3 and isinstance(entry[0], bytes):
+            data, status, headers = entry
+            return HTTPResponse(
+                body=data, status=status, headers=headers, preload_content=False
+            )
+        return copy.deepcopy(entry)
+
+    def invalidate(self, resource_path=None, method=None):
+        """Drops entries affected by a mutation. Drops everything if the mutation is unknown."""
+        paths = INVALIDATES.get((resource_path, method))
+        with self._lock:
+            self._generation += 1
+            if paths is None:
+                self._entries.clear()
+            else:
+                self._entries = {
+                    key: entry
+                    for key, entry in self._entries.items()
+                    if key[0] not in paths
+                }
+
+    def call(self, api, call_api, resource_path, method, *args, **kwargs):
+        if not is_read(resource_path, method) or kwargs.get("async_req"):
+            try:
+                return call_api(resource_path, method, *args, **kwargs)
+            finally:
+                self.invalidate(resource_path, method)
+
+        key = request_key(api, resource_path, method, args, kwargs)
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._load(self._entries[key])
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    generation = self._generation
+                    self.misses += 1
+                    break
+            event.wait()
+
+        try:
+            entry = self._store(call_api(resource_path, method, *args, **kwargs))
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = entry
+            return self._load(entry)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def install(self, api):
+        """Routes all requests of the ApiClient through the cache."""
+        call_api = api.call_api
+
+        def wrapper(*args, **kwargs):
+            return self.call(api, call_api, *args, **kwargs)
+
+        api.call_api = wrapper
+        return api
+
+
+def check_private(directory):
+    """Checks that only the current user can modify the directory.
+
+    Raises:
+        PermissionError: If the directory is a symlink, belongs to another user or can be written
+            by group or others.
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{directory} is not a directory")
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by another user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{directory} is writable by other users")
+
+
+def _slug(resource_path):
+    return resource_path.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+
+
+class SharedCache:
+    """Shares read responses between processes, e.g. parallel CI jobs, through files in a directory.
+
+    Only raw responses (requests made with `_preload_content=False`) are shared. For every request
+    key there is an entry file and a lock file:
+
+    * A fresh entry (younger than `ttl` seconds) is returned without any request.
+    * A stale entry (younger than `ttl + stale` seconds) is returned as well, while a single process
+      refreshes it in a background thread (stale-while-revalidate).
+    * Otherwise the lock is taken, so that a single process sends the request while the others
+      wait for it and then read its result (single-flight).
+
+    Entries are written to a temporary file that is renamed over the entry, so readers never see a
+    partial file. Mutating requests remove the entries of the resources they affect according to
+    INVALIDATES. Locks require fcntl; where it is not available, requests are not coordinated, but
+    entries are still shared.
+
+    As the CLI acts on cached responses, the directory must be owned by the current user and must
+    not be writable by group or others, otherwise PermissionError is raised.
+
+    Example:
+        SharedCache("~/.cache/syntropycli/requests", ttl=60, stale=300).install(api)
+    """
+
+    def __init__(self, directory, ttl, stale=0, clock=time.time):
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.stale = stale
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        check_private(self.directory)
+
+    def _path(self, api, key):
+        config = api.configuration
+        identity = json.dumps(
+            [config.host, config.api_key.get("api-key"), key], default=str
+        )
+        digest = hashlib.sha256(identity.encode()).hexdigest()
+        return os.path.join(self.directory, f"{_slug(key[0])}-{digest}.entry")
+
+    def _read(self, path):
+        """Returns (age, data, status, headers) of an entry or None."""
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        return self.clock() - meta["created"], data, meta["status"], meta["headers"]
+
+    def _write(self, path, data, status, headers):
+        meta = {"created": self.clock(), "status": status, "headers": dict(headers)}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".entry-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(meta).encode() + b"\n")
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def _locked(self, path, blocking=True):
+        """Holds the lock of an entry. Yields False if it is held by someone else and blocking is False."""
+        if fcntl is None:
+            yield True
+            return
+        with open(path[: -len(".entry")] + ".lock", "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _response(data, status, headers):
+        return HTTPResponse(
+            body=data, status=status, headers=headers, preload_content=False
+        )
+
+    def _fetch(self, path, call):
+        result = call()
+        if not isinstance(result, HTTPResponse):
+            return result
+        data = result.data
+        if result.status == 200:
+            self._write(path, data, result.status, result.headers)
+        return self._response(data, result.status, result.headers)
+
+    def _revalidate(self, path, call):
+        with self._locked(path, blocking=False) as locked:
+            if locked:
+                entry = self._read(path)
+                if entry is None or entry[0] >= self.ttl:
+                    self._fetch(path, call)
+
+    def invalidate(self, resource_path=None, method=None):
+        """Removes entries affected by a mutation. Removes everything if the mutation is unknown."""
+        paths = INVALIDATES.get((resource_path, method))
+        patterns = (
+            ["*.entry"]
+            if paths is None
+            else [f"{_slug(path)}-*.entry" for path in paths]
+        )
+        for pattern in patterns:
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
+
+    def call(self, api, call_api, resource_path, method, *args, **kwargs):
+        if not is_read(resource_path, method):
+            try:
+                return call_api(resource_path, method, *args, **kwargs)
+            finally:
+                self.invalidate(resource_path, method)
+        if kwargs.get("async_req") or kwargs.get("_preload_content", True):
+            return call_api(resource_path, method, *args, **kwargs)
+
+        path = self._path(api, request_key(api, resource_path, method, args, kwargs))
+        call = lambda: call_api(resource_path, method, *args, **kwargs)
+        entry = self._read(path)
+        if entry is not None and entry[0] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return self._response(*entry[1:])
+        if entry is not None and entry[0] < self.ttl + self.stale:
+            with self._lock:
+                self.stale_hits += 1
+            # Not a daemon, so that the refresh completes before the process exits.
+            thread = threading.Thread(target=self._revalidate, args=(path, call))
+            thread.start()
+            self._threads.append(thread)
+            return self._response(*entry[1:])
+
+        with self._locked(path):
+            entry = self._read(path)
+            if entry is not None and entry[0] < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return self._response(*entry[1:])
+            with self._lock:
+                self.misses += 1
+            return self._fetch(path, call)
+
+    def join(self):
+        """Waits for background refreshes to finish."""
+        for thread in self._threads:
+            thread.join()
+
+    def install(self, api):
+        """Routes all requests of the ApiClient through the shared cache."""
+        call_api = api.call_api
+
+        def wrapper(*args, **kwargs):
+            return self.call(api, call_api, *args, **kwargs)
+
+        api.call_api = wrapper
+        return api
@@ -0,0 +1,278 @@
+"""Shell completion of endpoints, tags, providers and API key names.
+
+Completions are answered from a small local index file that is refreshed after listings,
+so that completing does not hit the API. This module must not import the SDK: values are
+completed by `main` without loading the command definitions at all.
+"""
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+import click
+from click.shell_completion import CompletionItem, get_completion_class
+
+PROG_NAME = "syntropyctl"
+COMPLETE_VAR = "_SYNTROPYCTL_COMPLETE"
+INDEX_ENV = "SYNTROPY_COMPLETION_INDEX"
+
+ENDPOINT_NAMES = "endpoint_names"
+ENDPOINT_IDS = "endpoint_ids"
+ENDPOINTS = "endpoints"
+TAGS = "tags"
+PROVIDERS = "providers"
+API_KEYS = "api_keys"
+
+# Option values and arguments that are completed from the index, keyed by command name.
+# None stands for the positional argument of the command.
+COMPLETIONS = {
+    "get-endpoints": {"--name": ENDPOINT_NAMES, "--id": ENDPOINT_IDS, "--tag": TAGS},
+    "get-connections": {"--name": ENDPOINT_NAMES, "--id": ENDPOINT_IDS},
+    "configure-endpoints": {
+        None: ENDPOINTS,
+        "--tag": TAGS,
+        "--set-tag": TAGS,
+        "-t": TAGS,
+        "--add-tag": TAGS,
+        "-T": TAGS,
+        "--remove-tag": TAGS,
+        "-R": TAGS,
+        "--provider": PROVIDERS,
+        "--set-provider": PROVIDERS,
+        "-p": PROVIDERS,
+    },
+    "create-connections": {None: ENDPOINTS, "--hub": ENDPOINT_IDS, "--tag": TAGS},
+    "delete-connection": {"--tag": TAGS, "--endpoint": ENDPOINT_NAMES},
+    "delete-api-key": {"--name": API_KEYS},
+}
+# Flags that switch positional endpoint arguments from IDs to names.
+NAME_FLAGS = ("-n", "--name", "--use-names")
+
+
+def index_path():
+    """Returns the path of the completion index, SYNTROPY_COMPLETION_INDEX overrides the default."""
+    path = os.environ.get(INDEX_ENV)
+    if path:
+        return path
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache, "syntropycli", "completion.json")
+
+
+def load_index(path=None):
+    try:
+        with open(path or index_path(), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    if not isinstance(index, dict):
+        index = {}
+    return {
+        "endpoints": index.get("endpoints") or {},
+        "tags": index.get("tags") or [],
+        "providers": index.get("providers") or [],
+        "api_keys": index.get("api_keys") or [],
+    }
+
+
+def save_index(index, path=None):
+    """Writes the index atomically, so that concurrent completions never see a partial file."""
+    path = path or index_path()
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".completion-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Serializes updates of the index between threads and, where fcntl is available, processes."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(current, new, replace):
+    return sorted(set(new) if replace else set(current) | set(new))
+
+
+def update_index(
+    endpoints=None, providers=None, api_keys=None, replace=False, path=None
+):
+    """Merges listed resources into the completion index.
+
+    The index is read and written under a lock, so that concurrent updates are not lost.
+
+    Args:
+        endpoints (list[dict]): Endpoints with agent_id, agent_name and optionally agent_tags and agent_provider.
+        providers (list[str]): Provider names.
+        api_keys (list[str]): API key names.
+        replace (bool): The listing is complete, so entries that are not in it are dropped.
+        path (str): Index path, defaults to `index_path()`.
+    """
+    path = path or index_path()
+    with _locked(path):
+        _update(load_index(path), endpoints, providers, api_keys, replace, path)
+
+
+def _update(index, endpoints, providers, api_keys, replace, path):
+    if endpoints is not None:
+        entries = {
+            str(endpoint["agent_id"]): endpoint.get("agent_name")
+            for endpoint in endpoints
+        }
+        index["endpoints"] = entries if replace else {**index["endpoints"], **entries}
+        tags = [
+            tag["agent_tag_name"]
+            for endpoint in endpoints
+            for tag in endpoint.get("agent_tags") or []
+            if isinstance(tag, Mapping) and tag.get("agent_tag_name")
+        ]
+        index["tags"] = _merge(index["tags"], tags, replace)
+        endpoint_providers = [
+            endpoint["agent_provider"]["agent_provider_name"]
+            for endpoint in endpoints
+            if isinstance(endpoint.get("agent_provider"), Mapping)
+            and endpoint["agent_provider"].get("agent_provider_name")
+        ]
+        index["providers"] = _merge(index["providers"], endpoint_providers, False)
+    if providers is not None:
+        index["providers"] = _merge(index["providers"], providers, replace)
+    if api_keys is not None:
+        index["api_keys"] = _merge(index["api_keys"], api_keys, replace)
+    save_index(index, path)
+
+
+def _update_index_quietly(**kwargs):
+    try:
+        update_index(**kwargs)
+    except OSError:
+        pass
+
+
+def refresh_index(**kwargs):
+    """Updates the completion index in a background thread so that listings are not delayed.
+
+    The thread is not a daemon, therefore the update finishes before the process exits.
+    Failures are ignored as the index is only used for completion.
+    """
+    thread = threading.Thread(
+        target=_update_index_quietly, kwargs=kwargs, name="completion-index"
+    )
+    thread.start()
+    return thread
+
+
+def candidates(kind, incomplete, index=None):
+    """Returns completion items of the given kind that start with `incomplete`."""
+    index = index or load_index()
+    if kind == ENDPOINT_IDS:
+        return [
+            CompletionItem(id, help=name)
+            for id, name in sorted(index["endpoints"].items(), key=lambda x: int(x[0]))
+            if id.startswith(incomplete)
+        ]
+    if kind == ENDPOINT_NAMES:
+        values = sorted({name for name in index["endpoints"].values() if name})
+    else:
+        values = index[kind]
+    return [CompletionItem(value) for value in values if value.startswith(incomplete)]
+
+
+def _completer(kind):
+    def complete(ctx, param, incomplete):
+        if kind == ENDPOINTS:
+            use_names = ctx.params.get("name") is True or ctx.params.get("use_names")
+            return candidates(ENDPOINT_NAMES if use_names else ENDPOINT_IDS, incomplete)
+        return candidates(kind, incomplete)
+
+    return complete
+
+
+complete_endpoint_names = _completer(ENDPOINT_NAMES)
+complete_endpoint_ids = _completer(ENDPOINT_IDS)
+complete_endpoints = _completer(ENDPOINTS)
+complete_tags = _completer(TAGS)
+complete_providers = _completer(PROVIDERS)
+complete_api_keys = _completer(API_KEYS)
+
+
+def completion_kind(args, incomplete):
+    """Determines what is being completed from the command line words.
+
+    Returns:
+        Union[str, None]: The kind of value or None if the command definitions are needed.
+    """
+    if not args or incomplete.startswith("-"):
+        return None
+    completions = COMPLETIONS.get(args[0])
+    if completions is None:
+        return None
+    if len(args) > 1 and args[-1] in completions:
+        return completions[args[-1]]
+    kind = completions.get(None)
+    if kind is None or (args[-1].startswith("-") and args[-1] not in NAME_FLAGS):
+        return None
+    if kind == ENDPOINTS:
+        return (
+            ENDPOINT_NAMES if any(arg in NAME_FLAGS for arg in args) else ENDPOINT_IDS
+        )
+    return kind
+
+
+def complete():
+    """Answers shell completion of option values and arguments from the index.
+
+    Returns:
+        bool: True if the completion was answered.
+    """
+    instruction = os.environ.get(COMPLETE_VAR, "")
+    shell, _, action = instruction.partition("_")
+    cls = get_completion_class(shell)
+    if action != "complete" or cls is None:
+        return False
+    completion = cls(None, {}, PROG_NAME, COMPLETE_VAR)
+    args, incomplete = completion.get_completion_args()
+    kind = completion_kind(args, incomplete)
+    if kind is None:
+        return False
+    click.echo(
+        "\n".join(
+            completion.format_completion(item) for item in candidates(kind, incomplete)
+        )
+    )
+    return True
+
+
+def main():
+    if complete():
+        sys.exit(0)
+    from syntropycli.__main__ import main as cli_main
+
+    cli_main()
@@ -1,25 +1,212 @@
+import configparser
 import functools
+import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import click
 import syntropy_sdk as sdk
 from syntropy_sdk.exceptions import ApiException
 from syntropy_sdk.utils import *
 
+from syntropycli.cache import RequestCache, SharedCache
+from syntropycli.scheduler import *
+from syntropycli.utils import RequestStats, collect_tables, print_table, to_builtin
+
 
 class EnvVars:
     API_URL = "SYNTROPY_API_SERVER"
     TOKEN = "SYNTROPY_API_TOKEN"
+    MAX_RETRIES = "SYNTROPY_API_MAX_RETRIES"
+    RATE_LIMIT = "SYNTROPY_API_RATE_LIMIT"
+    PROFILES_FILE = "SYNTROPY_PROFILES_FILE"
+    CACHE_TTL = "SYNTROPY_CACHE_TTL"
+    CACHE_STALE = "SYNTROPY_CACHE_STALE"
+    CACHE_DIR = "SYNTROPY_CACHE_DIR"
+
+
+DEFAULT_CACHE_DIR = "~/.cache/syntropycli/requests"
+
+
+# Profile of the account a command runs against in the current thread, see `with_profiles`.
+_current = threading.local()
+
+
+def current_profile():
+    """Returns the profile the command runs against in the current thread or None."""
+    return getattr(_current, "profile", None)
+
+
+def profiles_path():
+    path = os.environ.get(EnvVars.PROFILES_FILE)
+    if path:
+        return path
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return os.path.join(config, "syntropycli", "profiles.ini")
+
+
+def load_profiles(path=None):
+    """Loads account profiles from an INI file.
+
+    Every section is a profile with `server` and `token` keys:
+
+        [eu]
+        server = https://controller-prod-server.syntropystack.com
+        token = ...
+
+    Returns:
+        dict: Profile name to {"server", "token"} mapping in file order.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(path or profiles_path(), encoding="utf-8")
+    return {
+        name: {
+            "server": parser.get(name, "server", fallback=None),
+            "token": parser.get(name, "token", fallback=None),
+        }
+        for name in parser.sections()
+    }
+
+
+class Timings:
+    """Collects timings of API client setup and requests made during the invocation for --timings."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.setup = 0.0
+        self.stats = []
+        self._lock = threading.Lock()
+
+    def track(self, api, setup):
+        with self._lock:
+            self.setup += setup
+            self.stats.append(RequestStats(api))
+
+    def report(self):
+        count = sum(stats.count for stats in self.stats)
+        elapsed = sum(stats.elapsed for stats in self.stats)
+        first = [stats.first for stats in self.stats if stats.first is not None]
+        rest = (
+            (elapsed - sum(first)) / (count - len(first)) if count > len(first) else 0
+        )
+        lines = [
+            f"Total: {time.monotonic() - self.started:.3f}s",
+            f"Client setup: {self.setup:.3f}s ({len(self.stats)} clients)",
+            "Authentication: 0 login round trips, the token is sent with every request",
+            f"Requests: {count} sent, {elapsed:.3f}s total request time",
+        ]
+        if first:
+            lines.append(
+                f"First request: {max(first):.3f}s (includes connection setup), "
+                f"mean of the rest: {rest:.3f}s"
+            )
+        for line in lines:
+            click.secho(line, err=True, fg="cyan")
+
+
+_timings = None
+
+
+def start_timings():
+    """Starts collecting timings of all API clients created afterwards."""
+    global _timings
+    _timings = Timings()
+    return _timings
+
+
+def report_timings():
+    """Stops collecting timings and prints the report to stderr."""
+    global _timings
+    timings, _timings = _timings, None
+    if timings is not None:
+        timings.report()
+
+
+def env_number(name, default, type=float, minimum=0):
+    """Reads a numeric environment variable. Exits with an error if the value is not a number."""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        number = type(value)
+    except ValueError:
+        number = None
+    if number is None or not number >= minimum:
+        kind = "an integer" if type is int else "a number"
+        click.secho(
+            f"Invalid {name}={value!r}: expected {kind} of at least {minimum}.",
+            err=True,
+            fg="red",
+        )
+        raise SystemExit(1)
+    return number
+
+
+def create_api(server, token):
+    """Creates an ApiClient with RequestScheduler and RequestCache installed.
+
+    SharedCache is installed between them if SYNTROPY_CACHE_TTL is set. `api.request_stats` counts
+    the requests that pass the caches, so that cache hits do not skew the measured latency.
+    """
+    start = time.monotonic()
+    config = sdk.Configuration()
+    config.host = server
+    config.api_key["api-key"] = token
+    api = sdk.ApiClient(config)
+    if _timings is not None:
+        # Requests are measured below the cache and the scheduler, so that every attempt sent
+        # over the network is accounted.
+        _timings.track(api, time.monotonic() - start)
+    RequestScheduler(
+        max_retries=env_number(EnvVars.MAX_RETRIES, DEFAULT_MAX_RETRIES, type=int),
+        rate=env_number(EnvVars.RATE_LIMIT, 0) or None,
+    ).install(api)
+    api.request_stats = RequestStats(api)
+    ttl = env_number(EnvVars.CACHE_TTL, 0)
+    if ttl > 0:
+        directory = os.environ.get(EnvVars.CACHE_DIR, DEFAULT_CACHE_DIR)
+        try:
+            shared = SharedCache(
+                directory, ttl=ttl, stale=env_number(EnvVars.CACHE_STALE, 0)
+            )
+        except OSError as err:
+            click.secho(
+                f"Cannot use {EnvVars.CACHE_DIR}={directory}: {err}.",
+                err=True,
+                fg="red",
+            )
+            raise SystemExit(1)
+        shared.install(api)
+    RequestCache().install(api)
+    return api
 
 
 def syntropy_api(func):
-    """Helper decorator that injects ApiClient instance into the arguments"""
+    """Helper decorator that injects ApiClient instance into the arguments.
+
+    All requests made with the client are retried and rate limited by RequestScheduler.
+    Read requests are memoized by RequestCache for the duration of the invocation.
+    Number of retries and requests per second limit can be set using
+    SYNTROPY_API_MAX_RETRIES and SYNTROPY_API_RATE_LIMIT environment variables.
+    Raw read responses are shared between invocations by SharedCache when SYNTROPY_CACHE_TTL is set.
+
+    When run by `with_profiles`, the server and the token of the current profile are used instead of
+    SYNTROPY_API_SERVER and SYNTROPY_API_TOKEN.
+    """
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        API_URL = os.environ.get(EnvVars.API_URL)
-        API_KEY = os.environ.get(EnvVars.TOKEN)
+        profile = current_profile()
+        if profile is not None:
+            API_URL = profile["server"]
+            API_KEY = profile["token"]
+        else:
+            API_URL = os.environ.get(EnvVars.API_URL)
+            API_KEY = os.environ.get(EnvVars.TOKEN)
 
         if API_URL is None:
             click.secho(
@@ -31,18 +218,14 @@ def syntropy_api(func):
 
         if API_KEY is None:
             click.secho(
-                f"{EnvVars.API_KEY} environment variable is missing.",
+                f"{EnvVars.TOKEN} environment variable is missing.",
                 err=True,
                 fg="red",
             )
             raise SystemExit(1)
 
         try:
-            config = sdk.Configuration()
-            config.host = API_URL
-            config.api_key["api-key"] = API_KEY
-            api = sdk.ApiClient(config)
-
+            api = create_api(API_URL, API_KEY)
             return func(*args, api=api, **kwargs)
         except ApiException as err:
             click.secho("API error occured", err=True, fg="red")
@@ -50,3 +233,120 @@ def syntropy_api(func):
             raise SystemExit(2)
 
     return wrapper
+
+
+def _run_profile(func, profile, args, kwargs):
+    _current.profile = profile
+    try:
+        with collect_tables() as tables:
+            try:
+                func(*args, **kwargs)
+                code = 0
+            except SystemExit as err:
+                code = err.code if isinstance(err.code, int) else 1
+        return tables, code
+    finally:
+        _current.profile = None
+
+
+def _print_profile_tables(results):
+    """Prints tables collected from profiles as a single table with a Profile column."""
+    items = []
+    fields = None
+    for name, tables in results:
+        for table_items, table_fields, _ in tables:
+            fields = fields or table_fields
+            for item in table_items:
+                item["profile"] = name
+                items.append(item)
+    if fields is not None:
+        print_table(items, [("Profile", "profile")] + list(fields))
+
+
+def with_profiles(func):
+    """Adds --profiles and --all-profiles options that run a read command against several accounts.
+
+    Profiles are loaded from the file at SYNTROPY_PROFILES_FILE (~/.config/syntropycli/profiles.ini
+    by default). The command runs concurrently for every selected profile, each with its own
+    ApiClient and cache, and the printed tables are merged into one table with a Profile column.
+    JSON output is streamed as NDJSON with a "profile" field as soon as a profile finishes.
+
+    NOTE: Must be applied on top of `syntropy_api`.
+    """
+
+    @click.option(
+        "--all-profiles",
+        is_flag=True,
+        default=False,
+        help="Run against all profiles from the profiles file.",
+    )
+    @click.option(
+        "--profiles",
+        default=None,
+        type=str,
+        help="Run against comma separated profiles from the profiles file.",
+    )
+    @functools.wraps(func)
+    def wrapper(*args, profiles=None, all_profiles=False, **kwargs):
+        if not profiles and not all_profiles:
+            return func(*args, **kwargs)
+
+        available = load_profiles()
+        names = (
+            list(available)
+            if all_profiles
+            else [name.strip() for name in profiles.split(",") if name.strip()]
+        )
+        missing = [name for name in names if name not in available]
+        if missing or not names:
+            click.secho(
+                f"Unknown profiles: {', '.join(missing)}"
+                if missing
+                else f"No profiles found in {profiles_path()}.",
+                err=True,
+                fg="red",
+            )
+            raise SystemExit(1)
+
+        incomplete = []
+        for name in names:
+            keys = [key for key in ("server", "token") if not available[name][key]]
+            if keys:
+                incomplete.append(f"{name} (missing {', '.join(keys)})")
+        if incomplete:
+            click.secho(
+                f"Incomplete profiles in {profiles_path()}: {', '.join(incomplete)}",
+                err=True,
+                fg="red",
+            )
+            raise SystemExit(1)
+
+        results = {}
+        code = 0
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            futures = {
+                executor.submit(_run_profile, func, available[name], args, kwargs): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                tables, profile_code = future.result()
+                if profile_code:
+                    code = max(code, profile_code)
+                    click.secho(f"Profile {name} failed.", err=True, fg="red")
+                results[name] = [table for table in tables if not table[2]]
+                for items, _, to_json in tables:
+                    if to_json:
+                        for item in items:
+                            click.echo(
+                                json.dumps(
+                                    {"profile": name, **to_builtin(item)},
+                                    default=str,
+                                )
+                            )
+
+        _print_profile_tables((name, results[name]) for name in names)
+        if code:
+            raise SystemExit(code)
+
+    return wrapper
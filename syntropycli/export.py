@@ -0,0 +1,386 @@
+"""Columnar export of endpoints, services and connections for analytics.
+
+Records are flattened into columns (e.g. `agent_1.agent_name`) and spooled to temporary files
+column by column while pages are streamed, so memory use does not grow with the number of records.
+Column types are inferred while spooling. When all pages are processed, the columns are written as:
+
+    arrow    Arrow IPC file per dataset, requires pyarrow. Load memory-mapped with
+             `pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()`.
+    parquet  Parquet file per dataset, zstd compressed, requires pyarrow.
+    npy      Directory with a NumPy .npy file per column, written without any dependencies.
+             Load memory-mapped with `numpy.load(path, mmap_mode="r")`, see `load_columns`.
+             String columns whose values differ a lot in length, e.g. tags, are stored as UTF-8
+             bytes in `<column>.npy` and their boundaries in `<column>.offsets.npy`, as a fixed
+             width array would pad every value to the longest one.
+"""
+import ast
+import json
+import marshal
+import os
+import shutil
+import struct
+import tempfile
+from collections.abc import Mapping, Sequence
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+ARROW = "arrow"
+PARQUET = "parquet"
+NPY = "npy"
+FORMATS = (ARROW, PARQUET, NPY)
+BATCH_SIZE = 65536
+# String columns are stored with offsets if a fixed width array would be this many times larger
+# than the characters it holds.
+VARIABLE_WIDTH_RATIO = 4
+MIN_VARIABLE_WIDTH = 16
+
+NULL = "null"
+BOOL = "bool"
+INT = "int"
+FLOAT = "float"
+STR = "str"
+# The resulting kind of a column that holds values of both kinds.
+_PROMOTIONS = {
+    frozenset((BOOL, INT)): INT,
+    frozenset((BOOL, FLOAT)): FLOAT,
+    frozenset((INT, FLOAT)): FLOAT,
+}
+
+
+def default_format():
+    return ARROW if pyarrow is not None else NPY
+
+
+def flatten_record(record, prefix="", row=None):
+    """Flattens a record into a single level dict of scalar values.
+
+    Nested objects become dotted keys. Lists of objects that have a name, e.g. tags, become a comma
+    separated list of names, other lists of scalars are joined and anything else is stored as JSON.
+    """
+    row = {} if row is None else row
+    for key, value in record.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, Mapping):
+            flatten_record(value, f"{path}.", row)
+        elif isinstance(value, list):
+            row[path] = _flatten_list(value)
+        else:
+            row[path] = value
+    return row
+
+
+def _flatten_list(values):
+    if all(isinstance(value, Mapping) for value in values):
+        names = [
+            next((item for key, item in value.items() if key.endswith("_name")), None)
+            for value in values
+        ]
+        if values and None not in names:
+            return ", ".join(str(name) for name in names)
+    if not any(isinstance(value, (Mapping, list)) for value in values):
+        return ", ".join(str(value) for value in values)
+    return json.dumps(values, separators=(",", ":"), default=str)
+
+
+def _kind(value):
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return INT
+    if isinstance(value, float):
+        return FLOAT
+    return STR
+
+
+class Column:
+    """Values of a single column spooled to a file, together with their inferred type."""
+
+    def __init__(self, path, rows):
+        self.path = path
+        self.kind = NULL
+        self.nulls = 0
+        self.width = 1
+        self.chars = 0
+        self.count = 0
+        # Set when a column with numbers turns out to hold strings as well, so that the width of
+        # the numbers spooled before is not known.
+        self.promoted = False
+        self._file = open(path, "wb")
+        for _ in range(rows):
+            self.append(None)
+
+    def append(self, value):
+        kind = _kind(value)
+        if kind == NULL:
+            self.nulls += 1
+        elif kind != self.kind:
+            if self.kind == NULL:
+                self.kind = kind
+            else:
+                kind = _PROMOTIONS.get(frozenset((self.kind, kind)), STR)
+                self.promoted = self.promoted or kind == STR
+                self.kind = kind
+        if self.kind == STR and value is not None:
+            length = len(str(value))
+            self.width = max(self.width, length)
+            self.chars += length
+        marshal.dump(value, self._file)
+        self.count += 1
+
+    def values(self):
+        """Yields the spooled values converted to the column type."""
+        self._file.close()
+        convert = {
+            STR: lambda x: x if x is None else str(x),
+            FLOAT: lambda x: x if x is None else float(x),
+            INT: lambda x: x if x is None else int(x),
+        }.get(self.kind, lambda x: x)
+        with open(self.path, "rb") as f:
+            for _ in range(self.count):
+                yield convert(marshal.load(f))
+
+    def close(self):
+        self._file.close()
+
+
+class Dataset:
+    """Spooled columns of a single dataset, e.g. connections."""
+
+    def __init__(self, name, directory):
+        self.name = name
+        self.directory = directory
+        self.columns = {}
+        self.rows = 0
+
+    def append(self, records):
+        for record in records:
+            row = flatten_record(record)
+            for key in row.keys() - self.columns.keys():
+                path = os.path.join(self.directory, f"{self.name}.{len(self.columns)}")
+                self.columns[key] = Column(path, self.rows)
+            for key, column in self.columns.items():
+                column.append(row.get(key))
+            self.rows += 1
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+
+
+class Exporter:
+    """Streams pages of records into columnar files.
+
+    Example:
+        with Exporter("out", ARROW) as exporter:
+            for page in iter_pages(raw_records(connections_api.v1_network_connections_get)):
+                exporter.append("connections", page)
+    """
+
+    def __init__(self, directory, format=None):
+        self.directory = directory
+        self.format = format or default_format()
+        if self.format in (ARROW, PARQUET) and pyarrow is None:
+            raise RuntimeError(f"pyarrow must be installed to export {self.format}.")
+        self.datasets = {}
+        self.paths = {}
+        self._spool = None
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._spool = tempfile.mkdtemp(prefix=".export-", dir=self.directory)
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            for dataset in self.datasets.values():
+                dataset.close()
+            if exc_type is None:
+                for name, dataset in self.datasets.items():
+                    self.paths[name] = self.write(dataset)
+        finally:
+            shutil.rmtree(self._spool, ignore_errors=True)
+
+    def append(self, name, records):
+        dataset = self.datasets.get(name)
+        if dataset is None:
+            dataset = self.datasets[name] = Dataset(name, self._spool)
+        dataset.append(records)
+
+    def write(self, dataset):
+        """Writes the dataset and returns the path of the file or directory."""
+        if self.format == NPY:
+            path = os.path.join(self.directory, dataset.name)
+            os.makedirs(path, exist_ok=True)
+            for name, column in dataset.columns.items():
+                write_npy(column, os.path.join(path, f"{name}.npy"))
+            return path
+        path = os.path.join(self.directory, f"{dataset.name}.{self.format}")
+        write_arrow(dataset, path, self.format)
+        return path
+
+
+def npy_dtype(column):
+    """Returns the NumPy dtype of a column. Nulls are stored as NaN, so nullable ints become floats."""
+    if column.kind == STR or column.kind == NULL:
+        return f"<U{column.width}"
+    if column.kind == FLOAT or column.nulls:
+        return "<f8"
+    return "|b1" if column.kind == BOOL else "<i8"
+
+
+def is_variable(column):
+    """Checks if a string column is stored as UTF-8 bytes with offsets instead of fixed width."""
+    return (
+        column.kind == STR
+        and column.width >= MIN_VARIABLE_WIDTH
+        and column.width * column.count > VARIABLE_WIDTH_RATIO * column.chars
+    )
+
+
+def _write_npy_header(f, dtype, shape):
+    header = repr({"descr": dtype, "fortran_order": False, "shape": shape})
+    # The header is padded so that the data is aligned to 64 bytes.
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)))
+    f.write(header.encode("latin1"))
+
+
+def write_npy(column, path):
+    """Writes a column in NumPy .npy format (version 1.0)."""
+    if column.promoted:
+        lengths = [len(value) for value in column.values() if value is not None]
+        column.width = max(lengths)
+        column.chars = sum(lengths)
+    if is_variable(column):
+        write_npy_strings(column, path)
+        return
+    dtype = npy_dtype(column)
+    if dtype.startswith("<U"):
+        size = int(dtype[2:]) * 4
+        encode = lambda x: (x or "").encode("utf-32-le").ljust(size, b"\0")
+    else:
+        fmt = {"<f8": "<d", "|b1": "?", "<i8": "<q"}[dtype]
+        missing = float("nan") if dtype == "<f8" else 0
+        encode = lambda x: struct.pack(fmt, missing if x is None else x)
+    with open(path, "wb") as f:
+        _write_npy_header(f, dtype, (column.count,))
+        for value in column.values():
+            f.write(encode(value))
+
+
+def write_npy_strings(column, path):
+    """Writes a string column as UTF-8 bytes and the offsets of the values to `<column>.offsets.npy`.
+
+    Value i is `data[offsets[i]:offsets[i + 1]]`, nulls are stored as empty strings.
+    """
+    end = 0
+    with open(path[: -len(".npy")] + ".offsets.npy", "wb") as f:
+        _write_npy_header(f, "<i8", (column.count + 1,))
+        f.write(struct.pack("<q", 0))
+        for value in column.values():
+            end += len(value.encode("utf-8")) if value else 0
+            f.write(struct.pack("<q", end))
+    with open(path, "wb") as f:
+        _write_npy_header(f, "|u1", (end,))
+        for value in column.values():
+            if value:
+                f.write(value.encode("utf-8"))
+
+
+class StringColumn(Sequence):
+    """Strings of a column stored with offsets, decoded on access.
+
+    Args:
+        data: UTF-8 bytes, e.g. a memory-mapped NumPy array.
+        offsets: Start of every value followed by the end of the last one.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = range(len(self))[index]
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return bytes(self.data[start:end]).decode("utf-8")
+
+
+def read_npy_header(path):
+    """Returns the dtype and shape of a .npy file."""
+    with open(path, "rb") as f:
+        if f.read(8)[:6] != b"\x93NUMPY":
+            raise ValueError(f"{path} is not a .npy file")
+        (length,) = struct.unpack("<H", f.read(2))
+        header = ast.literal_eval(f.read(length).decode("latin1"))
+    return header["descr"], header["shape"]
+
+
+def write_arrow(dataset, path, format):
+    types = {
+        NULL: pyarrow.null(),
+        BOOL: pyarrow.bool_(),
+        INT: pyarrow.int64(),
+        FLOAT: pyarrow.float64(),
+        STR: pyarrow.string(),
+    }
+    names = list(dataset.columns)
+    schema = pyarrow.schema(
+        [(name, types[dataset.columns[name].kind]) for name in names]
+    )
+    if format == PARQUET:
+        writer = pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+    try:
+        columns = [dataset.columns[name].values() for name in names]
+        for start in range(0, dataset.rows, BATCH_SIZE):
+            count = min(BATCH_SIZE, dataset.rows - start)
+            arrays = [
+                pyarrow.array([next(values) for _ in range(count)], type=field.type)
+                for values, field in zip(columns, schema)
+            ]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+
+
+def load_columns(path, mmap_mode="r"):
+    """Loads columns of an exported dataset memory-mapped.
+
+    Args:
+        path (str): An .arrow file or a directory of .npy files.
+
+    Returns:
+        Union[pyarrow.Table, dict]: An Arrow table or NumPy arrays keyed by column name. Columns
+            stored with offsets are returned as StringColumn.
+    """
+    if os.path.isdir(path):
+        import numpy
+
+        names = set(os.listdir(path))
+        columns = {}
+        for name in sorted(names):
+            if not name.endswith(".npy") or name.endswith(".offsets.npy"):
+                continue
+            column = name[: -len(".npy")]
+            data = numpy.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            if f"{column}.offsets.npy" in names:
+                offsets = os.path.join(path, f"{column}.offsets.npy")
+                data = StringColumn(data, numpy.load(offsets, mmap_mode=mmap_mode))
+            columns[column] = data
+        return columns
+    if pyarrow is None:
+        raise RuntimeError("pyarrow must be installed to load Arrow files.")
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
@@ -0,0 +1,146 @@
+"""Per endpoint health aggregated from connection statuses, latency and packet loss."""
+from collections import defaultdict
+
+HEALTHY_STATUS = "CONNECTED"
+# Contribution of a connection to the health score of both of its endpoints by status.
+# Statuses that are not listed contribute nothing.
+STATUS_WEIGHTS = {
+    HEALTHY_STATUS: 1.0,
+    "WARNING": 0.5,
+    "PENDING": 0.5,
+}
+
+
+class AgentHealth:
+    """Running aggregate of the connections of a single endpoint."""
+
+    __slots__ = (
+        "connections",
+        "statuses",
+        "weight",
+        "latency_sum",
+        "latency_count",
+        "latency_max",
+        "loss_sum",
+        "loss_count",
+        "loss_max",
+    )
+
+    def __init__(self):
+        self.connections = 0
+        self.statuses = {}
+        self.weight = 0.0
+        self.latency_sum = self.loss_sum = 0.0
+        self.latency_count = self.loss_count = 0
+        self.latency_max = self.loss_max = None
+
+    def add(self, status, latency=None, loss=None):
+        self.connections += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.weight += STATUS_WEIGHTS.get(status, 0.0)
+        if latency is not None:
+            self.latency_sum += latency
+            self.latency_count += 1
+            if self.latency_max is None or latency > self.latency_max:
+                self.latency_max = latency
+        if loss is not None:
+            self.loss_sum += loss
+            self.loss_count += 1
+            if self.loss_max is None or loss > self.loss_max:
+                self.loss_max = loss
+
+    @property
+    def degraded(self):
+        """Number of connections by status, except for healthy ones."""
+        return {
+            status: count
+            for status, count in sorted(self.statuses.items())
+            if status != HEALTHY_STATUS
+        }
+
+    @property
+    def mean_latency(self):
+        return self.latency_sum / self.latency_count if self.latency_count else None
+
+    @property
+    def mean_loss(self):
+        return self.loss_sum / self.loss_count if self.loss_count else None
+
+    @property
+    def score(self):
+        """Health score from 0 (every connection failing) to 100 (every connection connected)."""
+        return round(100 * self.weight / self.connections) if self.connections else None
+
+
+def aggregate_health(pages):
+    """Aggregates connections per endpoint in a single pass.
+
+    Args:
+        pages (Iterable[list[dict]]): Pages of connections, e.g. from `iter_pages`.
+
+    Returns:
+        dict[int, AgentHealth]: Health aggregates keyed by agent ID.
+    """
+    health = defaultdict(AgentHealth)
+    for page in pages:
+        for connection in page:
+            status = connection.get("agent_connection_group_status")
+            latency = connection.get("agent_connection_latency_ms")
+            loss = connection.get("agent_connection_packet_loss")
+            for side in ("agent_1", "agent_2"):
+                agent = connection.get(side)
+                if agent:
+                    health[agent["agent_id"]].add(status, latency, loss)
+    return dict(health)
+
+
+def _rank(row):
+    # Lowest score first, then the highest loss and latency. Endpoints without connections last.
+    return (
+        row["score"] is None,
+        row["score"] or 0,
+        -(row["mean_loss"] or 0),
+        -(row["max_latency_ms"] or 0),
+        row["agent_id"],
+    )
+
+
+def health_report(health, agents):
+    """Joins health aggregates with endpoints and ranks them from the least healthy.
+
+    Args:
+        health (dict[int, AgentHealth]): Result of `aggregate_health`.
+        agents (list[dict]): Endpoints, used for name, provider, location and tags.
+
+    Returns:
+        list[dict]: A row for every endpoint that is either listed or has connections.
+    """
+    agents = {agent["agent_id"]: agent for agent in agents}
+    empty = AgentHealth()
+    rows = []
+    for id in agents.keys() | health.keys():
+        agent = agents.get(id) or {}
+        aggregate = health.get(id, empty)
+        provider = agent.get("agent_provider")
+        rows.append(
+            {
+                "agent_id": id,
+                "agent_name": agent.get("agent_name"),
+                "agent_provider_name": provider and provider.get("agent_provider_name"),
+                "agent_location_city": agent.get("agent_location_city"),
+                "agent_tags": [
+                    tag["agent_tag_name"]
+                    for tag in agent.get("agent_tags") or []
+                    if tag
+                ],
+                "connections": aggregate.connections,
+                "degraded": aggregate.degraded,
+                "mean_latency_ms": aggregate.mean_latency,
+                "max_latency_ms": aggregate.latency_max,
+                "mean_loss": aggregate.mean_loss,
+                "max_loss": aggregate.loss_max,
+                "score": aggregate.score,
+            }
+        )
+    rows.sort(key=_rank)
+    return rows
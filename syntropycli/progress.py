@@ -0,0 +1,189 @@
+import contextlib
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import click
+
+PROGRESS_ENV = "SYNTROPY_PROGRESS"
+PROGRESS_INTERVAL_ENV = "SYNTROPY_PROGRESS_INTERVAL"
+DEFAULT_PROGRESS_INTERVAL = 10.0
+TTY_REFRESH_INTERVAL = 0.1
+
+
+def count_data(args, kwargs, result):
+    """Counts items in the "data" field of an API response.
+
+    The response is not parsed for counting, so raw calls must be wrapped after parsing, e.g.
+    `progress.wrap(raw_records(func))`. Raw HTTPResponse pages count as no items.
+    """
+    if isinstance(result, Mapping):
+        data = result.get("data")
+    else:
+        data = getattr(result, "data", None)
+    return len(data) if isinstance(data, list) else 0
+
+
+def count_call(args, kwargs, result):
+    """Counts every call as a single item."""
+    return 1
+
+
+def count_filter(args, kwargs, result):
+    """Counts IDs in the comma separated filter of a BatchedRequestFilter call."""
+    return len(str(kwargs.get("filter") or "").split(","))
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class Progress:
+    """Reports progress and throughput of a long running operation on stderr.
+
+    If stderr is a TTY, a single status line with done/total items, requests in flight,
+    items per second and ETA is refreshed in place. Otherwise a structured line is written
+    every `interval` seconds, so short operations stay silent. Reporting can be disabled
+    by setting SYNTROPY_PROGRESS=0.
+
+    Example:
+        with Progress("Updating endpoints", total=len(agents)) as progress:
+            for agent in agents:
+                with progress.request():
+                    update(agent)
+                progress.advance()
+    """
+
+    def __init__(
+        self,
+        label,
+        total=None,
+        unit="items",
+        stream=None,
+        interval=None,
+        clock=time.monotonic,
+        enabled=None,
+    ):
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.stream = stream or click.get_text_stream("stderr")
+        self.tty = self.stream.isatty()
+        if interval is None:
+            interval = float(
+                os.environ.get(PROGRESS_INTERVAL_ENV) or DEFAULT_PROGRESS_INTERVAL
+            )
+        self.interval = TTY_REFRESH_INTERVAL if self.tty else interval
+        if enabled is None:
+            enabled = os.environ.get(PROGRESS_ENV, "1").lower() not in ("0", "false")
+        self.enabled = enabled
+        self.clock = clock
+        self.started_at = clock()
+        self.reported_at = self.started_at
+        self.reported = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def rate(self):
+        elapsed = self.clock() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+        self._report()
+
+    @contextlib.contextmanager
+    def request(self):
+        """Accounts a request as in flight for the duration of the block."""
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+        self._report()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def wrap(self, func, count=count_data):
+        """Wraps an API call so that it is accounted as a request and advances progress.
+
+        Args:
+            func (callable): The API call, e.g. passed to WithPagination or BatchedRequestFilter.
+            count (callable): Computes the number of processed items from (args, kwargs, result).
+        """
+
+        def wrapper(*args, **kwargs):
+            with self.request():
+                result = func(*args, **kwargs)
+            self.advance(count(args, kwargs, result))
+            return result
+
+        return wrapper
+
+    def line(self):
+        if self.tty:
+            done = f"{self.done}/{self.total}" if self.total is not None else self.done
+            eta = self.eta
+            return (
+                f"{self.label}: {done} {self.unit}, {self.in_flight} in flight, "
+                f"{self.rate:.1f} {self.unit}/s"
+                + (f", ETA {format_duration(eta)}" if eta is not None else "")
+            )
+        fields = {
+            "progress": self.label.lower().replace(" ", "_"),
+            "done": self.done,
+            "total": self.total,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate": round(self.rate, 2),
+            "eta": round(self.eta, 1) if self.eta is not None else None,
+            "elapsed": round(self.clock() - self.started_at, 1),
+        }
+        return " ".join(
+            f"{key}={value}" for key, value in fields.items() if value is not None
+        )
+
+    def _report(self, final=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            now = self.clock()
+            if not final and now - self.reported_at < self.interval:
+                return
+            if final and not self.reported:
+                return
+            self.reported_at = now
+            self.reported = True
+            if self.tty:
+                self.stream.write("\r\033[K" + self.line() + ("\n" if final else ""))
+            else:
+                self.stream.write(self.line() + "\n")
+            self.stream.flush()
+
+    def close(self):
+        """Writes the final state if progress was reported before."""
+        self._report(final=True)
@@ -0,0 +1,123 @@
+import sys
+from collections.abc import Mapping
+
+# Fields whose values repeat across many records, e.g. every endpoint of a provider holds the same
+# provider name. Their string values are interned so that a single copy is kept in memory.
+INTERNED_FIELDS = frozenset(
+    (
+        "agent_provider_name",
+        "agent_tag_name",
+        "agent_location_city",
+        "agent_location_country",
+        "agent_status",
+        "agent_type",
+        "agent_version",
+        "agent_modified_at",
+        "agent_service_name",
+        "agent_service_type",
+        "agent_service_subnet_ip",
+        "agent_connection_group_status",
+        "agent_connection_subnet_status",
+        "agent_service_subnet_status",
+    )
+)
+
+
+class Record(Mapping):
+    """Read-mostly mapping that stores fields in slots instead of a per-instance dict.
+
+    A subclass with matching `__slots__` is created once for every distinct set of fields, so
+    records of the same resource share their layout and only hold references to values.
+    Fields that are not part of the layout can still be assigned, e.g. when merging services
+    into endpoints; they are kept in a small overflow dict.
+    """
+
+    __slots__ = ("_extra",)
+    _fields = ()
+    _slots = frozenset()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key) if key in self._slots else self._extra[key]
+        except (AttributeError, KeyError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in self._slots:
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __iter__(self):
+        yield from self._fields
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self._fields) + len(self._extra or ())
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Converts the record back into nested dicts."""
+        return {key: to_builtin(value) for key, value in self.items()}
+
+
+RESERVED = frozenset(dir(Record))
+_record_types = {}
+
+
+def record_type(fields):
+    """Returns a Record subclass for the given field names."""
+    fields = tuple(fields)
+    cls = _record_types.get(fields)
+    if cls is None:
+        cls = _record_types[fields] = type(
+            "Record",
+            (Record,),
+            {"__slots__": fields, "_fields": fields, "_slots": frozenset(fields)},
+        )
+    return cls
+
+
+def make_record(data):
+    """Creates a record from a flat dict. Nested values are stored as they are.
+
+    Dicts with keys that cannot be used as slot names are returned unchanged.
+    """
+    fields = tuple(data)
+    if not all(
+        isinstance(key, str) and key.isidentifier() and key not in RESERVED
+        for key in fields
+    ):
+        return data
+    record = object.__new__(record_type(fields))
+    record._extra = None
+    for key, value in data.items():
+        if key in INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        setattr(record, key, value)
+    return record
+
+
+def compact(data):
+    """Recursively converts dicts into compact records. Lists are converted element-wise."""
+    if isinstance(data, dict):
+        return make_record({key: compact(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [compact(item) for item in data]
+    return data
+
+
+def to_builtin(value):
+    """Converts records back into dicts, e.g. for JSON serialization."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_builtin(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_builtin(item) for item in value]
+    return value
@@ -0,0 +1,195 @@
+import email.utils
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import urllib3
+from syntropy_sdk.exceptions import ApiException
+
+RETRY_STATUSES = (0, 408, 429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (
+    urllib3.exceptions.TimeoutError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.MaxRetryError,
+)
+# Failures that happened before the request reached the server.
+NOT_SENT_EXCEPTIONS = (
+    urllib3.exceptions.NewConnectionError,
+    urllib3.exceptions.ConnectTimeoutError,
+)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket that limits the rate of requests.
+
+    If `rate` is None, requests are not limited, however, the bucket can still be blocked
+    for a period of time, e.g. after the server responded with 429 Too Many Requests.
+
+    Args:
+        rate (float): Number of tokens added per second.
+        capacity (float): Maximum number of tokens, i.e. allowed burst size.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if not self.rate:
+                        return
+                    self.tokens = min(
+                        self.capacity, self.tokens + (now - self.updated) * self.rate
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Prevents all threads from acquiring tokens for the given number of seconds."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def retry_after(err):
+    """Parses Retry-After header of an ApiException.
+
+    Returns:
+        Union[float, None]: Number of seconds to wait or None if the header is missing or invalid.
+    """
+    headers = getattr(err, "headers", None) or {}
+    value = next(
+        (v for k, v in headers.items() if k.lower() == "retry-after"),
+        None,
+    )
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_idempotent(resource_path, method):
+    """Checks if sending a request twice has the same effect as sending it once. Searches are reads."""
+    return method in IDEMPOTENT_METHODS or (
+        method == "POST" and str(resource_path).endswith("/search")
+    )
+
+
+def not_sent(err):
+    """Checks if a request failed before it reached the server, e.g. the connection was refused."""
+    if isinstance(err, urllib3.exceptions.MaxRetryError):
+        err = err.reason
+    return isinstance(err, NOT_SENT_EXCEPTIONS)
+
+
+class RequestScheduler:
+    """Retries failed requests with exponential back-off and full jitter and limits request rate.
+
+    Requests that fail with 429, 5xx, request timeouts or connection errors are retried
+    up to `max_retries` times. Requests that are not idempotent, e.g. creating API keys, are
+    retried only after 429 or if they were not sent at all, as a timed out or failed request could
+    have been carried out by the server. Retry-After header is honored and blocks the shared token
+    bucket, so that other threads back off as well.
+
+    Example:
+        RequestScheduler(rate=10).install(api)
+    """
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        rate=None,
+        base=DEFAULT_BACKOFF_BASE,
+        cap=DEFAULT_BACKOFF_CAP,
+        sleep=time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+        self.bucket = TokenBucket(rate)
+        self.sleep = sleep
+
+    def delay(self, attempt, err=None):
+        delay = random.uniform(0, min(self.cap, self.base * 2**attempt))
+        wait = retry_after(err) if isinstance(err, ApiException) else None
+        if wait is not None:
+            self.bucket.block(wait)
+            delay = max(delay, wait)
+        return delay
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except ApiException as err:
+                retry = (
+                    err.status in RETRY_STATUSES if idempotent else err.status == 429
+                )
+                if not retry or attempt >= self.max_retries:
+                    raise
+                self.sleep(self.delay(attempt, err))
+            except RETRY_EXCEPTIONS as err:
+                if attempt >= self.max_retries or not (idempotent or not_sent(err)):
+                    raise
+                self.sleep(self.delay(attempt))
+
+    def install(self, api):
+        """Routes all requests of the ApiClient through the scheduler."""
+        call_api = api.call_api
+
+        def wrapper(*args, **kwargs):
+            resource_path = args[0] if args else kwargs.get("resource_path")
+            method = args[1] if len(args) > 1 else kwargs.get("method")
+            return self.call(
+                call_api,
+                *args,
+                idempotent=is_idempotent(resource_path, method),
+                **kwargs,
+            )
+
+        api.call_api = wrapper
+        return api
+
+
+def attempt(func, *args, **kwargs):
+    """Calls `func` and returns its failure to the caller instead of raising it.
+
+    Returns:
+        tuple: (result, None) on success and (None, error) if an API error occurred.
+    """
+    try:
+        return func(*args, **kwargs), None
+    except (ApiException,) + RETRY_EXCEPTIONS as err:
+        return None, err
+
+
+def describe_error(err):
+    """Formats a failed call for reporting."""
+    if isinstance(err, ApiException):
+        return f"API error ({err.status}): {err.reason}"
+    return f"{type(err).__name__}: {err}"
@@ -0,0 +1,185 @@
+"""Comparison of two saved listings, e.g. `get-endpoints --json` outputs taken at different times.
+
+Records are matched by ID. Every record is reduced to a flat mapping of comparable fields and
+hashed, so unchanged records are skipped by comparing digests only; the field by field comparison
+is done for changed records.
+"""
+import hashlib
+import json
+from collections.abc import Mapping
+
+from syntropycli.utils import loads, service_state
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ENDPOINT = "endpoint"
+CONNECTION = "connection"
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+
+# Fields that change on every poll and would otherwise mark all records as modified.
+VOLATILE_FIELDS = (
+    "agent_modified_at",
+    "agent_connection_group_updated_at",
+    "agent_connection_latency_ms",
+    "agent_connection_packet_loss",
+)
+
+
+def load_snapshot(path):
+    """Loads records from a JSON array, a JSON object with a "data" array or NDJSON lines."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        records = loads(data)
+    except ValueError:
+        records = [loads(line) for line in data.splitlines() if line.strip()]
+    if isinstance(records, Mapping):
+        records = records.get("data", [records])
+    return records
+
+
+def record_key(record):
+    """Returns (profile, kind, ID) of a record. Profile is set in outputs of --profiles."""
+    if "agent_connection_group_id" in record:
+        return record.get("profile"), CONNECTION, record["agent_connection_group_id"]
+    return record.get("profile"), ENDPOINT, record.get("agent_id")
+
+
+def record_name(record):
+    if "agent_connection_group_id" in record:
+        names = [
+            (record.get(side) or {}).get("agent_name")
+            for side in ("agent_1", "agent_2")
+        ]
+        return " <-> ".join(str(name) for name in names)
+    return record.get("agent_name")
+
+
+def flatten(record, ignored=VOLATILE_FIELDS):
+    """Reduces a record to a flat mapping of comparable values.
+
+    Nested objects are flattened into dotted keys, tags into a sorted list of names and services
+    into a state per service name, so that e.g. a disabled service shows up as a single field.
+    Connection subnets are keyed by their service subnet ID.
+    """
+    flat = {}
+
+    def visit(prefix, value):
+        for key, item in value.items():
+            if key in ignored:
+                continue
+            path = f"{prefix}{key}"
+            if key == "agent_tags" and isinstance(item, list):
+                flat[path] = sorted(
+                    tag["agent_tag_name"]
+                    for tag in item
+                    if tag and tag.get("agent_tag_name") is not None
+                )
+            elif key == "agent_services" and isinstance(item, list):
+                try:
+                    states = {
+                        service["agent_service_name"]: service_state(service)
+                        + (
+                            ""
+                            if service["agent_service_is_active"]
+                            else ", not running"
+                        )
+                        for service in item
+                    }
+                except KeyError:
+                    # Services without subnet states, e.g. of the connection services api.
+                    flat[path] = item
+                    continue
+                for name, state in states.items():
+                    flat[f"{path}.{name}"] = state
+            elif key == "agent_connection_subnets" and isinstance(item, list):
+                for subnet in item:
+                    flat[f"{path}.{subnet['agent_service_subnet_id']}"] = (
+                        subnet.get("agent_connection_subnet_status")
+                        if subnet.get("agent_connection_subnet_is_enabled")
+                        else "disabled"
+                    )
+            elif isinstance(item, Mapping):
+                visit(f"{path}.", item)
+            else:
+                flat[path] = item
+
+    visit("", record)
+    return flat
+
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(
+            value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), default=str
+    ).encode()
+
+
+def digest(flat):
+    return hashlib.blake2b(_dumps(flat), digest_size=16).digest()
+
+
+def index_snapshot(records, ignored=VOLATILE_FIELDS):
+    """Returns {key: (digest, record)} of the records, see `record_key`."""
+    return {
+        record_key(record): (digest(flatten(record, ignored)), record)
+        for record in records
+    }
+
+
+def diff_snapshots(old, new, ignored=VOLATILE_FIELDS):
+    """Compares two snapshots.
+
+    Args:
+        old (list[dict]): Records of the earlier snapshot.
+        new (list[dict]): Records of the later snapshot.
+        ignored (Iterable[str]): Field names that are not compared.
+
+    Returns:
+        list[dict]: Changes with profile, kind, id, name, change and, for modified records,
+            a list of {"field", "old", "new"} dicts.
+    """
+    ignored = frozenset(ignored)
+    old = index_snapshot(old, ignored)
+    new = index_snapshot(new, ignored)
+    changes = []
+    for key, (new_digest, record) in new.items():
+        previous = old.get(key)
+        if previous is None:
+            changes.append(_change(key, record, ADDED))
+        elif previous[0] != new_digest:
+            before = flatten(previous[1], ignored)
+            after = flatten(record, ignored)
+            fields = [
+                {"field": field, "old": before.get(field), "new": after.get(field)}
+                for field in sorted(before.keys() | after.keys())
+                if before.get(field) != after.get(field)
+            ]
+            changes.append(_change(key, record, MODIFIED, fields))
+    for key, (_, record) in old.items():
+        if key not in new:
+            changes.append(_change(key, record, REMOVED))
+    changes.sort(key=lambda x: (str(x["profile"]), x["kind"], x["id"] or 0))
+    return changes
+
+
+def _change(key, record, change, fields=None):
+    profile, kind, id = key
+    result = {
+        "profile": profile,
+        "kind": kind,
+        "id": id,
+        "name": record_name(record),
+        "change": change,
+    }
+    if fields is not None:
+        result["fields"] = fields
+    return result
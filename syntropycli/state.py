@@ -0,0 +1,216 @@
+import json
+import math
+
+import click
+
+from syntropycli.utils import *
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+
+
+def load_state(path):
+    """Loads desired network state from a YAML or JSON file.
+
+    The file is expected to have the following structure:
+
+        endpoints:
+          - name: endpoint-1      # or `id: 123`
+            provider: AWS         # optional
+            tags: [tag1, tag2]    # optional, replaces all tags
+            services: [nginx]     # optional, enables only these services
+        connections:
+          - [endpoint-1, endpoint-2]
+
+    YAML files require PyYAML, which is installed with the `yaml` extra.
+
+    Args:
+        path (str): Path to the state file.
+
+    Returns:
+        dict: Desired state with "endpoints" and "connections" keys.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                click.secho(
+                    "PyYAML must be installed in order to load YAML files: "
+                    "pip install syntropycli[yaml]",
+                    err=True,
+                    fg="red",
+                )
+                raise SystemExit(1)
+            state = yaml.safe_load(f)
+        else:
+            state = json.load(f)
+    state = state or {}
+    return {
+        "endpoints": state.get("endpoints") or [],
+        "connections": state.get("connections") or [],
+    }
+
+
+def resolve_endpoint(endpoint, name_index, ids):
+    """Resolves an endpoint reference to an ID.
+
+    Args:
+        endpoint (Union[dict, str, int]): Either an endpoint definition with `id` or `name` field or a reference itself.
+        name_index (dict): Name to ID mapping as returned by `index_by_name`.
+        ids (set): All known endpoint IDs.
+
+    Returns:
+        int: Endpoint ID.
+    """
+    if isinstance(endpoint, dict):
+        endpoint = endpoint["id"] if "id" in endpoint else endpoint.get("name")
+    if isinstance(endpoint, int) and endpoint in ids:
+        return endpoint
+    id = name_index.get(endpoint)
+    if id is None:
+        click.secho(
+            f"Error: could not find a unique endpoint {endpoint!r}.", err=True, fg="red"
+        )
+        raise SystemExit(1)
+    return id
+
+
+def plan_changes(desired, agents, services, connections, prune=False):
+    """Computes a minimal set of changes needed to reach the desired state.
+
+    Args:
+        desired (dict): Desired state as returned by `load_state`.
+        agents (list[dict]): All endpoints.
+        services (dict[int, list[dict]]): Services of managed endpoints keyed by agent ID.
+        connections (list[dict]): All connections.
+        prune (bool): Remove connections between managed endpoints that are not in the desired state.
+
+    Returns:
+        dict: A change set with the following keys:
+            "agents" - agent ID to update payload mapping,
+            "subnets" - a list of {"agent_id", "agent_service_subnet_id", "is_enabled"} dicts,
+            "create" - a list of [agent_1_id, agent_2_id] pairs to connect,
+            "delete" - a list of connection group IDs to remove.
+    """
+    name_index = index_by_name(agents, "agent")
+    agents_by_id = {agent["agent_id"]: agent for agent in agents}
+    ids = set(agents_by_id)
+
+    changes = {"agents": {}, "subnets": [], "create": [], "delete": []}
+    managed = set()
+    for endpoint in desired["endpoints"]:
+        id = resolve_endpoint(endpoint, name_index, ids)
+        managed.add(id)
+        agent = agents_by_id[id]
+
+        payload = {}
+        provider = endpoint.get("provider")
+        current_provider = agent.get("agent_provider") or {}
+        if provider and provider != current_provider.get("agent_provider_name"):
+            payload["agent_provider_name"] = provider
+        if "tags" in endpoint:
+            tags = [tag.strip() for tag in endpoint["tags"] or []]
+            validate_items(tags)
+            current_tags = [
+                tag["agent_tag_name"] for tag in agent.get("agent_tags") or [] if tag
+            ]
+            if set(tags) != set(current_tags):
+                payload["agent_tags"] = tags
+        if payload:
+            changes["agents"][id] = payload
+
+        if "services" in endpoint:
+            agent_services = services.get(id, [])
+            known = {service["agent_service_name"] for service in agent_services}
+            missing = [name for name in endpoint["services"] or [] if name not in known]
+            if missing:
+                click.secho(
+                    f"Warning: the following services were not found on {agent.get('agent_name')}: "
+                    f"{', '.join(missing)}",
+                    err=True,
+                    fg="yellow",
+                )
+            changes["subnets"] += [
+                {
+                    "agent_id": id,
+                    "agent_service_subnet_id": subnet_id,
+                    "is_enabled": is_enabled,
+                }
+                for subnet_id, is_enabled in subnet_changes(
+                    agent_services, endpoint["services"] or []
+                )
+            ]
+
+    existing = {}
+    for connection in connections:
+        a = connection["agent_1"]["agent_id"]
+        b = connection["agent_2"]["agent_id"]
+        existing.setdefault((min(a, b), max(a, b)), []).append(
+            connection["agent_connection_group_id"]
+        )
+
+    wanted = set()
+    for pair in desired["connections"]:
+        a, b = (resolve_endpoint(endpoint, name_index, ids) for endpoint in pair)
+        pair = (min(a, b), max(a, b))
+        if pair not in wanted and pair not in existing:
+            changes["create"].append([a, b])
+        wanted.add(pair)
+
+    if prune:
+        changes["delete"] = sorted(
+            group_id
+            for (a, b), group_ids in existing.items()
+            if a in managed and b in managed and (a, b) not in wanted
+            for group_id in group_ids
+        )
+
+    return changes
+
+
+def make_plan(changes, chunk_size, concurrency, latency):
+    """Wraps a change set into a serializable plan with a cost estimate.
+
+    Args:
+        changes (dict): A change set as returned by `plan_changes`.
+        chunk_size (int): Maximum number of items per batched request.
+        concurrency (int): Maximum number of requests in flight.
+        latency (float): Expected latency of a single request in seconds.
+
+    Returns:
+        dict: The plan.
+    """
+    requests = len(changes["agents"]) + sum(
+        math.ceil(len(changes[key]) / chunk_size)
+        for key in ("subnets", "create", "delete")
+    )
+    return {
+        "changes": changes,
+        "chunk_size": chunk_size,
+        "concurrency": concurrency,
+        "requests": requests,
+        "endpoints": len(
+            set(changes["agents"])
+            | {subnet["agent_id"] for subnet in changes["subnets"]}
+        ),
+        "subnets": len(changes["subnets"]),
+        "estimated_seconds": round(math.ceil(requests / concurrency) * latency, 2),
+    }
+
+
+def save_plan(plan, file):
+    json.dump(plan, file, indent=4, default=str)
+    file.write("\n")
+
+
+def load_plan(file):
+    """Loads a plan saved with `save_plan`. JSON object keys are converted back to agent IDs."""
+    plan = json.load(file)
+    changes = plan["changes"]
+    changes["agents"] = {
+        int(id): payload for id, payload in changes.get("agents", {}).items()
+    }
+    for key in ("subnets", "create", "delete"):
+        changes.setdefault(key, [])
+    return plan
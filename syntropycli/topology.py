@@ -0,0 +1,175 @@
+"""Graph analysis of the connection network.
+
+Endpoints are nodes and connections are undirected edges. All algorithms are iterative and
+linear in the number of nodes and edges, so networks with tens of thousands of endpoints and
+hundreds of thousands of connections are analysed without hitting the recursion limit.
+"""
+from collections import Counter, deque
+from xml.sax.saxutils import escape
+
+
+class Graph:
+    """Adjacency structure of endpoints built from connections.
+
+    Attributes:
+        names (dict[int, str]): Endpoint names keyed by agent ID.
+        adjacency (dict[int, set[int]]): Neighbour IDs keyed by agent ID.
+        edges (dict[tuple[int, int], str]): Connection status keyed by (smaller ID, larger ID).
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.adjacency = {}
+        self.edges = {}
+
+    def add_node(self, id, name=None):
+        if id not in self.adjacency:
+            self.adjacency[id] = set()
+        if name is not None or id not in self.names:
+            self.names[id] = name
+
+    def add_edge(self, a, b, status=None):
+        """Adds an undirected edge. Self loops are ignored and parallel edges are merged."""
+        if a == b:
+            return
+        self.add_node(a)
+        self.add_node(b)
+        self.adjacency[a].add(b)
+        self.adjacency[b].add(a)
+        self.edges[(a, b) if a < b else (b, a)] = status
+
+    @classmethod
+    def from_connections(cls, connections, agents=()):
+        """Builds the graph from connections keyed on agent_1.agent_id and agent_2.agent_id.
+
+        Args:
+            connections (list[dict]): Connections as returned by the connections API.
+            agents (list[dict]): Endpoints, so that endpoints without connections are included.
+        """
+        graph = cls()
+        names = graph.names
+        adjacency = graph.adjacency
+        edges = graph.edges
+        for agent in agents:
+            graph.add_node(agent["agent_id"], agent.get("agent_name"))
+        # The loop is inlined as it runs once per connection.
+        for connection in connections:
+            agent_1, agent_2 = connection.get("agent_1"), connection.get("agent_2")
+            if not agent_1 or not agent_2:
+                continue
+            a, b = agent_1["agent_id"], agent_2["agent_id"]
+            for id, agent in ((a, agent_1), (b, agent_2)):
+                if id not in adjacency:
+                    adjacency[id] = set()
+                    names[id] = agent.get("agent_name")
+            if a == b:
+                continue
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+            edges[(a, b) if a < b else (b, a)] = connection.get(
+                "agent_connection_group_status"
+            )
+        return graph
+
+    def components(self):
+        """Returns connected components as lists of IDs, largest first."""
+        seen = set()
+        components = []
+        for root in self.adjacency:
+            if root in seen:
+                continue
+            seen.add(root)
+            component = [root]
+            queue = deque(component)
+            while queue:
+                for neighbour in self.adjacency[queue.popleft()]:
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        component.append(neighbour)
+                        queue.append(neighbour)
+            components.append(component)
+        components.sort(key=len, reverse=True)
+        return components
+
+    def degrees(self):
+        """Returns the degree distribution as {degree: number of endpoints}."""
+        return dict(
+            sorted(Counter(len(nodes) for nodes in self.adjacency.values()).items())
+        )
+
+    def isolated(self):
+        """Returns IDs of endpoints without connections."""
+        return [id for id, nodes in self.adjacency.items() if not nodes]
+
+    def articulation_points(self):
+        """Returns IDs of endpoints whose removal splits their component.
+
+        Tarjan's algorithm with an explicit stack in place of recursion.
+        """
+        discovery = {}
+        low = {}
+        points = set()
+        for root in self.adjacency:
+            if root in discovery:
+                continue
+            discovery[root] = low[root] = len(discovery)
+            root_children = 0
+            stack = [(root, None, iter(self.adjacency[root]))]
+            while stack:
+                node, parent, neighbours = stack[-1]
+                for neighbour in neighbours:
+                    if neighbour not in discovery:
+                        discovery[neighbour] = low[neighbour] = len(discovery)
+                        stack.append((neighbour, node, iter(self.adjacency[neighbour])))
+                        break
+                    if neighbour != parent and discovery[neighbour] < low[node]:
+                        low[node] = discovery[neighbour]
+                else:
+                    stack.pop()
+                    if parent is None:
+                        continue
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                    if parent == root:
+                        root_children += 1
+                    elif low[node] >= discovery[parent]:
+                        points.add(parent)
+            if root_children > 1:
+                points.add(root)
+        return sorted(points)
+
+    def write_dot(self, f):
+        """Writes the graph in Graphviz DOT format."""
+        f.write("graph syntropy {\n")
+        for id, name in self.names.items():
+            label = name if name is not None else id
+            f.write(f'  {id} [label="{_dot_escape(label)}"];\n')
+        for (a, b), status in self.edges.items():
+            attributes = f' [status="{_dot_escape(status)}"]' if status else ""
+            f.write(f"  {a} -- {b}{attributes};\n")
+        f.write("}\n")
+
+    def write_graphml(self, f):
+        """Writes the graph in GraphML format."""
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+            '  <key id="status" for="edge" attr.name="status" attr.type="string"/>\n'
+            '  <graph id="syntropy" edgedefault="undirected">\n'
+        )
+        for id, name in self.names.items():
+            f.write(f'    <node id="n{id}">')
+            if name is not None:
+                f.write(f'<data key="name">{escape(str(name))}</data>')
+            f.write("</node>\n")
+        for (a, b), status in self.edges.items():
+            f.write(f'    <edge source="n{a}" target="n{b}">')
+            if status:
+                f.write(f'<data key="status">{escape(str(status))}</data>')
+            f.write("</edge>\n")
+        f.write("  </graph>\n</graphml>\n")
+
+
+def _dot_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
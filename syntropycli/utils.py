@@ -1,9 +1,268 @@
+import collections
+import contextlib
+import csv
+import itertools
 import json
+import os
+import re
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta, timezone
 
 import click
 import syntropy_sdk as sdk
+from dateutil.parser import parse as parse_datetime
 from prettytable import PrettyTable
 from syntropy_sdk.utils import *
+from urllib3.response import HTTPResponse
+
+from syntropycli.records import *
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUEST_LATENCY = 0.5
+MAX_SUBNETS_PER_REQUEST = 1000
+
+
+class BatchedFilter(BatchedRequestFilter):
+    """Splits a long ID filter into batches like BatchedRequestFilter, but sends every batch once.
+
+    BatchedRequestFilter retries every batch up to 7 times waiting up to 3 minutes in between, on
+    top of the retries of RequestScheduler. Here failed requests are retried by the scheduler only.
+
+    Example:
+        BatchedFilter(agents_api.v1_network_agents_services_get, MAX_QUERY_FIELD_SIZE)(filter=ids)
+    """
+
+    def __call__(self, *args, **kwargs):
+        result = []
+        filter = self.filter_data + list(kwargs.pop("filter", []))
+        for batch in self._generate_batches(None, filter):
+            response = deserialize_result(
+                self.func(*args, filter=self._build_query(batch), **kwargs)
+            )
+            if isinstance(response, dict) and "data" in response:
+                result += response["data"]
+            else:
+                result.append(response)
+        return {"data": result}
+
+
+class WithSearchPagination:
+    """Same as WithPagination, but for search endpoints that accept skip and take in the request body.
+
+    If concurrency is greater than 1, the first page is requested alone and, if it is full, the rest
+    of the pages are requested in waves of `concurrency` parallel requests. This may result in up to
+    `concurrency - 1` requests beyond the end of the data.
+
+    Responses are parsed from raw bytes into compact records, see `raw_records`. If `model` is
+    given, records are converted into the dicts the SDK model would produce. If `progress` is given,
+    every page request is accounted in it.
+
+    Example:
+        WithSearchPagination(agents_api.v1_network_agents_search, models.V1NetworkAgentsSearchRequest)(
+            filter=models.V1AgentFilter(agent_tag_name=["tag"]), take=1000
+        )
+    """
+
+    def __init__(
+        self,
+        func,
+        request,
+        max_take=TAKE_MAX_ITEMS_PER_CALL,
+        concurrency=1,
+        progress=None,
+        model=None,
+    ):
+        func = raw_records(func, model=model)
+        self.func = progress.wrap(func) if progress else func
+        self.request = request
+        self.max_take = max_take
+        self.concurrency = max(1, concurrency)
+
+    def _pages(self, skip, take):
+        while take is None or take > 0:
+            take_now = self.max_take if take is None else min(self.max_take, take)
+            yield skip, take_now
+            skip += take_now
+            if take is not None:
+                take -= take_now
+
+    def pages(self, *args, filter=None, skip=0, take=None, **kwargs):
+        """Yields pages of data as they arrive instead of accumulating them."""
+        take = take if take else None
+        skip = skip if skip else 0
+
+        def fetch(page):
+            body = self.request(filter=filter, skip=page[0], take=page[1])
+            return page[1], self.func(body, *args, **kwargs)["data"]
+
+        pages = self._pages(skip, take)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            map_pages = executor.map if self.concurrency > 1 else map
+            wave_size = 1
+            while True:
+                wave = list(itertools.islice(pages, wave_size))
+                if not wave:
+                    return
+                wave_size = self.concurrency
+                for take_now, data in map_pages(fetch, wave):
+                    if data:
+                        yield data
+                    if len(data) < take_now:
+                        return
+
+    def __call__(self, *args, filter=None, skip=0, take=None, **kwargs):
+        result = {"data": []}
+        for data in self.pages(*args, filter=filter, skip=skip, take=take, **kwargs):
+            result["data"] += data
+        return result
+
+
+def iter_pages(func, skip=0, take=None, max_take=TAKE_MAX_ITEMS_PER_CALL, **kwargs):
+    """Yields pages of a listing that accepts skip and take, e.g. `v1_network_connections_get`.
+
+    Unlike WithPagination, pages are not accumulated, so a listing can be processed in a single
+    pass while only one page is held in memory.
+
+    Example:
+        for page in iter_pages(raw_records(connections_api.v1_network_connections_get)):
+            aggregate(page)
+    """
+    take = take if take else None
+    while take is None or take > 0:
+        take_now = max_take if take is None else min(max_take, take)
+        data = deserialize_result(func(skip=skip, take=take_now, **kwargs))["data"]
+        if data:
+            yield data
+        if len(data) < take_now:
+            return
+        skip += take_now
+        if take is not None:
+            take -= take_now
+
+
+def loads(data):
+    """Parses a JSON response body. Uses orjson if it is installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def model_dict(data, klass):
+    """Converts a record of an API payload into the dict `to_dict()` of the SDK model would return.
+
+    Fields the API omits are set to None and timestamps are parsed into datetimes, the same way the
+    SDK deserializes responses. Fields that are not part of the model are dropped.
+
+    Args:
+        data: A value of the API payload.
+        klass (str|type): SDK model class or a type name from its `swagger_types`, e.g. "list[AgentTag]".
+    """
+    if data is None:
+        return None
+    if isinstance(klass, str):
+        if klass.startswith("list["):
+            return [model_dict(item, klass[5:-1]) for item in data]
+        if klass.startswith("dict("):
+            value_klass = klass[5:-1].split(", ", 1)[1]
+            return {key: model_dict(value, value_klass) for key, value in data.items()}
+        if klass in ("datetime", "date") and isinstance(data, str):
+            value = parse_datetime(data)
+            return value if klass == "datetime" else value.date()
+        klass = getattr(sdk.models, klass, None)
+    if not getattr(klass, "swagger_types", None) or not isinstance(data, Mapping):
+        return data
+    return {
+        attr: model_dict(data.get(klass.attribute_map[attr]), attr_type)
+        for attr, attr_type in klass.swagger_types.items()
+    }
+
+
+def raw_records(func, model=None):
+    """Wraps an API call so that its response is parsed from raw bytes into compact records.
+
+    The call is made with `_preload_content=False`, which skips SDK model deserialization, and
+    every page is converted as soon as it arrives, so only a single page of full dicts is held
+    in memory at a time.
+
+    Records hold the fields of the API payload only. If `model` is given, e.g. `models.V1Agent`,
+    records are converted with `model_dict` instead, so that they match the output of commands that
+    used to deserialize the response into SDK models.
+    """
+
+    def wrapper(*args, **kwargs):
+        kwargs.setdefault("_preload_content", False)
+        result = func(*args, **kwargs)
+        if isinstance(result, HTTPResponse):
+            result = loads(result.data)
+            if model is not None and isinstance(result, dict) and "data" in result:
+                result["data"] = [model_dict(item, model) for item in result["data"]]
+        else:
+            result = deserialize_result(result)
+        if isinstance(result, dict) and "data" in result:
+            result["data"] = compact(result["data"])
+        return result
+
+    return wrapper
+
+
+class RequestStats:
+    """Counts requests made through an ApiClient and measures their latency.
+
+    The ApiClient instance is instrumented in place, so that every api class created with it is accounted.
+
+    Example:
+        stats = RequestStats(api)
+        sdk.AgentsApi(api).v1_network_agents_get()
+        stats.count, stats.latency
+
+    `first` holds the latency of the first request, which includes establishing the connection.
+    """
+
+    def __init__(self, api):
+        self.count = 0
+        self.elapsed = 0.0
+        self.first = None
+        self._lock = threading.Lock()
+        call_api = api.call_api
+
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return call_api(*args, **kwargs)
+            finally:
+                with self._lock:
+                    elapsed = time.monotonic() - start
+                    self.count += 1
+                    self.elapsed += elapsed
+                    if self.first is None:
+                        self.first = elapsed
+
+        api.call_api = wrapper
+
+    @property
+    def latency(self):
+        """Mean request latency in seconds or DEFAULT_REQUEST_LATENCY if nothing was measured."""
+        return self.elapsed / self.count if self.count else DEFAULT_REQUEST_LATENCY
+
+
+_output = threading.local()
+
+
+@contextlib.contextmanager
+def collect_tables():
+    """Collects (items, fields, to_json) of print_table calls made in the current thread instead of printing them."""
+    tables = _output.tables = []
+    try:
+        yield tables
+    finally:
+        _output.tables = None
 
 
 def print_table(items, fields, to_json=False):
@@ -21,6 +280,10 @@ def print_table(items, fields, to_json=False):
         fields (list[tuple]): Field definition.
         to_json (boolean): Outputs a JSON instead of a table if True.
     """
+    tables = getattr(_output, "tables", None)
+    if tables is not None:
+        tables.append((items, fields, to_json))
+        return
 
     def get_field(item, field):
         if item is None:
@@ -33,7 +296,7 @@ def print_table(items, fields, to_json=False):
             field_value = item
             for subfield in field_param:
                 field_value = get_field(field_value, [subfield])
-                if not isinstance(field_value, dict):
+                if not isinstance(field_value, Mapping):
                     break
         else:
             field_value = (
@@ -50,7 +313,7 @@ def print_table(items, fields, to_json=False):
             table.add_row([get_field(item, field[1:]) for field in fields])
         click.echo(str(table))
     else:
-        click.echo(json.dumps(items, indent=4, default=str))
+        click.echo(json.dumps(to_builtin(items), indent=4, default=str))
 
 
 def find_by_name(items, name, field):
@@ -78,6 +341,263 @@ def find_by_name(items, name, field):
     return matching_ids[0]
 
 
+def index_by_name(items, field):
+    """Builds a name to ID lookup table for a collection of objects.
+
+    Names that belong to several objects are mapped to None, since such names are ambiguous.
+
+    Args:
+        items (iterable): A collection of objects to index.
+        field (str): Field name prefix. "_name" and "_id" will be appended to get e.g. "agent_id".
+
+    Returns:
+        dict[str, Union[int, None]]: A name to ID mapping.
+    """
+    index = {}
+    for item in items:
+        name = item.get(f"{field}_name")
+        index[name] = None if name in index else item.get(f"{field}_id")
+    return index
+
+
+def read_pairs(file):
+    """Reads endpoint pairs from a CSV file lazily.
+
+    Every non-empty line must contain exactly two values. Lines starting with "#" are ignored.
+
+    Args:
+        file (file): A file object to read from.
+
+    Yields:
+        tuple[int, tuple[str, str]]: Line number and the pair.
+    """
+    for line_number, row in enumerate(csv.reader(file), 1):
+        row = [value.strip() for value in row]
+        if not row or not any(row) or row[0].startswith("#"):
+            continue
+        if len(row) != 2 or not all(row):
+            click.secho(
+                f"Error: line {line_number} must contain exactly two endpoints.",
+                err=True,
+                fg="red",
+            )
+            raise SystemExit(1)
+        yield line_number, (row[0], row[1])
+
+
+def iter_chunks(iterable, size):
+    """Splits an iterable into lists of up to `size` consecutive items without consuming it upfront."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_bounded(func, items, concurrency):
+    """Calls `func` for every item using at most `concurrency` worker threads.
+
+    Items are consumed lazily, so no more than `concurrency` items are held in flight at any time.
+    Exceptions raised by `func` are propagated to the caller.
+
+    Args:
+        func (callable): A function that accepts a single item.
+        items (iterable): Items to process.
+        concurrency (int): Maximum number of concurrent calls.
+
+    Yields:
+        tuple: (item, result) pairs in the order of completion.
+    """
+    concurrency = max(1, concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        for item in items:
+            if len(pending) >= concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            pending[executor.submit(func, item)] = item
+        for future in as_completed(pending):
+            yield pending[future], future.result()
+
+
+class Checkpoint:
+    """Records indices of processed items in a file so that an interrupted run could be resumed.
+
+    Each line of the file holds comma separated index ranges, e.g. "0-99,120-139".
+    If path is None, the progress is tracked in memory only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    for span in filter(None, line.strip().split(",")):
+                        start, _, end = span.partition("-")
+                        self.done.update(range(int(start), int(end or start) + 1))
+
+    def __contains__(self, index):
+        return index in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, indices):
+        indices = sorted(indices)
+        self.done.update(indices)
+        if not self.path or not indices:
+            return
+        spans = []
+        start = end = indices[0]
+        for index in indices[1:]:
+            if index != end + 1:
+                spans.append((start, end))
+                start = index
+            end = index
+        spans.append((start, end))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(",".join(f"{a}-{b}" for a, b in spans) + "\n")
+
+    def remove(self):
+        """Deletes the file once all items are processed, so that a later run starts over."""
+        self.done.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def connection_pairs(connections):
+    """Builds a set of unordered agent ID pairs that are already connected.
+
+    Args:
+        connections (iterable): Connection objects with agent_1 and agent_2 fields.
+
+    Returns:
+        set[tuple[int, int]]: Pairs of agent IDs with the smaller ID first.
+    """
+    pairs = set()
+    for connection in connections:
+        a = connection["agent_1"]["agent_id"]
+        b = connection["agent_2"]["agent_id"]
+        pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+
+def mesh_pairs(ids, existing=()):
+    """Lazily generates all unordered pairs of `ids` that are not in `existing`."""
+    for a, b in itertools.combinations(sorted(set(ids)), 2):
+        if (a, b) not in existing:
+            yield a, b
+
+
+def star_pairs(hub, ids, existing=()):
+    """Lazily generates pairs between `hub` and every other ID that are not in `existing`."""
+    for id in sorted(set(ids)):
+        if id == hub:
+            continue
+        if (min(hub, id), max(hub, id)) not in existing:
+            yield hub, id
+
+
+DURATION_UNITS = {
+    "s": "seconds",
+    "m": "minutes",
+    "h": "hours",
+    "d": "days",
+    "w": "weeks",
+}
+
+
+def parse_duration(value):
+    """Parses a duration such as "90s", "30m", "12h", "7d" or "2w".
+
+    Raises:
+        ValueError: If the duration is invalid.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", value or "")
+    if not match:
+        raise ValueError(f"invalid duration {value!r}")
+    return timedelta(**{DURATION_UNITS[match.group(2)]: float(match.group(1))})
+
+
+def open_private(path):
+    """Creates a text file readable and writable by the owner only, e.g. for secrets.
+
+    Raises:
+        FileExistsError: If the file exists, so that earlier secrets are never overwritten.
+    """
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w")
+
+
+def write_ndjson(f, record):
+    """Writes a record as a JSON line and flushes it, so that it is kept if the process fails."""
+    f.write(json.dumps(record, default=str) + "\n")
+    f.flush()
+
+
+def parse_timestamp(value):
+    """Parses an ISO 8601 timestamp returned by the API into an aware datetime."""
+    value = value.replace("Z", "+0000")
+    if len(value) > 6 and value[-3] == ":" and value[-6] in "+-":
+        value = value[:-3] + value[-2:]
+    for format in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(value, format)
+        except ValueError:
+            pass
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def connection_matcher(
+    statuses=None,
+    agent_ids=None,
+    min_latency=None,
+    min_packet_loss=None,
+    updated_before=None,
+):
+    """Builds a predicate that matches connections by criteria. All given criteria must match.
+
+    Args:
+        statuses (Iterable[str]): Connection group statuses, e.g. ERROR.
+        agent_ids (Iterable[int]): Either endpoint of the connection must be one of these.
+        min_latency (float): Minimum latency in milliseconds.
+        min_packet_loss (float): Minimum packet loss.
+        updated_before (datetime): Connection must not have been updated since.
+
+    Returns:
+        callable: A function that accepts a connection and returns True if it matches.
+    """
+    statuses = set(statuses) if statuses else None
+    agent_ids = set(agent_ids) if agent_ids is not None else None
+
+    def match(connection):
+        if statuses and connection["agent_connection_group_status"] not in statuses:
+            return False
+        if agent_ids is not None and not (
+            connection["agent_1"]["agent_id"] in agent_ids
+            or connection["agent_2"]["agent_id"] in agent_ids
+        ):
+            return False
+        for field, minimum in (
+            ("agent_connection_latency_ms", min_latency),
+            ("agent_connection_packet_loss", min_packet_loss),
+        ):
+            value = connection.get(field)
+            if minimum is not None and (value is None or value < minimum):
+                return False
+        if updated_before is not None:
+            updated_at = connection.get("agent_connection_group_updated_at")
+            if not updated_at or parse_timestamp(updated_at) >= updated_before:
+                return False
+        return True
+
+    return match
+
+
 def collect_endpoint_services(services):
     def format_service_name(service):
         name = service["agent_service_name"]
@@ -104,26 +624,134 @@ def collect_endpoint_services(services):
     return services if services else "-"
 
 
-def collect_connection_services(services):
-    service_map = {}
+SERVICE_ENABLED = "enabled"
+SERVICE_PARTIAL = "partial"
+SERVICE_DISABLED = "disabled"
+SERVICE_STATES = (SERVICE_ENABLED, SERVICE_PARTIAL, SERVICE_DISABLED)
+
+
+def service_state(service):
+    """Returns whether all, some or none of the service subnets are active and enabled by the user."""
+    subnets = [
+        subnet["agent_service_subnet_is_active"]
+        and subnet["agent_service_subnet_is_user_enabled"]
+        for subnet in service["agent_service_subnets"]
+    ]
+    if subnets and all(subnets):
+        return SERVICE_ENABLED
+    return SERVICE_PARTIAL if any(subnets) else SERVICE_DISABLED
+
+
+def service_matrix(agent_services):
+    """Counts endpoints by service and state.
+
+    Args:
+        agent_services (dict[int, list[dict]]): Services as returned by the services api grouped by agent ID.
+
+    Returns:
+        tuple[Counter, dict[str, set[int]]]: Number of endpoints keyed by (service name, state), where state
+            is one of SERVICE_STATES or "inactive" for services that are not running, and IDs of endpoints
+            exposing each service.
+    """
+    counts = collections.Counter()
+    endpoints = collections.defaultdict(set)
+    for agent_id, services in agent_services.items():
+        for service in services:
+            name = service["agent_service_name"]
+            if agent_id in endpoints[name]:
+                continue
+            endpoints[name].add(agent_id)
+            counts[name, service_state(service)] += 1
+            if not service["agent_service_is_active"]:
+                counts[name, "inactive"] += 1
+    return counts, dict(endpoints)
+
+
+def service_subnet_index(connections_services):
+    """Maps agent_service_subnet_id to the service name for every agent of the connections.
+
+    Agents appear in many connections, but services of each agent are walked only once. A later
+    connection may list services the first one did not; `collect_connection_services` indexes the
+    services of such a connection when it does not find a subnet.
+
+    Args:
+        connections_services (list[dict]): Response data of the connections services api.
+
+    Returns:
+        dict[int, str]: Service names keyed by agent_service_subnet_id.
+    """
+    index = {}
+    seen = set()
+    for connection in connections_services:
+        for side in ("agent_1", "agent_2"):
+            agent = connection.get(side)
+            if not agent:
+                continue
+            agent_id = agent.get("agent_id")
+            if agent_id is not None:
+                if agent_id in seen:
+                    continue
+                seen.add(agent_id)
+            for service in agent.get("agent_services") or []:
+                name = service["agent_service_name"]
+                for subnet in service["agent_service_subnets"]:
+                    index[subnet["agent_service_subnet_id"]] = name
+    return index
+
+
+def collect_connection_services(services, subnet_index=None):
+    """Formats services of a connection with their connection subnet status.
+
+    Args:
+        services (dict): Connection services as returned by the connections services api.
+        subnet_index (dict[int, str]): Index built with `service_subnet_index`. It is updated with
+            the services of the connection if it misses any of its subnets. If omitted, an index of
+            the two agents of the connection is built on every call.
+    """
+    if subnet_index is None:
+        subnet_index = service_subnet_index([services])
     state_map = {
         "PENDING": "~",
         "ERROR": "!",
         "OK": "^",
     }
-    for service in (
-        services["agent_1"]["agent_services"] + services["agent_2"]["agent_services"]
-    ):
-        for subnet in service["agent_service_subnets"]:
-            service_map[subnet["agent_service_subnet_id"]] = service[
-                "agent_service_name"
-            ]
-    services = {
-        f"{service_map[subnet['agent_service_subnet_id']]}{state_map.get(subnet['agent_connection_subnet_status'], '?')}"
-        for subnet in services["agent_connection_subnets"]
-        if subnet["agent_connection_subnet_is_enabled"]
-    }
-    return ", ".join(services) if services else "-"
+
+    def collect(index):
+        return {
+            f"{index[subnet['agent_service_subnet_id']]}{state_map.get(subnet['agent_connection_subnet_status'], '?')}"
+            for subnet in services["agent_connection_subnets"]
+            if subnet["agent_connection_subnet_is_enabled"]
+        }
+
+    try:
+        names = collect(subnet_index)
+    except KeyError:
+        subnet_index.update(service_subnet_index([services]))
+        names = collect(subnet_index)
+    return ", ".join(names) if names else "-"
+
+
+def subnet_changes(services, enabled_services):
+    """Computes service subnets whose state differs from the desired set of enabled services.
+
+    Args:
+        services (list[dict]): Endpoint services as returned by the services api.
+        enabled_services (Iterable[str]): Names of services that must be enabled.
+
+    Returns:
+        list[tuple[int, bool]]: (agent_service_subnet_id, is_enabled) tuples.
+    """
+    enabled_services = set(enabled_services)
+    return [
+        (
+            subnet["agent_service_subnet_id"],
+            service["agent_service_name"] in enabled_services,
+        )
+        for service in services
+        for subnet in service["agent_service_subnets"]
+        if subnet["agent_service_subnet_is_user_enabled"]
+        != (service["agent_service_name"] in enabled_services)
+    ]
 
 
 def validate_items(items):
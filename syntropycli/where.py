@@ -0,0 +1,408 @@
+"""Filter expressions of the --where option.
+
+An expression compares record fields with values and combines comparisons with `and`, `or`, `not`
+and parentheses, for example:
+
+    agent_is_online == false and agent_location_city == "Vilnius"
+    agent_connection_latency_ms > 150 or agent_connection_group_status in ["ERROR", "WARNING"]
+    agent_tags.agent_tag_name == "prod" and agent_1.agent_name =~ "^eu-"
+
+Fields are dotted paths into nested records. If a path goes through a list, e.g. tags, a comparison
+matches if any of the elements matches. Supported operators are ==, !=, <, <=, >, >=, in and =~
+(regular expression search). Values are numbers, quoted strings, true, false and null; a missing
+field equals null.
+
+Expressions are parsed once into a predicate. Comparisons that are combined with `and` at the top
+level and have an equivalent in the search API filters are also sent to the server, so that less
+data is transferred. The full predicate is still applied to every record, hence the server filters
+only need to return a superset of the matching records.
+"""
+import ast
+import operator
+import re
+from collections.abc import Mapping
+
+import click
+from syntropy_sdk import models
+
+from syntropycli.utils import parse_timestamp
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+        |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+        |(?P<op>==|!=|<=|>=|=~|<|>|\(|\)|\[|\]|,)
+        |(?P<name>[A-Za-z_][\w.]*)
+    )""",
+    re.VERBOSE,
+)
+_CONSTANTS = {"true": True, "false": False, "null": None}
+_KEYWORDS = {"and", "or", "not", "in"}
+_COMPARISONS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Fields of V1AgentFilter that accept a list of values, keyed by record field path.
+# Tags are multi-valued: a record can match several tag conditions, so only one of them is sent.
+AGENT_FILTER_FIELDS = {
+    ("agent_id",): "agent_id",
+    ("agent_provider", "agent_provider_id"): "agent_provider_id",
+    ("agent_tags", "agent_tag_id"): "agent_tag_id",
+    ("agent_tags", "agent_tag_name"): "agent_tag_name",
+    ("agent_type",): "agent_type",
+    ("agent_version",): "agent_version",
+    ("agent_location_country",): "agent_location_country",
+}
+MULTI_VALUED = {"agent_tag_id", "agent_tag_name"}
+# Enum fields accept only these values, other values are compared locally.
+ENUM_VALUES = {
+    "agent_type": {
+        value for key, value in vars(models.AgentType).items() if key.isupper()
+    },
+}
+ID_FIELDS = {
+    "agent_id",
+    "agent_provider_id",
+    "agent_tag_id",
+    "agent_connection_group_id",
+}
+# V1ConnectionFilter.agent_id matches connections with either endpoint in the list.
+CONNECTION_FILTER_FIELDS = {
+    ("agent_connection_group_id",): "agent_connection_group_id",
+    ("agent_1", "agent_id"): "agent_id",
+    ("agent_2", "agent_id"): "agent_id",
+}
+
+
+class WhereError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise WhereError(
+                f"unexpected character at position {position}: {text[position:]!r}"
+            )
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        elif kind == "string":
+            value = ast.literal_eval(value)
+        elif kind == "name" and value in _CONSTANTS:
+            kind, value = "constant", _CONSTANTS[value]
+        elif kind == "name" and value in _KEYWORDS:
+            kind = "keyword"
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser producing nested tuples:
+
+    ("or", [nodes]), ("and", [nodes]), ("not", node) and ("cmp", path, operator, value).
+    """
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return (
+            self.tokens[self.position]
+            if self.position < len(self.tokens)
+            else (None, None)
+        )
+
+    def next(self, kind=None, value=None):
+        token = self.peek()
+        if (
+            token[0] is None
+            or (kind and token[0] != kind)
+            or (value and token[1] != value)
+        ):
+            expected = value or kind or "a token"
+            found = "end of expression" if token[0] is None else repr(token[1])
+            raise WhereError(f"expected {expected}, found {found}")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise WhereError(f"unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ("keyword", "or"):
+            self.next()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == ("keyword", "and"):
+            self.next()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.next()
+            return ("not", self.parse_not())
+        if self.peek() == ("op", "("):
+            self.next()
+            node = self.parse_or()
+            self.next("op", ")")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        path = tuple(self.next("name").split("."))
+        if self.peek() == ("keyword", "in"):
+            self.next()
+            self.next("op", "[")
+            values = [self.parse_value()]
+            while self.peek() == ("op", ","):
+                self.next()
+                values.append(self.parse_value())
+            self.next("op", "]")
+            return ("cmp", path, "in", values)
+        op = self.next("op")
+        if op not in _COMPARISONS and op not in ("!=", "=~"):
+            raise WhereError(f"expected a comparison operator, found {op!r}")
+        value = self.parse_value()
+        if op == "=~":
+            if not isinstance(value, str):
+                raise WhereError("=~ expects a quoted regular expression")
+            try:
+                value = re.compile(value)
+            except re.error as err:
+                raise WhereError(f"invalid regular expression: {err}")
+        return ("cmp", path, op, value)
+
+    def parse_value(self):
+        kind, value = self.peek()
+        if kind not in ("number", "string", "constant"):
+            raise WhereError(f"expected a value, found {value!r}")
+        self.position += 1
+        return value
+
+
+def _resolve(record, path):
+    """Returns all values at the path. Lists along the path are expanded."""
+    values = [record]
+    for key in path:
+        found = []
+        for value in values:
+            if isinstance(value, list):
+                found.extend(
+                    item[key]
+                    for item in value
+                    if isinstance(item, Mapping) and key in item
+                )
+            elif isinstance(value, Mapping) and key in value:
+                found.append(value[key])
+        values = found
+    result = []
+    for value in values:
+        if isinstance(value, list):
+            result.extend(value)
+        else:
+            result.append(value)
+    return result or [None]
+
+
+def _test(op, value):
+    if op == "in":
+        return lambda x: x in value
+    if op == "=~":
+        return lambda x: isinstance(x, str) and value.search(x) is not None
+    compare = _COMPARISONS[op]
+
+    def test(x):
+        try:
+            return compare(x, value)
+        except TypeError:
+            return False
+
+    return test
+
+
+def _compile(node):
+    kind = node[0]
+    if kind == "and":
+        predicates = [_compile(item) for item in node[1]]
+        return lambda record: all(predicate(record) for predicate in predicates)
+    if kind == "or":
+        predicates = [_compile(item) for item in node[1]]
+        return lambda record: any(predicate(record) for predicate in predicates)
+    if kind == "not":
+        predicate = _compile(node[1])
+        return lambda record: not predicate(record)
+    _, path, op, value = node
+    if op == "!=":
+        equals = _compile(("cmp", path, "==", value))
+        return lambda record: not equals(record)
+    test = _test(op, value)
+    if len(path) == 1:
+        key = path[0]
+
+        def match(record):
+            value = record.get(key)
+            if isinstance(value, list) and value:
+                return any(test(item) for item in value)
+            return test(value if value != [] else None)
+
+        return match
+    return lambda record: any(test(value) for value in _resolve(record, path))
+
+
+class Where:
+    """A compiled --where expression.
+
+    Example:
+        where = Where('agent_connection_latency_ms > 150')
+        slow = where.select(iter_pages(connections_get), take=10)
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.node = _Parser(text).parse()
+        self.matches = _compile(self.node)
+
+    def __repr__(self):
+        return f"Where({self.text!r})"
+
+    def conjuncts(self):
+        """Comparisons that must all hold for a record to match."""
+        nodes = self.node[1] if self.node[0] == "and" else [self.node]
+        return [node for node in nodes if node[0] == "cmp"]
+
+    def select(self, pages, skip=0, take=None):
+        """Returns records of the pages that match, applying skip and take to the matches.
+
+        Pages are consumed only until `take` matching records are found.
+        """
+        result = []
+        for page in pages:
+            for record in page:
+                if not self.matches(record):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                result.append(record)
+                if take and len(result) >= take:
+                    return result
+        return result
+
+    def agent_filter(self, filters=None):
+        """Adds criteria that can be evaluated by the agents search api to a V1AgentFilter.
+
+        Returns:
+            V1AgentFilter: The updated filter.
+        """
+        filters = filters or models.V1AgentFilter()
+        for _, path, op, value in self.conjuncts():
+            field = AGENT_FILTER_FIELDS.get(path)
+            if field is not None:
+                values = _filter_values(field, op, value)
+                if values is None:
+                    continue
+                current = getattr(filters, field)
+                if current is None:
+                    setattr(filters, field, values)
+                elif field not in MULTI_VALUED:
+                    setattr(filters, field, [x for x in current if x in values])
+            elif path == ("agent_name",) and op == "==" and isinstance(value, str):
+                filters.agent_name = filters.agent_name or value
+            elif path == ("agent_modified_at",) and op in ("<", "<=", ">", ">="):
+                try:
+                    timestamp = parse_timestamp(value)
+                except (TypeError, ValueError):
+                    continue
+                if op in (">", ">="):
+                    filters.agent_modified_at_from = timestamp
+                else:
+                    filters.agent_modified_at_to = timestamp
+        return filters
+
+    def connection_filter(self, filters=None):
+        """Adds criteria that can be evaluated by the connections search api to a V1ConnectionFilter.
+
+        Returns:
+            V1ConnectionFilter: The updated filter.
+        """
+        filters = filters or models.V1ConnectionFilter()
+        for _, path, op, value in self.conjuncts():
+            field = CONNECTION_FILTER_FIELDS.get(path)
+            values = field and _filter_values(field, op, value)
+            if not values:
+                continue
+            current = getattr(filters, field)
+            if current is None:
+                setattr(filters, field, values)
+            elif field == "agent_id":
+                # Conditions on agent_1 and agent_2 hold for different endpoints of the connection.
+                setattr(
+                    filters, field, current + [x for x in values if x not in current]
+                )
+            else:
+                setattr(filters, field, [x for x in current if x in values])
+        return filters
+
+
+def _filter_values(field, op, value):
+    values = [value] if op == "==" else value if op == "in" else None
+    if values is None:
+        return None
+    if field in ID_FIELDS:
+        if not all(type(x) is int for x in values):
+            return None
+    elif not all(isinstance(x, str) for x in values):
+        return None
+    if field in ENUM_VALUES and not ENUM_VALUES[field].issuperset(values):
+        return None
+    return values
+
+
+def has_criteria(filters):
+    """Checks if any field of a search filter is set."""
+    return any(value is not None for value in filters.to_dict().values())
+
+
+def matches_nothing(filters):
+    """Checks if a search filter has an empty list, e.g. from disjoint ID conditions.
+
+    The search API may treat an empty list as no filter, so such a filter must not be sent.
+    """
+    return any(value == [] for value in filters.to_dict().values())
+
+
+class WhereType(click.ParamType):
+    """Click parameter type that compiles a --where expression."""
+
+    name = "expression"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, Where):
+            return value
+        try:
+            return Where(value)
+        except WhereError as err:
+            self.fail(f"{value!r}: {err}", param, ctx)
+
+
+WHERE = WhereType()
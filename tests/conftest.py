@@ -9,6 +9,13 @@ from syntropy_sdk.rest import ApiException
 from syntropycli import __main__ as ctl
 
 
+@pytest.fixture(autouse=True)
+def completion_index(tmp_path):
+    path = tmp_path / "completion.json"
+    with mock.patch.dict(os.environ, {"SYNTROPY_COMPLETION_INDEX": str(path)}):
+        yield path
+
+
 @pytest.fixture
 def login_mock():
     with mock.patch(
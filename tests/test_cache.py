@@ -0,0 +1,243 @@
+import glob
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+from syntropy_sdk.rest import ApiException
+from urllib3.response import HTTPResponse
+
+from syntropycli import cache
+
+
+@pytest.fixture
+def api():
+    api = mock.Mock()
+    api.sanitize_for_serialization.side_effect = lambda x: x
+    api.call_api.side_effect = lambda path, method, *args, **kwargs: {
+        "data": [path, method, kwargs.get("body")]
+    }
+    return api
+
+
+def test_request_cache__memoizes_reads(api):
+    call_api = api.call_api
+    request_cache = cache.RequestCache()
+    request_cache.install(api)
+    result = api.call_api("/v1/network/agents", "GET", {}, [("take", 10)])
+    result["data"].append("modified")
+    assert api.call_api("/v1/network/agents", "GET", {}, [("take", 10)]) == {
+        "data": ["/v1/network/agents", "GET", None]
+    }
+    api.call_api("/v1/network/agents", "GET", {}, [("take", 20)])
+    api.call_api("/v1/network/agents/search", "POST", body={"filter": 1})
+    api.call_api("/v1/network/agents/search", "POST", body={"filter": 1})
+    assert call_api.call_count == 3
+    assert request_cache.hits == 2
+    assert request_cache.misses == 3
+
+
+def test_request_cache__invalidation(api):
+    call_api = api.call_api
+    cache.RequestCache().install(api)
+    api.call_api("/v1/network/agents", "GET")
+    api.call_api("/v1/network/connections", "GET")
+    api.call_api("/v1/network/agents/{agent_id}", "PATCH", {"agent_id": 1})
+    api.call_api("/v1/network/agents", "GET")
+    api.call_api("/v1/network/connections", "GET")
+    assert call_api.call_count == 4
+    api.call_api("/v1/network/unknown", "POST")
+    api.call_api("/v1/network/connections", "GET")
+    assert call_api.call_count == 6
+
+
+def test_request_cache__http_response(api):
+    api.call_api.side_effect = lambda *args, **kwargs: HTTPResponse(
+        body=b'{"data": []}', status=200, preload_content=False
+    )
+    cache.RequestCache().install(api)
+    first = api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    second = api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert first.data == second.data == b'{"data": []}'
+    assert first is not second
+
+
+def test_request_cache__single_flight(api):
+    event = threading.Event()
+    calls = []
+
+    def slow_call(*args, **kwargs):
+        calls.append(args)
+        event.wait(1)
+        return {"data": []}
+
+    api.call_api.side_effect = slow_call
+    cache.RequestCache().install(api)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(api.call_api("/v1/network/agents", "GET"))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    event.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"data": []}] * 5
+
+
+def test_request_cache__errors_are_not_cached(api):
+    api.call_api.side_effect = [ApiException(status=404), {"data": []}]
+    cache.RequestCache().install(api)
+    with pytest.raises(ApiException):
+        api.call_api("/v1/network/agents", "GET")
+    assert api.call_api("/v1/network/agents", "GET") == {"data": []}
+
+
+@pytest.fixture
+def raw_api(api):
+    api.configuration.host = "https://controller.example.com"
+    api.configuration.api_key = {"api-key": "token"}
+    api.call_api.side_effect = lambda path, *args, **kwargs: HTTPResponse(
+        body=f'{{"data": ["{path}"]}}'.encode(),
+        status=200,
+        headers={"Content-Type": "application/json"},
+        preload_content=False,
+    )
+    return api
+
+
+def test_shared_cache__shared_between_instances(raw_api, tmp_path):
+    call_api = raw_api.call_api
+    cache.SharedCache(tmp_path, ttl=60).install(raw_api)
+    first = raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    second_api = mock.Mock(configuration=raw_api.configuration)
+    second_api.sanitize_for_serialization.side_effect = lambda x: x
+    second_api.call_api = call_api
+    shared = cache.SharedCache(tmp_path, ttl=60)
+    shared.install(second_api)
+    second = second_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert first.data == second.data == b'{"data": ["/v1/network/agents"]}'
+    assert second.headers["Content-Type"] == "application/json"
+    assert call_api.call_count == 1
+    assert shared.hits == 1
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".entry")]
+
+
+def test_shared_cache__keyed_by_token(raw_api, tmp_path):
+    call_api = raw_api.call_api
+    cache.SharedCache(tmp_path, ttl=60).install(raw_api)
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    raw_api.configuration.api_key = {"api-key": "other"}
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert call_api.call_count == 2
+
+
+def test_shared_cache__only_raw_successful_responses(raw_api, tmp_path):
+    call_api = raw_api.call_api
+    cache.SharedCache(tmp_path, ttl=60).install(raw_api)
+    raw_api.call_api("/v1/network/agents", "GET")
+    raw_api.call_api("/v1/network/agents", "GET")
+    assert call_api.call_count == 2
+    call_api.side_effect = lambda *args, **kwargs: HTTPResponse(
+        body=b"", status=204, preload_content=False
+    )
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert call_api.call_count == 4
+    assert not glob.glob(os.path.join(tmp_path, "*.entry"))
+
+
+def test_shared_cache__stale_while_revalidate(raw_api, tmp_path):
+    now = [1000.0]
+    call_api = raw_api.call_api
+    shared = cache.SharedCache(tmp_path, ttl=10, stale=100, clock=lambda: now[0])
+    shared.install(raw_api)
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    call_api.side_effect = lambda *args, **kwargs: HTTPResponse(
+        body=b'{"data": ["new"]}', status=200, preload_content=False
+    )
+    now[0] += 20
+    stale = raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert stale.data == b'{"data": ["/v1/network/agents"]}'
+    shared.join()
+    assert call_api.call_count == 2
+    fresh = raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert fresh.data == b'{"data": ["new"]}'
+    assert (shared.hits, shared.stale_hits, shared.misses) == (1, 1, 1)
+
+    now[0] += 200
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    assert call_api.call_count == 3
+    assert shared.misses == 2
+
+
+def test_shared_cache__single_flight_between_instances(raw_api, tmp_path):
+    event = threading.Event()
+    calls = []
+    respond = raw_api.call_api.side_effect
+
+    def slow_call(*args, **kwargs):
+        calls.append(args)
+        event.wait(1)
+        return respond(*args, **kwargs)
+
+    results = []
+
+    def run():
+        # Every thread has its own cache instance and lock file handle, like separate processes.
+        client = mock.Mock(configuration=raw_api.configuration)
+        client.sanitize_for_serialization.side_effect = lambda x: x
+        client.call_api.side_effect = slow_call
+        cache.SharedCache(tmp_path, ttl=60).install(client)
+        response = client.call_api("/v1/network/agents", "GET", _preload_content=False)
+        results.append(response.data)
+
+    threads = [threading.Thread(target=run) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    event.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [b'{"data": ["/v1/network/agents"]}'] * 5
+
+
+def test_shared_cache__invalidation(raw_api, tmp_path):
+    call_api = raw_api.call_api
+    cache.SharedCache(tmp_path, ttl=60).install(raw_api)
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    raw_api.call_api("/v1/network/agents/search", "POST", _preload_content=False)
+    raw_api.call_api("/v1/network/auth/api-keys", "GET", _preload_content=False)
+    raw_api.call_api("/v1/network/agents/{agent_id}", "PATCH", {"agent_id": 1})
+    raw_api.call_api("/v1/network/agents", "GET", _preload_content=False)
+    raw_api.call_api("/v1/network/agents/search", "POST", _preload_content=False)
+    raw_api.call_api("/v1/network/auth/api-keys", "GET", _preload_content=False)
+    assert call_api.call_count == 6
+    raw_api.call_api("/v1/network/unknown", "POST")
+    raw_api.call_api("/v1/network/auth/api-keys", "GET", _preload_content=False)
+    assert call_api.call_count == 8
+
+
+def test_shared_cache__rejects_unsafe_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError, match="writable by other users"):
+        cache.SharedCache(shared, ttl=60)
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path)
+    with pytest.raises(PermissionError, match="not a directory"):
+        cache.SharedCache(link, ttl=60)
+    with mock.patch.object(cache.os, "getuid", return_value=os.getuid() + 1):
+        with pytest.raises(PermissionError, match="owned by another user"):
+            cache.SharedCache(tmp_path, ttl=60)
+    created = tmp_path / "created" / "requests"
+    cache.SharedCache(created, ttl=60)
+    assert created.stat().st_mode & 0o777 == 0o700
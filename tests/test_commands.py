@@ -1,16 +1,20 @@
 # coding: utf-8
 import datetime
+import json
 import os
 import unittest
 from unittest import mock
 
 import pytest
 import syntropy_sdk as sdk
+import urllib3
 from click.testing import CliRunner
 from syntropy_sdk import models
 from syntropy_sdk.rest import ApiException
+from urllib3.response import HTTPResponse
 
 from syntropycli import __main__ as ctl
+from syntropycli import decorators
 
 
 @pytest.fixture
@@ -102,6 +106,231 @@ def test_delete_api_key__by_name_force(
     assert confirm_deletion.call_count == 0
 
 
+@pytest.fixture
+def expiring_api_keys():
+    keys = [
+        models.V1AuthApiKey(
+            api_key_name=name,
+            api_key_id=id,
+            api_key_created_at="2021-01-01T00:00:00.000Z",
+            api_key_updated_at="2021-01-01T00:00:00.000Z",
+            api_key_status=True,
+            api_key_description=f"{name} key",
+            api_key_valid_until=valid_until,
+        )
+        for name, id, valid_until in [
+            ("edge", 1, "2021-10-01T00:00:00.000Z"),
+            ("core", 2, "2021-10-05T12:00:00+00:00"),
+            ("edge", 3, "2030-01-01T00:00:00.000Z"),
+        ]
+    ]
+    with mock.patch.object(
+        ctl.sdk.AuthApi,
+        "v1_network_auth_api_keys_get",
+        autospec=True,
+        return_value=models.V1NetworkAuthApiKeysGetResponse(keys),
+    ) as the_mock:
+        yield the_mock
+
+
+@pytest.fixture
+def mock_rotate_api_key():
+    def create(self, body):
+        if body.api_key_name == "fail":
+            raise ApiException(status=500, reason="Internal Server Error")
+        return models.V1NetworkAuthApiKeysCreateResponse(
+            models.V1AuthApiKeysCreateItem(
+                api_key_name=body.api_key_name,
+                api_key_id=100 + len(body.api_key_description),
+                user_id=1,
+                api_key_secret=f"{body.api_key_description} secret",
+                api_key_created_at="date",
+                api_key_updated_at="date",
+                api_key_description=body.api_key_description,
+                api_key_valid_until=body.api_key_valid_until,
+            )
+        )
+
+    with mock.patch.object(
+        ctl.sdk.AuthApi,
+        "v1_network_auth_api_keys_create",
+        autospec=True,
+        side_effect=create,
+    ) as the_mock:
+        yield the_mock
+
+
+def test_rotate_api_keys(
+    runner,
+    expiring_api_keys,
+    mock_rotate_api_key,
+    mock_delete_api_key,
+    login_mock,
+    tmp_path,
+):
+    output = str(tmp_path / "secrets.ndjson")
+    result = runner.invoke(
+        ctl.rotate_api_keys,
+        ["--expires-before", "2021-10-10", "--output", output, "--valid-for", "12w"],
+    )
+    assert result.exit_code == 0, result.output
+    expiring_api_keys.assert_called_once()
+    assert sorted(
+        call.kwargs["body"].api_key_name for call in mock_rotate_api_key.call_args_list
+    ) == ["core", "edge"]
+    body = mock_rotate_api_key.call_args_list[0].kwargs["body"]
+    assert (
+        datetime.timedelta(weeks=11, days=6)
+        < body.api_key_valid_until - datetime.datetime.now()
+        <= datetime.timedelta(weeks=12)
+    )
+    assert mock_delete_api_key.call_count == 0
+    assert os.stat(output).st_mode & 0o777 == 0o600
+    with open(output) as f:
+        secrets = sorted((json.loads(line) for line in f), key=lambda x: x["replaces"])
+    assert [
+        (x["replaces"], x["api_key_name"], x["api_key_secret"]) for x in secrets
+    ] == [(1, "edge", "edge key secret"), (2, "core", "core key secret")]
+
+
+def test_rotate_api_keys__delete_old(
+    runner,
+    expiring_api_keys,
+    mock_rotate_api_key,
+    mock_delete_api_key,
+    login_mock,
+    tmp_path,
+):
+    with mock.patch.object(ctl.time, "sleep", autospec=True) as sleep:
+        result = runner.invoke(
+            ctl.rotate_api_keys,
+            [
+                "--expires-before",
+                "2021-10-10",
+                "--name",
+                "edge",
+                "--output",
+                str(tmp_path / "secrets.ndjson"),
+                "--delete-old",
+                "--grace",
+                "10m",
+                "--yes",
+            ],
+        )
+    assert result.exit_code == 0, result.output
+    sleep.assert_called_once_with(600)
+    assert mock_rotate_api_key.call_count == 1
+    assert mock_delete_api_key.call_args_list == [mock.call(mock.ANY, 1)]
+
+
+def test_rotate_api_keys__failures_keep_old_keys(
+    runner,
+    expiring_api_keys,
+    mock_rotate_api_key,
+    mock_delete_api_key,
+    login_mock,
+    tmp_path,
+):
+    expiring_api_keys.return_value.data[1].api_key_name = "fail"
+    output = tmp_path / "secrets.ndjson"
+    result = runner.invoke(
+        ctl.rotate_api_keys,
+        [
+            "--expires-before",
+            "2021-10-10",
+            "--output",
+            str(output),
+            "--delete-old",
+            "--yes",
+        ],
+    )
+    assert result.exit_code == 2
+    assert "Failed to replace API key fail (id=2)" in result.output
+    assert mock_delete_api_key.call_args_list == [mock.call(mock.ANY, 1)]
+    assert len(output.read_text().splitlines()) == 1
+
+
+def test_rotate_api_keys__reports_orphan_keys(
+    runner, expiring_api_keys, mock_rotate_api_key, login_mock, tmp_path
+):
+    listing = expiring_api_keys.return_value
+    orphan = models.V1AuthApiKey(
+        api_key_name="core",
+        api_key_id=50,
+        api_key_created_at="2021-10-01T00:00:00.000Z",
+        api_key_updated_at="2021-10-01T00:00:00.000Z",
+        api_key_status=True,
+        api_key_description="core key",
+        api_key_valid_until="2022-01-01T00:00:00.000Z",
+    )
+    expiring_api_keys.side_effect = [
+        listing,
+        models.V1NetworkAuthApiKeysGetResponse(listing.data + [orphan]),
+    ]
+    create = mock_rotate_api_key.side_effect
+
+    def create_or_time_out(self, body):
+        if body.api_key_name == "core":
+            raise urllib3.exceptions.ReadTimeoutError(None, "url", "timeout")
+        return create(self, body)
+
+    mock_rotate_api_key.side_effect = create_or_time_out
+    result = runner.invoke(
+        ctl.rotate_api_keys,
+        ["--expires-before", "2021-10-10", "--output", str(tmp_path / "secrets")],
+    )
+    assert result.exit_code == 2
+    assert expiring_api_keys.call_count == 2
+    assert "API key core (id=50) was created, but its secret was not received." in (
+        result.output
+    )
+    assert "id=108" not in result.output
+
+
+def test_rotate_api_keys__create_is_not_retried(runner, env_mock, tmp_path):
+    listing = {
+        "data": [
+            {
+                "api_key_id": 1,
+                "api_key_name": "edge",
+                "api_key_valid_until": "2021-10-01T00:00:00.000Z",
+            }
+        ]
+    }
+    calls = []
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        calls.append(method)
+        if method == "POST":
+            raise urllib3.exceptions.ReadTimeoutError(None, "url", "timeout")
+        return HTTPResponse(
+            body=json.dumps(listing).encode(), status=200, preload_content=False
+        )
+
+    with mock.patch.object(
+        sdk.ApiClient, "call_api", autospec=True, side_effect=call_api
+    ):
+        result = runner.invoke(
+            ctl.rotate_api_keys,
+            ["--expires-before", "2021-10-10", "--output", str(tmp_path / "secrets")],
+        )
+    assert result.exit_code == 2
+    assert calls == ["GET", "POST", "GET"]
+
+
+def test_rotate_api_keys__existing_output(
+    runner, expiring_api_keys, mock_rotate_api_key, login_mock, tmp_path
+):
+    output = tmp_path / "secrets.ndjson"
+    output.write_text("earlier secrets\n")
+    result = runner.invoke(
+        ctl.rotate_api_keys, ["--expires-before", "2021-10-10", "--output", str(output)]
+    )
+    assert result.exit_code == 1
+    assert mock_rotate_api_key.call_count == 0
+    assert output.read_text() == "earlier secrets\n"
+
+
 def test_get_endpoints__empty(
     runner,
     print_table_mock,
@@ -137,6 +366,249 @@ def test_get_endpoints__filters_empty(
     print_table_mock.assert_called_once()
 
 
+def test_get_endpoints__where(runner, print_table_mock, login_mock):
+    agents = [
+        {"agent_id": id, "agent_location_city": city}
+        for id, city in ((1, "Vilnius"), (2, "Kaunas"), (3, "Vilnius"))
+    ]
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_search",
+        autospec=True,
+        return_value={"data": agents},
+    ) as search_mock:
+        result = runner.invoke(
+            ctl.get_endpoints,
+            ["--where", 'agent_id in [1, 2, 3] and agent_location_city == "Vilnius"'],
+        )
+    assert result.exit_code == 0
+    body = search_mock.call_args[0][1]
+    assert body.filter.agent_id == [1, 2, 3]
+    assert print_table_mock.call_args[0][0] == [agents[0], agents[2]]
+
+
+def test_get_endpoints__where_disjoint_id(runner, print_table_mock, login_mock):
+    with mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_search", autospec=True
+    ) as search_mock, mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_get", autospec=True
+    ) as get_mock:
+        result = runner.invoke(
+            ctl.get_endpoints, ["--id", "1", "--where", "agent_id == 2"]
+        )
+    assert result.exit_code == 0
+    assert search_mock.call_count == 0
+    assert get_mock.call_count == 0
+    assert print_table_mock.call_args[0][0] == []
+
+
+def test_get_endpoints__where_invalid(runner, print_table_mock, login_mock):
+    result = runner.invoke(ctl.get_endpoints, ["--where", "agent_id =="])
+    assert result.exit_code == 2
+    assert "expected a value" in result.output
+    print_table_mock.assert_not_called()
+
+
+def test_get_endpoints__completion_index(
+    runner, print_table_mock, login_mock, mock_agents_get_single, completion_index
+):
+    with mock.patch.object(
+        ctl.completion,
+        "refresh_index",
+        autospec=True,
+        side_effect=ctl.completion.update_index,
+    ):
+        runner.invoke(ctl.get_endpoints)
+    index = ctl.completion.load_index()
+    assert index["endpoints"] == {"123": "name_0"}
+    assert index["providers"] == ["provider"]
+
+
+@pytest.fixture
+def profiles_file(tmp_path):
+    path = tmp_path / "profiles.ini"
+    path.write_text(
+        "[eu]\nserver = https://eu\ntoken = eu-token\n"
+        "[us]\nserver = https://us\ntoken = us-token\n"
+    )
+    with mock.patch.dict(os.environ, {"SYNTROPY_PROFILES_FILE": str(path)}):
+        yield path
+
+
+@pytest.fixture
+def mock_agents_get_by_host():
+    def agents_get(self, **kwargs):
+        host = self.api_client.configuration.host
+        return {"data": [{"agent_id": len(host), "agent_name": host}]}
+
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        side_effect=agents_get,
+    ) as the_mock:
+        yield the_mock
+
+
+def test_get_endpoints__profiles(
+    runner, login_mock, profiles_file, mock_agents_get_by_host
+):
+    result = runner.invoke(ctl.get_endpoints, ["--profiles", "us,eu"])
+    assert result.exit_code == 0
+    assert mock_agents_get_by_host.call_count == 2
+    lines = result.output.splitlines()
+    assert lines[1].split("|")[1].strip() == "Profile"
+    assert [line.split("|")[1].strip() for line in lines[3:5]] == ["us", "eu"]
+    assert "https://us" in lines[3] and "https://eu" in lines[4]
+
+
+def test_get_endpoints__all_profiles_json(
+    runner, login_mock, profiles_file, mock_agents_get_by_host
+):
+    result = runner.invoke(ctl.get_endpoints, ["--all-profiles", "--json"])
+    assert result.exit_code == 0
+    assert sorted(
+        (line["profile"], line["agent_name"])
+        for line in map(json.loads, result.output.splitlines())
+    ) == [("eu", "https://eu"), ("us", "https://us")]
+
+
+def test_get_endpoints__json_keeps_api_payload(runner, login_mock):
+    record = {
+        "agent_id": 1,
+        "agent_name": "a",
+        "agent_modified_at": "2021-10-11T20:20:21.000Z",
+    }
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value=HTTPResponse(
+            body=json.dumps({"data": [record]}).encode(),
+            status=200,
+            preload_content=False,
+        ),
+    ):
+        result = runner.invoke(ctl.get_endpoints, ["--json"])
+    assert result.exit_code == 0
+    assert json.loads(result.output) == [record]
+
+
+def test_get_endpoints__profile_without_token(
+    runner, login_mock, profiles_file, mock_agents_get_by_host
+):
+    profiles_file.write_text(
+        profiles_file.read_text() + "[asia]\nserver = https://asia\n"
+    )
+    result = runner.invoke(ctl.get_endpoints, ["--profiles", "eu,asia"])
+    assert result.exit_code == 1
+    assert "Incomplete profiles" in result.output
+    assert "asia (missing token)" in result.output
+    assert "environment variable" not in result.output
+    assert mock_agents_get_by_host.call_count == 0
+
+
+SEARCH_AGENT = {
+    "agent_id": 1,
+    "agent_public_ipv4": "1.2.3.4",
+    "agent_location_city": "Vilnius",
+    "agent_device_id": "device",
+    "agent_name": "a",
+    "agent_status": "CONNECTED",
+    "agent_version": "1.0.0",
+    "agent_locked_fields": {},
+    "agent_modified_at": "2021-10-11T20:20:21.000Z",
+    "agent_is_virtual": False,
+    "agent_type": "LINUX",
+    "agent_provider": {"agent_provider_id": 3, "agent_provider_name": "AWS"},
+    "agent_tags": [{"agent_tag_id": 2, "agent_tag_name": "edge"}],
+    "agent_services_subnets_enabled_count": 0,
+    "agent_services_subnets_count": 0,
+    "agent_location_country": "LT",
+    "agent_is_online": True,
+    "agent_unknown_field": 1,
+}
+SEARCH_CONNECTION = {
+    "agent_connection_subnets_enabled_count": 0,
+    "agent_connection_group_updated_at": "2021-10-11T20:20:21+03:00",
+    "agent_connection_group_status": "CONNECTED",
+    "agent_connection_group_sdn_enabled": False,
+    "agent_connection_group_id": 5,
+    "agent_connection_group_created_by": "USER",
+    "agent_1": {
+        "agent_is_online": True,
+        "agent_status": "CONNECTED",
+        "agent_subnets_count": 0,
+        "agent_is_virtual": False,
+        "agent_name": "a",
+        "agent_public_ipv4": "1.2.3.4",
+        "agent_id": 1,
+        "agent_provider_id": 3,
+    },
+}
+SEARCH_CONNECTION["agent_2"] = {
+    **SEARCH_CONNECTION["agent_1"],
+    "agent_name": "b",
+    "agent_id": 2,
+}
+
+
+@pytest.mark.parametrize(
+    "command, args, api, method, response_type, record",
+    [
+        (
+            ctl.get_endpoints,
+            ["--name", "a"],
+            ctl.sdk.AgentsApi,
+            "v1_network_agents_search",
+            "V1NetworkAgentsSearchResponse",
+            SEARCH_AGENT,
+        ),
+        (
+            ctl.get_connections,
+            ["--id", "1"],
+            ctl.sdk.ConnectionsApi,
+            "v1_network_connections_search",
+            "V1NetworkConnectionsSearchResponse",
+            SEARCH_CONNECTION,
+        ),
+    ],
+)
+def test_search__json_matches_models(
+    runner, login_mock, command, args, api, method, response_type, record
+):
+    body = json.dumps({"data": [record]}).encode()
+
+    def invoke(response):
+        with mock.patch.object(api, method, autospec=True, return_value=response):
+            result = runner.invoke(command, [*args, "--json"])
+        assert result.exit_code == 0
+        return json.loads(result.output)
+
+    class Response:
+        data = body
+
+    # Search responses used to be deserialized into SDK models.
+    old = invoke(sdk.ApiClient().deserialize(Response(), response_type))
+    new = invoke(HTTPResponse(body=body, status=200, preload_content=False))
+    assert new == old
+    assert "agent_unknown_field" not in new[0]
+    if command is ctl.get_connections:
+        assert new[0]["agent_connection_group_status_reason"] is None
+        assert new[0]["agent_connection_group_updated_at"] == (
+            "2021-10-11 20:20:21+03:00"
+        )
+
+
+def test_get_endpoints__unknown_profile(
+    runner, login_mock, profiles_file, mock_agents_get_by_host
+):
+    result = runner.invoke(ctl.get_endpoints, ["--profiles", "eu,asia"])
+    assert result.exit_code == 1
+    assert "Unknown profiles: asia" in result.output
+    assert mock_agents_get_by_host.call_count == 0
+
+
 def test_get_endpoints__with_services(
     runner,
     print_table_mock,
@@ -201,6 +673,13 @@ def test_configure_endpoints__tags_providers(
         runner.invoke(ctl.configure_endpoints, args)
         assert mock_agents_get_single.call_count == 0
         assert mock_agents_search_single.call_count == 2
+        assert mock_agents_search_single.call_args == mock.call(
+            mock.ANY,
+            models.V1NetworkAgentsSearchRequest(
+                filter=models.V1AgentFilter(agent_id=[123]), skip=0, take=100
+            ),
+            _preload_content=False,
+        )
         assert patch_mock.call_args_list == [
             mock.call(mock.ANY, patch_args, 123),
         ]
@@ -208,6 +687,85 @@ def test_configure_endpoints__tags_providers(
         print_table_mock.assert_called_once()
 
 
+def test_configure_endpoints__selectors(
+    runner,
+    print_table_mock,
+    login_mock,
+    mock_agents_search_single,
+    mock_agents_services_get_empty,
+):
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_providers_get",
+        autospec=True,
+        return_value=models.V1NetworkAgentsProvidersGetResponse(
+            [
+                models.AgentProvider(
+                    agent_provider_id=1,
+                    agent_provider_name="AWS",
+                    agent_provider_icon_url="url",
+                ),
+                models.AgentProvider(
+                    agent_provider_id=2,
+                    agent_provider_name="IBM",
+                    agent_provider_icon_url="url",
+                ),
+            ]
+        ),
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_update",
+        autospec=True,
+    ) as patch_mock:
+        result = runner.invoke(
+            ctl.configure_endpoints,
+            ["--tag", "edge", "--provider", "IBM", "--offline", "--add-tag", "abcd"],
+        )
+        assert result.exit_code == 0
+        assert mock_agents_search_single.call_args_list[0] == mock.call(
+            mock.ANY,
+            models.V1NetworkAgentsSearchRequest(
+                filter=models.V1AgentFilter(
+                    agent_tag_name=["edge"],
+                    agent_provider_id=[2],
+                    agent_status=[
+                        models.AgentFilterAgentStatus.DISCONNECTED,
+                        models.AgentFilterAgentStatus.CONNECTED_WITH_ERRORS,
+                    ],
+                ),
+                skip=0,
+                take=100,
+            ),
+            _preload_content=False,
+        )
+        assert patch_mock.call_args_list == [
+            mock.call(mock.ANY, {"agent_tags": ["abcd"]}, 123),
+        ]
+        print_table_mock.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--add-tag", "abcd"],
+        ["--provider", "unknown", "--add-tag", "abcd"],
+    ],
+)
+def test_configure_endpoints__selectors_invalid(
+    runner, print_table_mock, login_mock, mock_agents_search_single, args
+):
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_providers_get",
+        autospec=True,
+        return_value=models.V1NetworkAgentsProvidersGetResponse([]),
+    ):
+        result = runner.invoke(ctl.configure_endpoints, args)
+    assert result.exit_code == 1
+    assert mock_agents_search_single.call_count == 0
+    assert print_table_mock.call_count == 0
+
+
 @pytest.mark.parametrize(
     "args, patch_args",
     [
@@ -272,7 +830,7 @@ def test_configure_endpoints__services(
         autospec=True,
     ) as patch_mock:
         runner.invoke(ctl.configure_endpoints, args)
-        assert mock_agents_search_single.call_count == 2
+        assert mock_agents_search_single.call_count == 1
         patch_mock.assert_called_once_with(
             mock.ANY,
             models.V1NetworkAgentsServicesUpdateRequest(subnets_to_update=patch_args),
@@ -314,6 +872,202 @@ def test_get_connections__with_services(runner, print_table_mock, login_mock):
             print_table_mock.assert_called_once()
 
 
+def test_topology(runner, print_table_mock, login_mock, tmp_path):
+    agents = [{"agent_id": id, "agent_name": f"agent-{id}"} for id in range(1, 5)]
+    connections = [
+        {"agent_1": agents[0], "agent_2": agents[1]},
+        {"agent_1": agents[1], "agent_2": agents[2]},
+    ]
+    dot = tmp_path / "network.dot"
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={"data": agents},
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={"data": connections},
+    ):
+        result = runner.invoke(ctl.topology, ["--dot", str(dot), "--json"])
+    assert result.exit_code == 0
+    assert print_table_mock.call_args[0][0] == [
+        {
+            "endpoints": 4,
+            "connections": 2,
+            "components": [3, 1],
+            "degrees": {0: 1, 1: 2, 2: 1},
+            "isolated": [4],
+            "articulation_points": [2],
+        }
+    ]
+    assert "  1 -- 2;" in dot.read_text()
+
+
+def test_endpoint_health(runner, print_table_mock, login_mock):
+    agents = [
+        {
+            "agent_id": id,
+            "agent_name": f"agent-{id}",
+            "agent_provider": {"agent_provider_name": provider},
+        }
+        for id, provider in ((1, "AWS"), (2, "AWS"), (3, "GCP"))
+    ]
+    pages = {
+        0: [
+            {
+                "agent_1": agents[0],
+                "agent_2": agents[1],
+                "agent_connection_group_status": "ERROR",
+            },
+            {
+                "agent_1": agents[0],
+                "agent_2": agents[2],
+                "agent_connection_group_status": "CONNECTED",
+            },
+        ]
+    }
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={"data": agents},
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        side_effect=lambda self, skip, take, **kwargs: {"data": pages.get(skip, [])},
+    ) as connections_mock:
+        result = runner.invoke(ctl.endpoint_health, ["--provider", "AWS"])
+    assert result.exit_code == 0
+    connections_mock.assert_called_once()
+    rows = print_table_mock.call_args[0][0]
+    assert [(row["agent_id"], row["score"]) for row in rows] == [(2, 0), (1, 50)]
+
+
+@pytest.mark.parametrize(
+    "args,expected",
+    [
+        (
+            [],
+            [
+                {
+                    "service": "nginx",
+                    "endpoints": 1,
+                    "enabled": 0,
+                    "partial": 1,
+                    "disabled": 0,
+                    "inactive": 0,
+                    "missing": 1,
+                }
+            ],
+        ),
+        (["--missing", "nginx"], [{"agent_id": 2, "agent_name": "b"}]),
+    ],
+)
+def test_services_summary(runner, print_table_mock, login_mock, args, expected):
+    agents = [{"agent_id": 1, "agent_name": "a"}, {"agent_id": 2, "agent_name": "b"}]
+    services = [
+        {
+            "agent_id": 1,
+            "agent_service_name": "nginx",
+            "agent_service_is_active": True,
+            "agent_service_subnets": [
+                {
+                    "agent_service_subnet_is_active": True,
+                    "agent_service_subnet_is_user_enabled": enabled,
+                }
+                for enabled in (True, False)
+            ],
+        }
+    ]
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={"data": agents},
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_services_get",
+        autospec=True,
+        return_value={"data": services},
+    ) as services_mock:
+        result = runner.invoke(ctl.services_summary, args)
+    assert result.exit_code == 0
+    services_mock.assert_called_once_with(
+        mock.ANY, filter="1,2", _preload_content=False
+    )
+    assert ctl.to_builtin(print_table_mock.call_args[0][0]) == expected
+
+
+def test_get_connections__where(runner, print_table_mock, login_mock):
+    connections = [
+        {"agent_connection_group_id": 1, "agent_connection_latency_ms": 200},
+        {"agent_connection_group_id": 2, "agent_connection_latency_ms": 10},
+        {"agent_connection_group_id": 3, "agent_connection_latency_ms": 300},
+    ]
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        side_effect=lambda self, skip, take, **kwargs: {
+            "data": connections[skip : skip + take]
+        },
+    ) as index_mock, mock.patch.object(
+        ctl.sdk.ConnectionsApi, "v1_network_connections_search", autospec=True
+    ) as search_mock:
+        result = runner.invoke(
+            ctl.get_connections,
+            ["--where", "agent_connection_latency_ms > 150", "--skip", "1"],
+        )
+    assert result.exit_code == 0
+    index_mock.assert_called_once()
+    search_mock.assert_not_called()
+    assert print_table_mock.call_args[0][0] == [connections[2]]
+
+
+def test_get_connections__name_chunked(runner, print_table_mock, login_mock):
+    agents = [{"agent_id": id} for id in range(150)]
+
+    def agents_search(self, body, **kwargs):
+        return {"data": agents[body.skip : body.skip + body.take]}
+
+    def connections_search(self, body, **kwargs):
+        ids = body.filter.agent_id
+        # Connection 1 links endpoints from both chunks and is returned twice.
+        data = [{"agent_connection_group_id": 1}] if body.skip == 0 else []
+        if body.skip == 0 and ids[0] == 0:
+            data.append({"agent_connection_group_id": 2})
+        elif body.skip == 0:
+            data.append({"agent_connection_group_id": 3})
+        return {"data": data}
+
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_search",
+        autospec=True,
+        side_effect=agents_search,
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_search",
+        autospec=True,
+        side_effect=connections_search,
+    ) as search_mock:
+        result = runner.invoke(
+            ctl.get_connections, ["--name", "name", "--skip", "1", "--take", "5"]
+        )
+        assert result.exit_code == 0
+        assert sorted(
+            len(call.args[1].filter.agent_id) for call in search_mock.call_args_list
+        ) == [50, 100]
+        print_table_mock.assert_called_once()
+        assert print_table_mock.call_args[0][0] == [
+            {"agent_connection_group_id": 2},
+            {"agent_connection_group_id": 3},
+        ]
+
+
 def test_create_connections__p2p(runner, login_mock):
     with mock.patch.object(
         ctl.sdk.ConnectionsApi,
@@ -411,7 +1165,7 @@ def test_delete_connection(runner, login_mock):
         runner.invoke(ctl.delete_connection, "123")
         the_mock.assert_called_once_with(
             mock.ANY,
-            models.V1NetworkConnectionsRemoveRequest(agent_connection_group_ids=(123,)),
+            models.V1NetworkConnectionsRemoveRequest(agent_connection_group_ids=[123]),
         )
 
 
@@ -423,6 +1177,636 @@ def test_delete_connection__multiple(runner, login_mock):
         the_mock.assert_called_once_with(
             mock.ANY,
             models.V1NetworkConnectionsRemoveRequest(
-                agent_connection_group_ids=(123, 345)
+                agent_connection_group_ids=[123, 345]
             ),
         )
+
+
+def test_delete_connection__criteria(runner, login_mock):
+    def connection(id, status, agent_2_id=2, latency=None):
+        return {
+            "agent_connection_group_id": id,
+            "agent_connection_group_status": status,
+            "agent_connection_group_updated_at": "2021-10-13T08:53:30.000Z",
+            "agent_connection_latency_ms": latency,
+            "agent_1": {"agent_id": 1},
+            "agent_2": {"agent_id": agent_2_id},
+        }
+
+    connections = [
+        connection(1, "ERROR"),
+        connection(2, "CONNECTED"),
+        connection(3, "ERROR", agent_2_id=3),
+        connection(4, "ERROR", latency=10),
+        connection(5, "OFFLINE", latency=20),
+    ]
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={"data": connections},
+    ) as get_mock, mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_search",
+        autospec=True,
+        return_value={"data": [{"agent_id": 2}]},
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_remove",
+        autospec=True,
+        side_effect=[None, ApiException(status=400, reason="Bad Request")],
+    ) as remove_mock:
+        result = runner.invoke(
+            ctl.delete_connection,
+            [
+                "--status",
+                "error",
+                "--status",
+                "OFFLINE",
+                "--tag",
+                "edge",
+                "--older-than",
+                "1d",
+                "--chunk-size",
+                "2",
+                "--concurrency",
+                "1",
+            ],
+            input="y\n",
+        )
+        get_mock.assert_called_once()
+        assert remove_mock.call_args_list == [
+            mock.call(
+                mock.ANY,
+                models.V1NetworkConnectionsRemoveRequest(
+                    agent_connection_group_ids=[1, 4]
+                ),
+            ),
+            mock.call(
+                mock.ANY,
+                models.V1NetworkConnectionsRemoveRequest(
+                    agent_connection_group_ids=[5]
+                ),
+            ),
+        ]
+        assert "delete 3 connections?" in result.output
+        assert "Chunk 1/2: removed 2 connections." in result.output
+        assert "Removed 2 of 3 connections." in result.output
+        assert result.exit_code == 2
+
+
+def test_delete_connection__criteria_declined(runner, login_mock):
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={
+            "data": [
+                {
+                    "agent_connection_group_id": 1,
+                    "agent_connection_group_status": "ERROR",
+                    "agent_1": {"agent_id": 1},
+                    "agent_2": {"agent_id": 2},
+                }
+            ]
+        },
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi, "v1_network_connections_remove", autospec=True
+    ) as remove_mock:
+        runner.invoke(ctl.delete_connection, ["--status", "ERROR"], input="n\n")
+        assert remove_mock.call_count == 0
+
+
+def test_create_connections__from_file(runner, login_mock, tmp_path):
+    pairs = tmp_path / "pairs.csv"
+    pairs.write_text("# comment\n1,2\n3,4\n\n5,6\n")
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        side_effect=[{"data": []}, {"errors": [{"message": "some error"}]}],
+    ) as the_mock:
+        result = runner.invoke(
+            ctl.create_connections,
+            ["--from-file", str(pairs), "--chunk-size", "2", "--concurrency", "1"],
+        )
+        assert the_mock.call_count == 2
+        assert [
+            [(p.agent_1_id, p.agent_2_id) for p in call[1]["body"].agent_pairs]
+            for call in the_mock.call_args_list
+        ] == [[(1, 2), (3, 4)], [(5, 6)]]
+        assert "some error" in result.output
+        assert "Submitted 3 pairs in 2 requests, 1 errors." in result.output
+        assert "Rejected pairs: 5-6" in result.output
+    assert not (tmp_path / "pairs.csv.checkpoint").exists()
+
+
+def test_create_connections__from_file_partial_errors(runner, login_mock, tmp_path):
+    pairs = tmp_path / "pairs.csv"
+    pairs.write_text("1,2\n3,4\n5,6\n")
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        return_value={
+            "data": [
+                {"agent_1_id": 2, "agent_2_id": 1, "agent_connection_group_id": 7},
+                {"agent_1_id": 5, "agent_2_id": 6, "agent_connection_group_id": 8},
+            ],
+            "errors": [{"message": "some error"}],
+        },
+    ):
+        result = runner.invoke(ctl.create_connections, ["--from-file", str(pairs)])
+    assert "some error" in result.output
+    assert "Rejected pairs: 3-4" in result.output
+    assert not (tmp_path / "pairs.csv.checkpoint").exists()
+
+
+def test_create_connections__from_file_rejected_not_resent(
+    runner, login_mock, tmp_path
+):
+    pairs = tmp_path / "pairs.csv"
+    pairs.write_text("1,2\n3,4\n5,6\n")
+    checkpoint = tmp_path / "pairs.csv.checkpoint"
+    args = ["--from-file", str(pairs), "--chunk-size", "2", "--concurrency", "1"]
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        side_effect=[
+            {
+                "data": [{"agent_1_id": 1, "agent_2_id": 2}],
+                "errors": [{"message": "already exists"}],
+            },
+            ApiException(status=400),
+        ],
+    ):
+        result = runner.invoke(ctl.create_connections, args)
+    assert result.exit_code == 2
+    assert "Rejected pairs: 3-4" in result.output
+    # The rejected pair is recorded, the failed chunk is not.
+    assert checkpoint.read_text() == "0-1\n"
+
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        return_value={"data": [{"agent_1_id": 5, "agent_2_id": 6}]},
+    ) as the_mock:
+        result = runner.invoke(ctl.create_connections, args)
+    assert result.exit_code == 0
+    assert [
+        [(p.agent_1_id, p.agent_2_id) for p in call[1]["body"].agent_pairs]
+        for call in the_mock.call_args_list
+    ] == [[(5, 6)]]
+    assert not checkpoint.exists()
+
+
+def test_create_connections__from_file_resume(runner, login_mock, tmp_path):
+    pairs = tmp_path / "pairs.csv"
+    pairs.write_text("a,b\nc,d\n")
+    checkpoint = tmp_path / "progress"
+    checkpoint.write_text("0-0\n")
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={
+            "data": [
+                {"agent_id": 1, "agent_name": "a"},
+                {"agent_id": 2, "agent_name": "b"},
+                {"agent_id": 3, "agent_name": "c"},
+                {"agent_id": 4, "agent_name": "d"},
+            ]
+        },
+    ):
+        with mock.patch.object(
+            ctl.sdk.ConnectionsApi,
+            "v1_network_connections_create_p2_p",
+            autospec=True,
+            return_value={"data": []},
+        ) as the_mock:
+            runner.invoke(
+                ctl.create_connections,
+                [
+                    "--use-names",
+                    "--from-file",
+                    str(pairs),
+                    "--checkpoint",
+                    str(checkpoint),
+                ],
+            )
+            the_mock.assert_called_once_with(
+                mock.ANY,
+                body=models.V1NetworkConnectionsCreateP2PRequest(
+                    agent_pairs=[
+                        models.V1NetworkConnectionsCreateP2PRequestAgentPairs(
+                            agent_1_id=3,
+                            agent_2_id=4,
+                        ),
+                    ],
+                ),
+                _preload_content=False,
+            )
+    assert not checkpoint.exists()
+
+
+@pytest.mark.parametrize(
+    "args, pairs",
+    [
+        [["--mesh", "--tag", "tag"], [(1, 3), (2, 3)]],
+        [["--hub", "3", "--tag", "tag"], [(3, 2)]],
+    ],
+)
+def test_create_connections__topology(runner, login_mock, args, pairs):
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_search",
+        autospec=True,
+        return_value={"data": [{"agent_id": 1}, {"agent_id": 2}, {"agent_id": 3}]},
+    ) as search_mock, mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={
+            "data": [
+                {"agent_1": {"agent_id": 2}, "agent_2": {"agent_id": 1}},
+                {"agent_1": {"agent_id": 1}, "agent_2": {"agent_id": 3}},
+            ][: 1 if "--mesh" in args else 2]
+        },
+    ) as index_mock, mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        return_value={"data": []},
+    ) as the_mock:
+        result = runner.invoke(ctl.create_connections, args)
+        search_mock.assert_called_once_with(
+            mock.ANY,
+            models.V1NetworkAgentsSearchRequest(
+                filter=models.V1AgentFilter(agent_tag_name=["tag"]), skip=0, take=100
+            ),
+            _preload_content=False,
+        )
+        index_mock.assert_called_once()
+        the_mock.assert_called_once_with(
+            mock.ANY,
+            body=models.V1NetworkConnectionsCreateP2PRequest(
+                agent_pairs=[
+                    models.V1NetworkConnectionsCreateP2PRequestAgentPairs(
+                        agent_1_id=a,
+                        agent_2_id=b,
+                    )
+                    for a, b in pairs
+                ],
+            ),
+            _preload_content=False,
+        )
+        assert f"Submitted {len(pairs)} pairs in 1 requests" in result.output
+
+
+def test_create_connections__mesh_without_tag(runner, login_mock):
+    result = runner.invoke(ctl.create_connections, ["--mesh"])
+    assert result.exit_code == 1
+
+
+def test_create_connections__mesh_with_checkpoint(runner, login_mock, tmp_path):
+    with mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_search", autospec=True
+    ) as search_mock:
+        result = runner.invoke(
+            ctl.create_connections,
+            ["--mesh", "--tag", "a", "--checkpoint", str(tmp_path / "progress")],
+        )
+    assert result.exit_code == 1
+    assert "--checkpoint cannot be used with --mesh or --hub." in result.output
+    assert search_mock.call_count == 0
+
+
+def test_apply(runner, login_mock, tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(
+        '{"endpoints": [{"name": "a", "tags": ["abcd"], "services": ["abc"]}], '
+        '"connections": [["a", "b"]]}'
+    )
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={
+            "data": [
+                {"agent_id": 123, "agent_name": "a", "agent_tags": []},
+                {"agent_id": 124, "agent_name": "b", "agent_tags": []},
+            ]
+        },
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={"data": []},
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_services_get",
+        autospec=True,
+        return_value={
+            "data": [
+                {
+                    "agent_id": 123,
+                    "agent_service_name": "abc",
+                    "agent_service_subnets": [
+                        {
+                            "agent_service_subnet_id": 1,
+                            "agent_service_subnet_is_user_enabled": False,
+                        }
+                    ],
+                }
+            ]
+        },
+    ) as services_mock, mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_update", autospec=True
+    ) as update_mock, mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_services_update", autospec=True
+    ) as services_update_mock, mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_create_p2_p",
+        autospec=True,
+        return_value={"data": []},
+    ) as create_mock:
+        result = runner.invoke(ctl.apply, [str(path)])
+        assert result.exit_code == 0
+        services_mock.assert_called_once_with(
+            mock.ANY, filter="123", _preload_content=False
+        )
+        update_mock.assert_called_once_with(mock.ANY, {"agent_tags": ["abcd"]}, 123)
+        services_update_mock.assert_called_once_with(
+            mock.ANY,
+            models.V1NetworkAgentsServicesUpdateRequest(
+                subnets_to_update=[
+                    models.V1NetworkAgentsServicesUpdateRequestSubnetsToUpdate(
+                        agent_service_subnet_id=1, is_enabled=True
+                    )
+                ]
+            ),
+        )
+        create_mock.assert_called_once()
+        assert "Applied changes in 3 requests, 0 errors." in result.output
+
+
+def test_configure_endpoints__plan(
+    runner,
+    print_table_mock,
+    login_mock,
+    mock_agents_search_single,
+    mock_agents_services_get,
+    tmp_path,
+):
+    path = tmp_path / "plan.json"
+    with mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_update", autospec=True
+    ) as update_mock, mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_services_update", autospec=True
+    ) as services_update_mock:
+        result = runner.invoke(
+            ctl.configure_endpoints,
+            [
+                "an-endpoint",
+                "-n",
+                "--add-tag",
+                "abcd",
+                "--set-service",
+                "abc",
+                "--plan",
+                str(path),
+            ],
+        )
+        assert update_mock.call_count == 0
+        assert services_update_mock.call_count == 0
+        assert print_table_mock.call_count == 0
+    plan = json.loads(path.read_text())
+    assert plan["changes"] == {
+        "agents": {"123": {"agent_tags": ["abcd"]}},
+        "subnets": [
+            {"agent_id": 123, "agent_service_subnet_id": 1, "is_enabled": True},
+            {"agent_id": 123, "agent_service_subnet_id": 2, "is_enabled": False},
+        ],
+        "create": [],
+        "delete": [],
+    }
+    assert plan["requests"] == 2
+    assert plan["subnets"] == 2
+    assert "Plan: 2 update calls for 1 endpoints, 2 service subnets touched" in (
+        result.output
+    )
+
+
+def test_delete_connection__plan(runner, login_mock):
+    with mock.patch.object(
+        ctl.sdk.ConnectionsApi, "v1_network_connections_remove", autospec=True
+    ) as the_mock:
+        result = runner.invoke(ctl.delete_connection, ["--plan", "-", "123", "345"])
+        assert the_mock.call_count == 0
+        assert '"delete": [\n            123,\n            345\n        ]' in (
+            result.output
+        )
+
+
+def test_execute_plan(runner, login_mock, tmp_path):
+    path = tmp_path / "plan.json"
+    path.write_text(
+        json.dumps(
+            {
+                "changes": {"agents": {"123": {"agent_tags": ["abcd"]}}, "delete": [1]},
+                "chunk_size": 100,
+                "concurrency": 1,
+            }
+        )
+    )
+    with mock.patch.object(
+        ctl.sdk.AgentsApi, "v1_network_agents_update", autospec=True
+    ) as update_mock, mock.patch.object(
+        ctl.sdk.ConnectionsApi, "v1_network_connections_remove", autospec=True
+    ) as remove_mock:
+        result = runner.invoke(ctl.execute_plan, [str(path)])
+        update_mock.assert_called_once_with(mock.ANY, {"agent_tags": ["abcd"]}, 123)
+        remove_mock.assert_called_once_with(
+            mock.ANY,
+            models.V1NetworkConnectionsRemoveRequest(agent_connection_group_ids=[1]),
+        )
+        assert "Applied changes in 2 requests, 0 errors." in result.output
+
+
+def test_apply__failures(runner, login_mock, tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text('{"endpoints": [{"name": "a", "tags": ["abcd"]}]}')
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={"data": [{"agent_id": 123, "agent_name": "a"}]},
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={"data": []},
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_update",
+        autospec=True,
+        side_effect=ApiException(status=400, reason="Bad Request"),
+    ):
+        result = runner.invoke(ctl.apply, [str(path)])
+        assert result.exit_code == 2
+        assert "API error (400): Bad Request" in result.output
+        assert "Applied changes in 1 requests, 1 errors." in result.output
+
+
+@pytest.mark.parametrize("batch_size, calls", [[1000, 1], [1, 2]])
+def test_configure_endpoints__services_batched(
+    runner, print_table_mock, login_mock, agents_response_builder, batch_size, calls
+):
+    services = [
+        {
+            "agent_id": agent_id,
+            "agent_service_name": "abc",
+            "agent_service_is_active": True,
+            "agent_service_subnets": [
+                {
+                    "agent_service_subnet_id": agent_id * 10,
+                    "agent_service_subnet_is_user_enabled": False,
+                    "agent_service_subnet_is_active": True,
+                },
+            ],
+        }
+        for agent_id in (123, 124)
+    ]
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_search",
+        autospec=True,
+        return_value=agents_response_builder([{}, {}]),
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_services_get",
+        autospec=True,
+        return_value={"data": services},
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_services_update",
+        autospec=True,
+    ) as patch_mock, mock.patch.object(
+        ctl, "MAX_SUBNETS_PER_REQUEST", batch_size
+    ):
+        result = runner.invoke(
+            ctl.configure_endpoints, ["name", "-n", "--enable-service", "abc"]
+        )
+        assert result.exit_code == 0
+        assert patch_mock.call_count == calls
+        assert [
+            subnet.agent_service_subnet_id
+            for call in patch_mock.call_args_list
+            for subnet in call[0][1].subnets_to_update
+        ] == [1230, 1240]
+        if calls == 1:
+            assert "Updated 2 service subnets of endpoints 123, 124." in result.output
+        else:
+            assert "Updated 1 service subnets of endpoints 124." in result.output
+
+
+def test_timings(runner, env_mock, login_mock):
+    with mock.patch.object(
+        sdk.AgentsApi,
+        "v1_network_agents_providers_get",
+        autospec=True,
+        return_value=models.V1NetworkAgentsProvidersGetResponse([]),
+    ):
+        result = runner.invoke(ctl.apis, ["--timings", "get-providers", "--json"])
+    assert result.exit_code == 0
+    assert "Client setup:" in result.output
+    assert "Authentication: 0 login round trips" in result.output
+    assert decorators._timings is None
+
+
+def test_profile_is_not_timings(runner, env_mock, login_mock):
+    result = runner.invoke(ctl.apis, ["--profile", "eu", "get-endpoints"])
+    assert result.exit_code == 2
+    assert "No such option: --profile" in result.output
+
+
+def test_diff(runner, print_table_mock, tmp_path):
+    old = tmp_path / "old.json"
+    new = tmp_path / "new.json"
+    old.write_text(
+        json.dumps(
+            [
+                {"agent_id": 1, "agent_name": "a", "agent_is_online": True},
+                {"agent_id": 2, "agent_name": "b"},
+            ]
+        )
+    )
+    new.write_text(
+        json.dumps({"agent_id": 1, "agent_name": "a", "agent_is_online": False})
+    )
+    result = runner.invoke(ctl.diff, [str(old), str(new), "--ignore", "agent_name"])
+    assert result.exit_code == 0
+    assert print_table_mock.call_args[0][0] == [
+        {
+            "profile": None,
+            "kind": "endpoint",
+            "id": 1,
+            "name": "a",
+            "change": "modified",
+            "fields": [{"field": "agent_is_online", "old": True, "new": False}],
+            "field": "agent_is_online",
+            "old": True,
+            "new": False,
+        },
+        {
+            "profile": None,
+            "kind": "endpoint",
+            "id": 2,
+            "name": "b",
+            "change": "removed",
+        },
+    ]
+
+
+def test_export(runner, login_mock, tmp_path):
+    agents = [{"agent_id": 1, "agent_tags": [{"agent_tag_name": "prod"}]}]
+    services = [
+        {
+            "agent_id": 1,
+            "agent_service_name": "nginx",
+            "agent_service_subnets": [
+                {
+                    "agent_service_subnet_is_active": True,
+                    "agent_service_subnet_is_user_enabled": True,
+                }
+            ],
+        }
+    ]
+    connections = [{"agent_connection_group_id": 5, "agent_1": {"agent_id": 1}}]
+    with mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_get",
+        autospec=True,
+        return_value={"data": agents},
+    ), mock.patch.object(
+        ctl.sdk.AgentsApi,
+        "v1_network_agents_services_get",
+        autospec=True,
+        return_value={"data": services},
+    ), mock.patch.object(
+        ctl.sdk.ConnectionsApi,
+        "v1_network_connections_get",
+        autospec=True,
+        return_value={"data": connections},
+    ):
+        result = runner.invoke(ctl.export_data, [str(tmp_path), "--format", "npy"])
+    assert result.exit_code == 0
+    assert "Exported 1 connections" in result.output
+    assert sorted(os.listdir(tmp_path / "agents")) == ["agent_id.npy", "agent_tags.npy"]
+    assert "agent_service_state.npy" in os.listdir(tmp_path / "services")
+    assert sorted(os.listdir(tmp_path / "connections")) == [
+        "agent_1.agent_id.npy",
+        "agent_connection_group_id.npy",
+    ]
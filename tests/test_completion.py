@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from unittest import mock
+
+import pytest
+
+from syntropycli import completion
+
+
+@pytest.fixture
+def index(completion_index):
+    completion.update_index(
+        endpoints=[
+            {
+                "agent_id": 12,
+                "agent_name": "edge-2",
+                "agent_tags": [{"agent_tag_name": "edge"}],
+                "agent_provider": {"agent_provider_name": "AWS"},
+            },
+            {"agent_id": 3, "agent_name": "core-1", "agent_tags": [""]},
+            {"agent_id": 1, "agent_name": "edge-1", "agent_tags": []},
+        ],
+        api_keys=["key"],
+    )
+    return completion_index
+
+
+def test_update_index(index):
+    completion.update_index(
+        endpoints=[{"agent_id": 4, "agent_name": "new"}], providers=["GCP"]
+    )
+    data = completion.load_index()
+    assert data == {
+        "endpoints": {"12": "edge-2", "3": "core-1", "1": "edge-1", "4": "new"},
+        "tags": ["edge"],
+        "providers": ["AWS", "GCP"],
+        "api_keys": ["key"],
+    }
+    completion.update_index(
+        endpoints=[{"agent_id": 4, "agent_name": "new"}],
+        providers=["IBM"],
+        replace=True,
+    )
+    data = completion.load_index()
+    assert data["endpoints"] == {"4": "new"}
+    assert data["tags"] == []
+    assert data["providers"] == ["IBM"]
+
+
+def _add_api_keys(start):
+    for i in range(start, start + 10):
+        completion.update_index(api_keys=[f"key-{i}"])
+
+
+@pytest.mark.skipif(completion.fcntl is None, reason="requires fcntl")
+def test_update_index__concurrent(completion_index):
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_add_api_keys, args=(i * 10,)) for i in range(4)
+    ]
+    threads = [
+        threading.Thread(target=_add_api_keys, args=(i * 10,)) for i in range(4, 8)
+    ]
+    for worker in processes + threads:
+        worker.start()
+    for worker in processes + threads:
+        worker.join()
+    assert completion.load_index()["api_keys"] == sorted(f"key-{i}" for i in range(80))
+
+
+def test_load_index__invalid(completion_index):
+    completion_index.write_text("not json")
+    assert completion.load_index()["endpoints"] == {}
+
+
+def test_candidates(index):
+    assert [
+        (item.value, item.help)
+        for item in completion.candidates(completion.ENDPOINT_IDS, "")
+    ] == [("1", "edge-1"), ("3", "core-1"), ("12", "edge-2")]
+    assert [
+        item.value for item in completion.candidates(completion.ENDPOINT_NAMES, "ed")
+    ] == ["edge-1", "edge-2"]
+    assert [item.value for item in completion.candidates(completion.TAGS, "")] == [
+        "edge"
+    ]
+
+
+@pytest.mark.parametrize(
+    "args, incomplete, kind",
+    [
+        [["get-endpoints", "--name"], "", completion.ENDPOINT_NAMES],
+        [["get-connections", "--id"], "1", completion.ENDPOINT_IDS],
+        [["configure-endpoints"], "", completion.ENDPOINT_IDS],
+        [["configure-endpoints", "-n"], "e", completion.ENDPOINT_NAMES],
+        [["configure-endpoints", "-T"], "", completion.TAGS],
+        [["configure-endpoints", "--set-provider"], "", completion.PROVIDERS],
+        [
+            ["create-connections", "--use-names", "edge-1"],
+            "",
+            completion.ENDPOINT_NAMES,
+        ],
+        [["delete-api-key", "--name"], "", completion.API_KEYS],
+        [["configure-endpoints", "--json"], "", None],
+        [["configure-endpoints"], "--", None],
+        [["get-endpoints"], "", None],
+        [[], "get", None],
+        [["unknown", "--name"], "", None],
+    ],
+)
+def test_completion_kind(args, incomplete, kind):
+    assert completion.completion_kind(args, incomplete) == kind
+
+
+def test_complete(index, capsys):
+    env = {
+        completion.COMPLETE_VAR: "bash_complete",
+        "COMP_WORDS": "syntropyctl configure-endpoints --name ed",
+        "COMP_CWORD": "3",
+    }
+    with mock.patch.dict(os.environ, env):
+        assert completion.complete()
+    assert capsys.readouterr().out.splitlines() == ["plain,edge-1", "plain,edge-2"]
+
+
+@pytest.mark.parametrize(
+    "env",
+    [
+        {},
+        {completion.COMPLETE_VAR: "bash_source"},
+        {
+            completion.COMPLETE_VAR: "zsh_complete",
+            "COMP_WORDS": "syntropyctl get-",
+            "COMP_CWORD": "1",
+        },
+    ],
+)
+def test_complete__needs_commands(env):
+    with mock.patch.dict(os.environ, env):
+        assert not completion.complete()
+
+
+def test_complete__does_not_import_sdk(index):
+    code = (
+        "import sys; from syntropycli import completion; "
+        "assert completion.complete(); assert 'syntropy_sdk' not in sys.modules"
+    )
+    env = {
+        **os.environ,
+        completion.COMPLETE_VAR: "zsh_complete",
+        "COMP_WORDS": "syntropyctl get-endpoints --tag ''",
+        "COMP_CWORD": "3",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["plain", "edge", "_"]
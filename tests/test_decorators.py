@@ -14,3 +14,123 @@ def test_syntropy_api(env_mock, login_mock):
     assert decorated("arg", kw="kwarg") == "ret"
     func.assert_called_once_with("arg", kw="kwarg", api=mock.ANY)
     assert login_mock.call_count == 0
+
+
+def test_syntropy_api__scheduler(env_mock, login_mock):
+    func = mock.Mock(return_value="ret")
+    with mock.patch.dict(
+        decorators.os.environ,
+        {"SYNTROPY_API_MAX_RETRIES": "2", "SYNTROPY_API_RATE_LIMIT": "5"},
+    ), mock.patch.object(
+        decorators, "RequestScheduler", autospec=True
+    ) as scheduler_mock:
+        syntropy_api(func)()
+        scheduler_mock.assert_called_once_with(max_retries=2, rate=5.0)
+        scheduler_mock.return_value.install.assert_called_once_with(
+            func.call_args[1]["api"]
+        )
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("SYNTROPY_API_MAX_RETRIES", "three"),
+        ("SYNTROPY_API_MAX_RETRIES", "1.5"),
+        ("SYNTROPY_API_MAX_RETRIES", "-1"),
+        ("SYNTROPY_API_RATE_LIMIT", "fast"),
+        ("SYNTROPY_API_RATE_LIMIT", "nan"),
+    ],
+)
+def test_syntropy_api__invalid_env(env_mock, login_mock, capsys, name, value):
+    func = mock.Mock(return_value="ret")
+    with mock.patch.dict(decorators.os.environ, {name: value}):
+        with pytest.raises(SystemExit):
+            syntropy_api(func)()
+    assert f"Invalid {name}={value!r}" in capsys.readouterr().err
+    assert func.call_count == 0
+
+
+def test_load_profiles(tmp_path):
+    path = tmp_path / "profiles.ini"
+    path.write_text("[b]\nserver = https://b\ntoken = t%b\n[a]\nserver = https://a\n")
+    assert load_profiles(str(path)) == {
+        "b": {"server": "https://b", "token": "t%b"},
+        "a": {"server": "https://a", "token": None},
+    }
+    assert load_profiles(str(tmp_path / "missing.ini")) == {}
+
+
+def test_syntropy_api__profile(env_mock, login_mock):
+    func = mock.Mock(return_value="ret")
+    decorators._current.profile = {"server": "https://eu", "token": "eu-token"}
+    try:
+        syntropy_api(func)()
+    finally:
+        decorators._current.profile = None
+    config = func.call_args[1]["api"].configuration
+    assert config.host == "https://eu"
+    assert config.api_key["api-key"] == "eu-token"
+
+
+def test_syntropy_api__timings(env_mock, login_mock):
+    timings = start_timings()
+    try:
+        api = create_api("https://server", "token")
+    finally:
+        decorators._timings = None
+    assert len(timings.stats) == 1
+    assert timings.stats[0].count == 0
+    assert timings.setup >= 0
+
+
+def test_timings_report(capsys):
+    timings = Timings()
+    api = mock.Mock()
+    api.call_api.return_value = "ret"
+    timings.track(api, 0.5)
+    assert api.call_api() == "ret"
+    assert api.call_api() == "ret"
+    timings.report()
+    err = capsys.readouterr().err
+    assert "Client setup: 0.500s (1 clients)" in err
+    assert "Authentication: 0 login round trips" in err
+    assert "Requests: 2 sent" in err
+    assert "First request:" in err
+
+
+def test_create_api__request_stats_exclude_cache_hits(env_mock):
+    with mock.patch.object(
+        sdk.ApiClient, "call_api", autospec=True, return_value={"data": []}
+    ):
+        api = create_api("https://server", "token")
+        api.call_api("/v1/network/agents", "GET")
+        api.call_api("/v1/network/agents", "GET")
+    assert api.request_stats.count == 1
+
+
+def test_create_api__invalid_shared_cache(env_mock, tmp_path, capsys):
+    with mock.patch.dict(decorators.os.environ, {"SYNTROPY_CACHE_TTL": "soon"}):
+        with pytest.raises(SystemExit):
+            create_api("https://server", "token")
+    assert "Invalid SYNTROPY_CACHE_TTL='soon'" in capsys.readouterr().err
+    tmp_path.chmod(0o777)
+    with mock.patch.dict(
+        decorators.os.environ,
+        {"SYNTROPY_CACHE_TTL": "60", "SYNTROPY_CACHE_DIR": str(tmp_path)},
+    ):
+        with pytest.raises(SystemExit):
+            create_api("https://server", "token")
+    assert "is writable by other users" in capsys.readouterr().err
+
+
+def test_syntropy_api__missing_token(login_mock, capsys):
+    func = mock.Mock(return_value="ret")
+    with mock.patch.dict(
+        decorators.os.environ, {"SYNTROPY_API_SERVER": "https://x"}, clear=True
+    ):
+        with pytest.raises(SystemExit):
+            syntropy_api(func)()
+    assert "SYNTROPY_API_TOKEN environment variable is missing." in (
+        capsys.readouterr().err
+    )
+    assert func.call_count == 0
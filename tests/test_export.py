@@ -0,0 +1,124 @@
+import array
+import os
+import struct
+
+import pytest
+
+from syntropycli import export
+from syntropycli.export import *
+
+
+def read_npy(path):
+    dtype, shape = read_npy_header(path)
+    with open(path, "rb") as f:
+        f.seek(8)
+        (length,) = struct.unpack("<H", f.read(2))
+        assert (10 + length) % 64 == 0
+        f.seek(10 + length)
+        data = f.read()
+    if dtype.startswith("<U"):
+        size = int(dtype[2:]) * 4
+        return dtype, [
+            data[i : i + size].decode("utf-32-le").rstrip("\0")
+            for i in range(0, len(data), size)
+        ]
+    if dtype == "|u1":
+        assert len(data) == shape[0]
+        return dtype, data
+    values = array.array({"<f8": "d", "<i8": "q", "|b1": "b"}[dtype], data).tolist()
+    assert len(values) == shape[0]
+    return dtype, [bool(x) for x in values] if dtype == "|b1" else values
+
+
+def test_flatten_record():
+    assert flatten_record(
+        {
+            "agent_id": 1,
+            "agent_1": {"agent_name": "a", "agent_provider": {"agent_provider_id": 2}},
+            "agent_tags": [
+                {"agent_tag_id": 1, "agent_tag_name": "x"},
+                {"agent_tag_name": "y"},
+            ],
+            "ports": [80, 443],
+            "subnets": [{"agent_service_subnet_id": 1}],
+        }
+    ) == {
+        "agent_id": 1,
+        "agent_1.agent_name": "a",
+        "agent_1.agent_provider.agent_provider_id": 2,
+        "agent_tags": "x, y",
+        "ports": "80, 443",
+        "subnets": '[{"agent_service_subnet_id":1}]',
+    }
+
+
+def test_exporter__npy(tmp_path):
+    with Exporter(str(tmp_path), NPY) as exporter:
+        exporter.append("connections", [{"id": 1, "agent_1": {"agent_name": "a"}}])
+        exporter.append(
+            "connections",
+            [
+                {"id": 2, "agent_1": {"agent_name": "long name"}, "latency": 1.5},
+                {"id": 3, "online": True, "mixed": 1},
+                {"id": 4, "online": False, "mixed": "text"},
+            ],
+        )
+    assert exporter.paths == {"connections": str(tmp_path / "connections")}
+    assert sorted(os.listdir(tmp_path)) == ["connections"]
+    directory = tmp_path / "connections"
+    assert read_npy(directory / "id.npy") == ("<i8", [1, 2, 3, 4])
+    assert read_npy(directory / "agent_1.agent_name.npy") == (
+        "<U9",
+        ["a", "long name", "", ""],
+    )
+    dtype, latency = read_npy(directory / "latency.npy")
+    assert dtype == "<f8"
+    assert latency[1] == 1.5 and latency[0] != latency[0]
+    assert read_npy(directory / "online.npy")[0] == "<f8"
+    assert read_npy(directory / "mixed.npy") == ("<U4", ["", "", "1", "text"])
+
+
+def test_exporter__variable_width_strings(tmp_path):
+    tags = [{"agent_tag_name": f"tag-{i}"} for i in range(50)]
+    records = [{"id": 1, "agent_tags": tags, "status": "CONNECTED"}] + [
+        {"id": i, "agent_tags": [{"agent_tag_name": "ü"}], "status": "OFFLINE"}
+        for i in range(2, 101)
+    ]
+    records.append({"id": 101})
+    with Exporter(str(tmp_path), NPY) as exporter:
+        exporter.append("agents", records)
+    directory = tmp_path / "agents"
+    assert sorted(os.listdir(directory)) == [
+        "agent_tags.npy",
+        "agent_tags.offsets.npy",
+        "id.npy",
+        "status.npy",
+    ]
+    assert read_npy(directory / "status.npy")[0] == "<U9"
+    dtype, offsets = read_npy(directory / "agent_tags.offsets.npy")
+    assert dtype == "<i8" and len(offsets) == 102
+    dtype, data = read_npy(directory / "agent_tags.npy")
+    assert dtype == "|u1"
+    column = StringColumn(data, offsets)
+    assert len(column) == 101
+    assert column[0] == ", ".join(f"tag-{i}" for i in range(50))
+    assert column[1:3] == ["ü", "ü"]
+    assert column[-1] == ""
+    # The fixed width layout would take 101 values * 449 characters * 4 bytes.
+    assert os.path.getsize(directory / "agent_tags.npy") < 1000
+
+
+def test_exporter__bool(tmp_path):
+    with Exporter(str(tmp_path), NPY) as exporter:
+        exporter.append(
+            "agents", [{"agent_is_online": True}, {"agent_is_online": False}]
+        )
+    path = tmp_path / "agents" / "agent_is_online.npy"
+    assert read_npy(path) == ("|b1", [True, False])
+
+
+def test_exporter__requires_pyarrow(tmp_path):
+    if export.pyarrow is not None:
+        pytest.skip("pyarrow is installed")
+    with pytest.raises(RuntimeError):
+        Exporter(str(tmp_path), ARROW)
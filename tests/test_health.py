@@ -0,0 +1,67 @@
+from syntropycli.health import *
+
+
+def connection(a, b, status, latency=None, loss=None):
+    return {
+        "agent_1": {"agent_id": a},
+        "agent_2": {"agent_id": b},
+        "agent_connection_group_status": status,
+        "agent_connection_latency_ms": latency,
+        "agent_connection_packet_loss": loss,
+    }
+
+
+def test_aggregate_health():
+    pages = [
+        [connection(1, 2, "CONNECTED", 10, 0), connection(1, 3, "ERROR", 30, 0.5)],
+        [connection(1, 4, "WARNING"), connection(2, 3, "ERROR", 20, 1)],
+    ]
+    health = aggregate_health(iter(pages))
+    assert health.keys() == {1, 2, 3, 4}
+    assert health[1].connections == 3
+    assert health[1].degraded == {"ERROR": 1, "WARNING": 1}
+    assert health[1].mean_latency == 20
+    assert health[1].latency_max == 30
+    assert health[1].mean_loss == 0.25
+    assert health[1].score == 50
+    assert health[3].score == 0
+    assert health[3].loss_max == 1
+
+
+def test_health_report():
+    health = aggregate_health(
+        [
+            [
+                connection(1, 2, "CONNECTED"),
+                connection(1, 3, "ERROR", 5, 0.1),
+                connection(4, 3, "ERROR", 50, 0.1),
+            ]
+        ]
+    )
+    agents = [
+        {
+            "agent_id": 1,
+            "agent_name": "one",
+            "agent_provider": {"agent_provider_name": "AWS"},
+            "agent_location_city": "Vilnius",
+            "agent_tags": [{"agent_tag_name": "prod"}, None],
+        },
+        {"agent_id": 5, "agent_name": "idle", "agent_provider": None},
+    ]
+    rows = health_report(health, agents)
+    assert [row["agent_id"] for row in rows] == [3, 4, 1, 2, 5]
+    assert rows[2] == {
+        "agent_id": 1,
+        "agent_name": "one",
+        "agent_provider_name": "AWS",
+        "agent_location_city": "Vilnius",
+        "agent_tags": ["prod"],
+        "connections": 2,
+        "degraded": {"ERROR": 1},
+        "mean_latency_ms": 5.0,
+        "max_latency_ms": 5,
+        "mean_loss": 0.1,
+        "max_loss": 0.1,
+        "score": 50,
+    }
+    assert rows[-1]["score"] is None
@@ -0,0 +1,92 @@
+import io
+from unittest import mock
+
+from urllib3.response import HTTPResponse
+
+from syntropycli import progress as progress_module
+from syntropycli.progress import Progress
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTY(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_progress__tty():
+    clock = Clock()
+    stream = TTY()
+    progress = Progress(
+        "Updating", total=10, unit="endpoints", stream=stream, clock=clock
+    )
+    clock.now = 2.0
+    with progress.request():
+        clock.now = 4.0
+        progress.advance(4)
+    assert stream.getvalue() == (
+        "\r\033[KUpdating: 0/10 endpoints, 1 in flight, 0.0 endpoints/s"
+        "\r\033[KUpdating: 4/10 endpoints, 1 in flight, 1.0 endpoints/s, ETA 6s"
+    )
+    progress.close()
+    assert stream.getvalue().endswith("0 in flight, 1.0 endpoints/s, ETA 6s\n")
+
+
+def test_progress__structured_lines():
+    clock = Clock()
+    stream = io.StringIO()
+    with Progress("Creating connections", stream=stream, clock=clock) as progress:
+        progress.advance(10)
+        assert stream.getvalue() == ""
+        clock.now = 10.0
+        progress.advance(10)
+    assert stream.getvalue().splitlines() == [
+        "progress=creating_connections done=20 in_flight=0 requests=0 rate=2.0 elapsed=10.0",
+        "progress=creating_connections done=20 in_flight=0 requests=0 rate=2.0 elapsed=10.0",
+    ]
+
+
+def test_progress__short_run_is_silent():
+    stream = io.StringIO()
+    with Progress("Updating", total=1, stream=stream) as progress:
+        progress.advance()
+    assert stream.getvalue() == ""
+
+
+def test_progress__disabled():
+    clock = Clock()
+    stream = TTY()
+    with mock.patch.dict("os.environ", {progress_module.PROGRESS_ENV: "0"}):
+        progress = Progress("Updating", stream=stream, clock=clock)
+    clock.now = 1.0
+    progress.advance()
+    progress.close()
+    assert stream.getvalue() == ""
+
+
+def test_progress__wrap():
+    progress = Progress("Retrieving", stream=io.StringIO())
+    func = mock.Mock(return_value={"data": [1, 2, 3]})
+    assert progress.wrap(func)(1, skip=0) == {"data": [1, 2, 3]}
+    func.assert_called_once_with(1, skip=0)
+    assert (progress.done, progress.requests, progress.in_flight) == (3, 1, 0)
+
+    wrapped = progress.wrap(func, progress_module.count_filter)
+    wrapped(filter="1,2")
+    assert progress.done == 5
+
+
+def test_count_data__does_not_parse():
+    response = mock.Mock(spec=HTTPResponse)
+    assert progress_module.count_data((), {}, response) == 0
+    assert progress_module.count_data((), {}, {"data": [1, 2]}) == 2
+    assert progress_module.count_data((), {}, {"data": None}) == 0
+    model = mock.Mock(spec=["data", "to_dict"], data=[1])
+    assert progress_module.count_data((), {}, model) == 1
+    assert model.to_dict.call_count == 0
@@ -0,0 +1,49 @@
+import copy
+import json
+
+import pytest
+
+from syntropycli import records
+
+
+def test_compact():
+    data = [
+        {
+            "agent_id": 1,
+            "agent_provider": {"agent_provider_name": "AWS"},
+            "agent_tags": [{"agent_tag_name": "tag"}],
+        },
+        {"agent_id": 2, "agent_provider": None, "agent_tags": []},
+    ]
+    result = records.compact(copy.deepcopy(data))
+    assert result == data
+    assert isinstance(result[0], records.Record)
+    assert isinstance(result[0]["agent_provider"], records.Record)
+    assert type(result[0]) is type(result[1])
+    assert not hasattr(result[0], "__dict__")
+    assert result[0].get("missing") is None
+    with pytest.raises(KeyError):
+        result[0]["missing"]
+    assert records.to_builtin(result) == data
+    assert json.dumps(records.to_builtin(result)) == json.dumps(data)
+
+
+def test_compact__interned():
+    a, b = records.compact(
+        [{"agent_location_city": "".join(["Vil", "nius"])} for _ in range(2)]
+    )
+    assert a["agent_location_city"] is b["agent_location_city"]
+
+
+def test_compact__invalid_keys():
+    assert records.compact({"not valid": 1, "items": 2}) == {"not valid": 1, "items": 2}
+    assert isinstance(records.compact({"not valid": 1}), dict)
+
+
+def test_record__set_item():
+    record = records.compact({"agent_id": 1})
+    record["agent_id"] = 2
+    record["agent_services"] = ["a"]
+    assert dict(record) == {"agent_id": 2, "agent_services": ["a"]}
+    assert len(record) == 2
+    assert copy.deepcopy(record) == record
@@ -0,0 +1,140 @@
+from unittest import mock
+
+import pytest
+import urllib3
+from syntropy_sdk.rest import ApiException
+
+from syntropycli import scheduler
+
+
+def api_error(status, headers=None):
+    err = ApiException(status=status, reason="reason")
+    err.headers = headers
+    return err
+
+
+def test_token_bucket():
+    bucket = scheduler.TokenBucket(rate=1000, capacity=2)
+    for _ in range(5):
+        bucket.acquire()
+    assert bucket.tokens < 1
+
+
+def test_token_bucket__unlimited():
+    bucket = scheduler.TokenBucket()
+    for _ in range(100):
+        bucket.acquire()
+
+
+def test_token_bucket__block():
+    bucket = scheduler.TokenBucket()
+    with mock.patch("syntropycli.scheduler.time.sleep") as sleep_mock:
+        bucket.block(60)
+        sleep_mock.side_effect = lambda _: bucket.block(-60) or setattr(
+            bucket, "blocked_until", 0
+        )
+        bucket.acquire()
+        assert sleep_mock.call_args[0][0] > 59
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        [None, None],
+        [{"Retry-After": "3"}, 3],
+        [{"retry-after": "1.5"}, 1.5],
+        [{"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0],
+        [{"Retry-After": "invalid"}, None],
+    ],
+)
+def test_retry_after(headers, expected):
+    assert scheduler.retry_after(api_error(429, headers)) == expected
+
+
+def test_request_scheduler__retries():
+    sleep = mock.Mock()
+    func = mock.Mock(
+        side_effect=[
+            api_error(429, {"Retry-After": "0.05"}),
+            api_error(503),
+            urllib3.exceptions.ReadTimeoutError(None, "url", "timeout"),
+            "result",
+        ]
+    )
+    result = scheduler.RequestScheduler(sleep=sleep).call(func, "a", b="c")
+    assert result == "result"
+    assert func.call_count == 4
+    assert sleep.call_count == 3
+    assert sleep.call_args_list[0][0][0] >= 0.05
+
+
+def test_request_scheduler__not_retriable():
+    sleep = mock.Mock()
+    func = mock.Mock(side_effect=api_error(404))
+    with pytest.raises(ApiException):
+        scheduler.RequestScheduler(sleep=sleep).call(func)
+    assert func.call_count == 1
+    assert sleep.call_count == 0
+
+
+def test_request_scheduler__exhausted():
+    sleep = mock.Mock()
+    func = mock.Mock(side_effect=api_error(500))
+    with pytest.raises(ApiException):
+        scheduler.RequestScheduler(max_retries=2, sleep=sleep).call(func)
+    assert func.call_count == 3
+    assert sleep.call_count == 2
+
+
+def test_request_scheduler__install():
+    api = mock.Mock()
+    api.call_api.side_effect = [api_error(502), "result"]
+    scheduler.RequestScheduler(sleep=mock.Mock()).install(api)
+    assert api.call_api("/path", "GET") == "result"
+
+
+@pytest.mark.parametrize(
+    "error, retried",
+    [
+        (api_error(429), True),
+        (api_error(503), False),
+        (urllib3.exceptions.ReadTimeoutError(None, "url", "timeout"), False),
+        (urllib3.exceptions.ConnectTimeoutError(), True),
+        (
+            urllib3.exceptions.MaxRetryError(
+                None, "url", urllib3.exceptions.NewConnectionError(None, "refused")
+            ),
+            True,
+        ),
+    ],
+)
+def test_request_scheduler__not_idempotent(error, retried):
+    api = mock.Mock()
+    call_api = api.call_api
+    call_api.side_effect = [error, "result"]
+    scheduler.RequestScheduler(sleep=mock.Mock()).install(api)
+    if retried:
+        assert api.call_api("/v1/network/auth/api-keys", "POST") == "result"
+    else:
+        with pytest.raises(type(error)):
+            api.call_api("/v1/network/auth/api-keys", "POST")
+        assert call_api.call_count == 1
+
+
+def test_request_scheduler__search_is_idempotent():
+    api = mock.Mock()
+    api.call_api.side_effect = [api_error(503), "result"]
+    scheduler.RequestScheduler(sleep=mock.Mock()).install(api)
+    assert api.call_api("/v1/network/agents/search", "POST", body={}) == "result"
+
+
+def test_attempt():
+    assert scheduler.attempt(lambda x: x, 1) == (1, None)
+    err = api_error(400)
+    assert scheduler.attempt(mock.Mock(side_effect=err)) == (None, err)
+    with pytest.raises(ValueError):
+        scheduler.attempt(mock.Mock(side_effect=ValueError))
+
+
+def test_describe_error():
+    assert scheduler.describe_error(api_error(400)) == "API error (400): reason"
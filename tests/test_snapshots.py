@@ -0,0 +1,110 @@
+import json
+
+from syntropycli.snapshots import *
+
+
+def endpoint(id, tags=("prod",), provider="AWS", enabled=True, **kwargs):
+    return {
+        "agent_id": id,
+        "agent_name": f"agent-{id}",
+        "agent_provider": {"agent_provider_name": provider},
+        "agent_tags": [{"agent_tag_id": 1, "agent_tag_name": tag} for tag in tags],
+        "agent_services": [
+            {
+                "agent_service_name": "nginx",
+                "agent_service_is_active": True,
+                "agent_service_subnets": [
+                    {
+                        "agent_service_subnet_is_active": True,
+                        "agent_service_subnet_is_user_enabled": enabled,
+                    }
+                ],
+            }
+        ],
+        **kwargs,
+    }
+
+
+def connection(id, status):
+    return {
+        "agent_connection_group_id": id,
+        "agent_1": {"agent_id": 1, "agent_name": "agent-1"},
+        "agent_2": {"agent_id": 2, "agent_name": "agent-2"},
+        "agent_connection_group_status": status,
+        "agent_connection_latency_ms": id * 10,
+    }
+
+
+def test_load_snapshot(tmp_path):
+    records = [endpoint(1), endpoint(2)]
+    path = tmp_path / "a.json"
+    path.write_text(json.dumps(records, indent=4))
+    assert load_snapshot(str(path)) == records
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+    assert load_snapshot(str(path)) == records
+    path.write_text(json.dumps({"data": records}))
+    assert load_snapshot(str(path)) == records
+
+
+def test_flatten():
+    assert flatten(endpoint(1, agent_modified_at="now")) == {
+        "agent_id": 1,
+        "agent_name": "agent-1",
+        "agent_provider.agent_provider_name": "AWS",
+        "agent_tags": ["prod"],
+        "agent_services.nginx": "enabled",
+    }
+
+
+def test_flatten__incomplete_tags():
+    record = {
+        "agent_id": 1,
+        "agent_tags": [None, {"agent_tag_name": "prod"}, {}, {"agent_tag_id": 2}],
+    }
+    assert flatten(record) == {"agent_id": 1, "agent_tags": ["prod"]}
+
+
+def test_diff_snapshots():
+    old = [
+        endpoint(1),
+        endpoint(2),
+        endpoint(3, agent_modified_at="yesterday"),
+        connection(10, "CONNECTED"),
+    ]
+    new = [
+        endpoint(1, tags=("prod", "eu"), provider="GCP"),
+        endpoint(3, agent_modified_at="today"),
+        endpoint(4, enabled=False),
+        {**connection(10, "ERROR"), "agent_connection_latency_ms": 1000},
+    ]
+    changes = diff_snapshots(old, new)
+    assert [(x["kind"], x["id"], x["change"]) for x in changes] == [
+        ("connection", 10, "modified"),
+        ("endpoint", 1, "modified"),
+        ("endpoint", 2, "removed"),
+        ("endpoint", 4, "added"),
+    ]
+    assert changes[0]["name"] == "agent-1 <-> agent-2"
+    assert changes[0]["fields"] == [
+        {"field": "agent_connection_group_status", "old": "CONNECTED", "new": "ERROR"}
+    ]
+    assert changes[1]["fields"] == [
+        {
+            "field": "agent_provider.agent_provider_name",
+            "old": "AWS",
+            "new": "GCP",
+        },
+        {"field": "agent_tags", "old": ["prod"], "new": ["eu", "prod"]},
+    ]
+    assert "fields" not in changes[2]
+
+
+def test_diff_snapshots__services_and_profiles():
+    old = [{**endpoint(1), "profile": "eu"}, {**endpoint(1), "profile": "us"}]
+    new = [{**endpoint(1, enabled=False), "profile": "eu"}, old[1]]
+    changes = diff_snapshots(old, new, ignored=())
+    assert len(changes) == 1
+    assert changes[0]["profile"] == "eu"
+    assert changes[0]["fields"] == [
+        {"field": "agent_services.nginx", "old": "enabled", "new": "disabled"}
+    ]
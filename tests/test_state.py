@@ -0,0 +1,161 @@
+import json
+from unittest import mock
+
+import pytest
+
+from syntropycli import state
+
+
+@pytest.fixture
+def agents():
+    return [
+        {
+            "agent_id": 1,
+            "agent_name": "a",
+            "agent_provider": {"agent_provider_name": "AWS"},
+            "agent_tags": [{"agent_tag_name": "abc"}],
+        },
+        {"agent_id": 2, "agent_name": "b", "agent_provider": None, "agent_tags": []},
+        {"agent_id": 3, "agent_name": "c"},
+    ]
+
+
+@pytest.fixture
+def services():
+    return {
+        1: [
+            {
+                "agent_id": 1,
+                "agent_service_name": "nginx",
+                "agent_service_subnets": [
+                    {
+                        "agent_service_subnet_id": 10,
+                        "agent_service_subnet_is_user_enabled": False,
+                    },
+                ],
+            },
+            {
+                "agent_id": 1,
+                "agent_service_name": "redis",
+                "agent_service_subnets": [
+                    {
+                        "agent_service_subnet_id": 11,
+                        "agent_service_subnet_is_user_enabled": True,
+                    },
+                ],
+            },
+        ]
+    }
+
+
+@pytest.fixture
+def connections():
+    return [
+        {
+            "agent_connection_group_id": 100,
+            "agent_1": {"agent_id": 2},
+            "agent_2": {"agent_id": 1},
+        },
+        {
+            "agent_connection_group_id": 101,
+            "agent_1": {"agent_id": 1},
+            "agent_2": {"agent_id": 3},
+        },
+    ]
+
+
+def test_load_state__json(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"endpoints": [{"name": "a"}]}))
+    assert state.load_state(str(path)) == {
+        "endpoints": [{"name": "a"}],
+        "connections": [],
+    }
+
+
+def test_load_state__yaml(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "state.yaml"
+    path.write_text("connections:\n  - [a, b]\n")
+    assert state.load_state(str(path)) == {
+        "endpoints": [],
+        "connections": [["a", "b"]],
+    }
+
+
+def test_load_state__yaml_not_installed(tmp_path, capsys):
+    path = tmp_path / "state.yml"
+    path.write_text("connections: []\n")
+    with mock.patch.object(state, "yaml", None):
+        with pytest.raises(SystemExit):
+            state.load_state(str(path))
+    assert "pip install syntropycli[yaml]" in capsys.readouterr().err
+
+
+def test_resolve_endpoint():
+    index = {"a": 1, "dup": None}
+    assert state.resolve_endpoint({"name": "a"}, index, {1}) == 1
+    assert state.resolve_endpoint({"id": 1}, index, {1}) == 1
+    assert state.resolve_endpoint("a", index, {1}) == 1
+    with pytest.raises(SystemExit):
+        state.resolve_endpoint("dup", index, {1})
+
+
+def test_plan_changes(agents, services, connections):
+    desired = {
+        "endpoints": [
+            {"name": "a", "provider": "AWS", "tags": ["abc"], "services": ["nginx"]},
+            {"id": 2, "provider": "GCP", "tags": ["def"]},
+            {"name": "c"},
+        ],
+        "connections": [["a", "b"], ["b", "c"], ["c", "b"]],
+    }
+    changes = state.plan_changes(desired, agents, services, connections, prune=True)
+    assert changes == {
+        "agents": {2: {"agent_provider_name": "GCP", "agent_tags": ["def"]}},
+        "subnets": [
+            {"agent_id": 1, "agent_service_subnet_id": 10, "is_enabled": True},
+            {"agent_id": 1, "agent_service_subnet_id": 11, "is_enabled": False},
+        ],
+        "create": [[2, 3]],
+        "delete": [101],
+    }
+
+
+def test_plan_changes__no_prune(agents, services, connections):
+    desired = {"endpoints": [{"name": "a"}, {"name": "c"}], "connections": []}
+    changes = state.plan_changes(desired, agents, services, connections)
+    assert changes == {"agents": {}, "subnets": [], "create": [], "delete": []}
+
+
+def test_make_plan():
+    changes = {
+        "agents": {1: {"agent_tags": []}, 2: {"agent_tags": []}},
+        "subnets": [
+            {"agent_id": 1, "agent_service_subnet_id": 1, "is_enabled": True},
+            {"agent_id": 3, "agent_service_subnet_id": 2, "is_enabled": True},
+            {"agent_id": 3, "agent_service_subnet_id": 3, "is_enabled": True},
+        ],
+        "create": [[1, 2]],
+        "delete": [],
+    }
+    plan = state.make_plan(changes, chunk_size=2, concurrency=2, latency=0.5)
+    assert plan["requests"] == 5
+    assert plan["endpoints"] == 3
+    assert plan["subnets"] == 3
+    assert plan["estimated_seconds"] == 1.5
+
+
+def test_save_load_plan(tmp_path):
+    changes = {
+        "agents": {1: {"agent_tags": ["abc"]}},
+        "subnets": [],
+        "create": [[1, 2]],
+        "delete": [3],
+    }
+    plan = state.make_plan(changes, chunk_size=2, concurrency=2, latency=0.5)
+    path = tmp_path / "plan.json"
+    with open(path, "w") as f:
+        state.save_plan(plan, f)
+    with open(path) as f:
+        assert state.load_plan(f) == plan
@@ -0,0 +1,74 @@
+import io
+import xml.etree.ElementTree as ET
+
+from syntropycli.topology import *
+
+
+def connection(a, b, status="CONNECTED"):
+    return {
+        "agent_1": {"agent_id": a, "agent_name": f"agent-{a}"},
+        "agent_2": {"agent_id": b, "agent_name": f"agent-{b}"},
+        "agent_connection_group_status": status,
+    }
+
+
+def make_graph():
+    # Triangle 1-2-3 bridged through 3-4 to a path 4-5, a separate pair 6-7 and isolated 8.
+    connections = [
+        connection(1, 2),
+        connection(2, 3),
+        connection(3, 1),
+        connection(3, 4, "OFFLINE"),
+        connection(4, 5),
+        connection(5, 4),
+        connection(6, 7),
+        connection(7, 7),
+    ]
+    agents = [{"agent_id": id, "agent_name": f"agent-{id}"} for id in range(1, 9)]
+    return Graph.from_connections(connections, agents)
+
+
+def test_graph_from_connections():
+    graph = make_graph()
+    assert graph.adjacency[4] == {3, 5}
+    assert graph.adjacency[7] == {6}
+    assert graph.adjacency[8] == set()
+    assert len(graph.edges) == 6
+    assert graph.names[8] == "agent-8"
+
+
+def test_graph_analysis():
+    graph = make_graph()
+    assert graph.components() == [[1, 2, 3, 4, 5], [6, 7], [8]]
+    assert graph.degrees() == {0: 1, 1: 3, 2: 3, 3: 1}
+    assert graph.isolated() == [8]
+    assert graph.articulation_points() == [3, 4]
+
+
+def test_graph_articulation_points__deep():
+    graph = Graph()
+    for id in range(20000):
+        graph.add_edge(id, id + 1)
+    graph.add_edge(20000, 0)
+    assert graph.articulation_points() == []
+    graph.add_edge(20000, 20001)
+    assert graph.articulation_points() == [20000]
+    assert len(graph.components()) == 1
+
+
+def test_graph_export():
+    graph = make_graph()
+    graph.names[1] = 'a "quoted" <name>'
+    dot = io.StringIO()
+    graph.write_dot(dot)
+    assert dot.getvalue().startswith("graph syntropy {\n")
+    assert '  1 [label="a \\"quoted\\" <name>"];\n' in dot.getvalue()
+    assert '  3 -- 4 [status="OFFLINE"];\n' in dot.getvalue()
+
+    graphml = io.StringIO()
+    graph.write_graphml(graphml)
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    root = ET.fromstring(graphml.getvalue().encode())
+    assert len(root.findall("g:graph/g:node", ns)) == 8
+    assert len(root.findall("g:graph/g:edge", ns)) == 6
+    assert root.find("g:graph/g:node/g:data", ns).text == 'a "quoted" <name>'
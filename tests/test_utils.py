@@ -8,6 +8,7 @@ import pytest
 import syntropy_sdk as sdk
 from click.testing import CliRunner
 from syntropy_sdk.rest import ApiException
+from urllib3.response import HTTPResponse
 
 from syntropycli import utils
 
@@ -272,6 +273,53 @@ def test_collect_connection_services():
     assert "b!" in utils.collect_connection_services(connection_services)
     assert "e~" in utils.collect_connection_services(connection_services)
     assert "f?" in utils.collect_connection_services(connection_services)
+    index = utils.service_subnet_index([connection_services])
+    assert index == {1: "a", 2: "b", 4: "d", 5: "e", 6: "f"}
+    assert utils.collect_connection_services(
+        connection_services, subnet_index=index
+    ) == utils.collect_connection_services(connection_services)
+
+
+def test_service_subnet_index__shared_agent():
+    def agent(*services):
+        return {
+            "agent_id": 1,
+            "agent_services": [
+                {
+                    "agent_service_name": name,
+                    "agent_service_subnets": [{"agent_service_subnet_id": id}],
+                }
+                for id, name in services
+            ],
+        }
+
+    def subnet(id):
+        return {
+            "agent_service_subnet_id": id,
+            "agent_connection_subnet_status": "OK",
+            "agent_connection_subnet_is_enabled": True,
+        }
+
+    # Both connections share agent 1, but only the second one lists service "b".
+    connections_services = [
+        {
+            "agent_1": agent((1, "a")),
+            "agent_2": {"agent_id": 2, "agent_services": []},
+            "agent_connection_subnets": [subnet(1)],
+        },
+        {
+            "agent_1": agent((1, "a"), (2, "b")),
+            "agent_2": None,
+            "agent_connection_subnets": [subnet(2)],
+        },
+    ]
+    index = utils.service_subnet_index(connections_services)
+    assert index == {1: "a"}
+    assert [
+        utils.collect_connection_services(services, subnet_index=index)
+        for services in connections_services
+    ] == ["a^", "b^"]
+    assert index == {1: "a", 2: "b"}
 
 
 @pytest.mark.parametrize(
@@ -304,3 +352,322 @@ def test_update_list(data, set_items, add_items, remove_items, clear_items, item
 def test_update_list__fail(data, set_items, add_items, remove_items, clear_items):
     with pytest.raises(SystemExit):
         utils.update_list(data, set_items, add_items, remove_items, clear_items)
+
+
+def test_index_by_name():
+    items = [
+        {"test_id": 1, "test_name": "name"},
+        {"test_id": 2, "test_name": "name1"},
+        {"test_id": 3, "test_name": "name1"},
+    ]
+    assert utils.index_by_name(items, "test") == {"name": 1, "name1": None}
+
+
+def test_read_pairs():
+    lines = ["1, 2", "", "# comment", "a,b"]
+    assert list(utils.read_pairs(lines)) == [(1, ("1", "2")), (4, ("a", "b"))]
+
+
+def test_read_pairs__invalid():
+    with pytest.raises(SystemExit):
+        list(utils.read_pairs(["1,2,3"]))
+
+
+def test_iter_chunks():
+    assert list(utils.iter_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(utils.iter_chunks([], 2)) == []
+
+
+def test_run_bounded():
+    results = dict(utils.run_bounded(lambda x: x * 2, iter(range(10)), 3))
+    assert results == {i: i * 2 for i in range(10)}
+
+
+def test_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint"
+    checkpoint = utils.Checkpoint(str(path))
+    checkpoint.mark([3, 1, 2, 7])
+    assert path.read_text() == "1-3,7-7\n"
+    checkpoint = utils.Checkpoint(str(path))
+    assert len(checkpoint) == 4
+    assert 2 in checkpoint
+    assert 4 not in checkpoint
+    checkpoint.remove()
+    assert not path.exists()
+    assert len(checkpoint) == 0
+
+
+def test_batched_filter():
+    func = mock.Mock(
+        side_effect=[{"data": [1, 2]}, ApiException(status=503)],
+    )
+    batched = utils.BatchedFilter(func, max_query_size=6)
+    with pytest.raises(ApiException):
+        batched(filter=[1, 2, 3, 4], take=1)
+    assert func.call_args_list == [
+        mock.call(filter="1,2", take=1),
+        mock.call(filter="3,4", take=1),
+    ]
+    func.side_effect = [{"data": [1]}, {"data": [3]}]
+    assert batched(filter=[1, 2, 3, 4]) == {"data": [1, 3]}
+    assert batched.filter_data == []
+
+
+def test_with_search_pagination():
+    func = mock.Mock(
+        side_effect=[{"data": [1, 2]}, {"data": [3, 4]}, {"data": [5]}],
+    )
+    request = mock.Mock(side_effect=lambda **kwargs: kwargs)
+    result = utils.WithSearchPagination(func, request, max_take=2)(filter="f")
+    assert result == {"data": [1, 2, 3, 4, 5]}
+    assert func.call_args_list == [
+        mock.call({"filter": "f", "skip": 0, "take": 2}, _preload_content=False),
+        mock.call({"filter": "f", "skip": 2, "take": 2}, _preload_content=False),
+        mock.call({"filter": "f", "skip": 4, "take": 2}, _preload_content=False),
+    ]
+
+
+def test_iter_pages():
+    func = mock.Mock(side_effect=[{"data": [1, 2]}, {"data": [3, 4]}, {"data": []}])
+    assert list(utils.iter_pages(func, max_take=2, filter="f")) == [[1, 2], [3, 4]]
+    assert func.call_args_list == [
+        mock.call(skip=0, take=2, filter="f"),
+        mock.call(skip=2, take=2, filter="f"),
+        mock.call(skip=4, take=2, filter="f"),
+    ]
+
+
+def test_iter_pages__take():
+    func = mock.Mock(side_effect=[{"data": [1, 2]}, {"data": [3]}])
+    assert list(utils.iter_pages(func, skip=1, take=3, max_take=2)) == [[1, 2], [3]]
+    assert func.call_args_list[1] == mock.call(skip=3, take=1)
+
+
+def test_with_search_pagination__take():
+    func = mock.Mock(side_effect=[{"data": [1, 2]}, {"data": [3]}])
+    request = mock.Mock(side_effect=lambda **kwargs: kwargs)
+    result = utils.WithSearchPagination(func, request, max_take=2)(skip=1, take=3)
+    assert result == {"data": [1, 2, 3]}
+    assert func.call_args_list[1] == mock.call(
+        {"filter": None, "skip": 3, "take": 1}, _preload_content=False
+    )
+
+
+def test_with_search_pagination__concurrency():
+    pages = {0: [1, 2], 2: [3, 4], 4: [5, 6], 6: [7]}
+    func = mock.Mock(
+        side_effect=lambda body, **kwargs: {"data": pages.get(body["skip"], [])}
+    )
+    request = mock.Mock(side_effect=lambda **kwargs: kwargs)
+    result = utils.WithSearchPagination(func, request, max_take=2, concurrency=3)()
+    assert result == {"data": [1, 2, 3, 4, 5, 6, 7]}
+    assert sorted(call.args[0]["skip"] for call in func.call_args_list) == [0, 2, 4, 6]
+
+
+@pytest.mark.parametrize("parser", [None, utils.orjson])
+def test_raw_records(parser):
+    body = b'{"data": [{"agent_id": 1, "agent_tags": [{"agent_tag_name": "a"}]}]}'
+    func = mock.Mock(
+        return_value=HTTPResponse(body=body, status=200, preload_content=False)
+    )
+    with mock.patch.object(utils, "orjson", parser):
+        result = utils.raw_records(func)(1, skip=0)
+    func.assert_called_once_with(1, skip=0, _preload_content=False)
+    assert result == {
+        "data": [{"agent_id": 1, "agent_tags": [{"agent_tag_name": "a"}]}]
+    }
+    assert isinstance(result["data"][0], utils.Record)
+
+
+def test_raw_records__models():
+    func = mock.Mock(
+        return_value=sdk.models.V1NetworkConnectionsGetResponse(
+            [{"agent_connection_group_id": 1}]
+        )
+    )
+    assert utils.raw_records(func)(_preload_content=True) == {
+        "data": [{"agent_connection_group_id": 1}]
+    }
+    func.assert_called_once_with(_preload_content=True)
+
+
+def test_raw_records__model():
+    body = b'{"data": [{"agent_tag_name": "a", "agent_tag_extra": 1}]}'
+    func = mock.Mock(
+        return_value=HTTPResponse(body=body, status=200, preload_content=False)
+    )
+    assert utils.raw_records(func, model=sdk.models.AgentTag)() == {
+        "data": [{"agent_tag_name": "a", "agent_tag_id": None}]
+    }
+
+
+def test_model_dict():
+    data = {
+        "agent_connection_group_id": 1,
+        "agent_connection_group_updated_at": "2021-10-11T20:20:21.000Z",
+        "agent_1": {"agent_id": 2},
+    }
+    result = utils.model_dict(data, sdk.models.V1Connection)
+    assert list(result) == list(sdk.models.V1Connection.swagger_types)
+    assert result["agent_connection_group_status_reason"] is None
+    assert result["agent_connection_group_updated_at"] == datetime.datetime(
+        2021, 10, 11, 20, 20, 21, tzinfo=datetime.timezone.utc
+    )
+    assert result["agent_1"]["agent_id"] == 2
+    assert result["agent_1"]["agent_name"] is None
+    assert result["agent_2"] is None
+
+
+def test_connection_pairs():
+    connections = [
+        {"agent_1": {"agent_id": 2}, "agent_2": {"agent_id": 1}},
+        {"agent_1": {"agent_id": 1}, "agent_2": {"agent_id": 2}},
+        {"agent_1": {"agent_id": 3}, "agent_2": {"agent_id": 4}},
+    ]
+    assert utils.connection_pairs(connections) == {(1, 2), (3, 4)}
+
+
+def test_mesh_pairs():
+    assert list(utils.mesh_pairs([3, 1, 2, 3], {(1, 2)})) == [(1, 3), (2, 3)]
+
+
+def test_star_pairs():
+    assert list(utils.star_pairs(2, [1, 2, 3], {(2, 3)})) == [(2, 1)]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ["90s", datetime.timedelta(seconds=90)],
+        ["1.5h", datetime.timedelta(minutes=90)],
+        ["7d", datetime.timedelta(days=7)],
+        ["2w", datetime.timedelta(days=14)],
+    ],
+)
+def test_parse_duration(value, expected):
+    assert utils.parse_duration(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "7", "d", "7y"])
+def test_parse_duration__invalid(value):
+    with pytest.raises(ValueError):
+        utils.parse_duration(value)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2021-10-13T08:53:30.000Z",
+        "2021-10-13T08:53:30Z",
+        "2021-10-13T10:53:30+02:00",
+        "2021-10-13T08:53:30",
+    ],
+)
+def test_parse_timestamp(value):
+    assert utils.parse_timestamp(value) == datetime.datetime(
+        2021, 10, 13, 8, 53, 30, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_connection_matcher():
+    def connection(status="ERROR", agent_ids=(1, 2), latency=None, updated_at=None):
+        return {
+            "agent_connection_group_status": status,
+            "agent_connection_group_updated_at": updated_at,
+            "agent_connection_latency_ms": latency,
+            "agent_1": {"agent_id": agent_ids[0]},
+            "agent_2": {"agent_id": agent_ids[1]},
+        }
+
+    match = utils.connection_matcher(
+        statuses=["ERROR"],
+        agent_ids=[2],
+        min_latency=10,
+        updated_before=datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc),
+    )
+    assert match(connection(latency=10, updated_at="2020-12-31T00:00:00Z"))
+    assert not match(connection(latency=10, updated_at="2021-01-02T00:00:00Z"))
+    assert not match(connection(updated_at="2020-12-31T00:00:00Z"))
+    assert not match(
+        connection(latency=10, agent_ids=(1, 3), updated_at="2020-12-31T00:00:00Z")
+    )
+    assert not match(
+        connection("CONNECTED", latency=10, updated_at="2020-12-31T00:00:00Z")
+    )
+    assert utils.connection_matcher()(connection())
+
+
+def service(name, subnets, is_active=True):
+    return {
+        "agent_service_name": name,
+        "agent_service_is_active": is_active,
+        "agent_service_subnets": [
+            {
+                "agent_service_subnet_is_active": True,
+                "agent_service_subnet_is_user_enabled": enabled,
+            }
+            for enabled in subnets
+        ],
+    }
+
+
+def test_service_state():
+    assert utils.service_state(service("a", [True, True])) == utils.SERVICE_ENABLED
+    assert utils.service_state(service("a", [True, False])) == utils.SERVICE_PARTIAL
+    assert utils.service_state(service("a", [False])) == utils.SERVICE_DISABLED
+    assert utils.service_state(service("a", [])) == utils.SERVICE_DISABLED
+
+
+def test_service_matrix():
+    counts, endpoints = utils.service_matrix(
+        {
+            1: [service("nginx", [True]), service("redis", [True, False], False)],
+            2: [service("nginx", [False]), service("nginx", [True])],
+            3: [],
+        }
+    )
+    assert endpoints == {"nginx": {1, 2}, "redis": {1}}
+    assert counts == {
+        ("nginx", "enabled"): 1,
+        ("nginx", "disabled"): 1,
+        ("redis", "partial"): 1,
+        ("redis", "inactive"): 1,
+    }
+
+
+def test_subnet_changes():
+    services = [
+        {
+            "agent_service_name": "a",
+            "agent_service_subnets": [
+                {
+                    "agent_service_subnet_id": 1,
+                    "agent_service_subnet_is_user_enabled": True,
+                },
+                {
+                    "agent_service_subnet_id": 2,
+                    "agent_service_subnet_is_user_enabled": False,
+                },
+            ],
+        },
+        {
+            "agent_service_name": "b",
+            "agent_service_subnets": [
+                {
+                    "agent_service_subnet_id": 3,
+                    "agent_service_subnet_is_user_enabled": True,
+                },
+            ],
+        },
+    ]
+    assert utils.subnet_changes(services, ["a"]) == [(2, True), (3, False)]
+
+
+def test_request_stats():
+    api = mock.Mock()
+    api.call_api.return_value = "result"
+    stats = utils.RequestStats(api)
+    assert stats.latency == utils.DEFAULT_REQUEST_LATENCY
+    assert api.call_api("a", b="c") == "result"
+    assert stats.count == 1
+    assert stats.latency < utils.DEFAULT_REQUEST_LATENCY
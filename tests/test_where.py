@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+
+import pytest
+from syntropy_sdk import models
+
+from syntropycli.where import *
+
+AGENT = {
+    "agent_id": 1,
+    "agent_name": "eu-1",
+    "agent_is_online": False,
+    "agent_location_city": "Vilnius",
+    "agent_provider": {"agent_provider_id": 2, "agent_provider_name": "AWS"},
+    "agent_tags": [{"agent_tag_id": 3, "agent_tag_name": "prod"}],
+    "agent_version": None,
+}
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ('agent_is_online == false and agent_location_city == "Vilnius"', True),
+        ("agent_is_online == true or agent_id > 1", False),
+        ("not (agent_id >= 2)", True),
+        ('agent_tags.agent_tag_name == "prod"', True),
+        ('agent_tags.agent_tag_name != "prod"', False),
+        ('agent_provider.agent_provider_name in ["GCP", "AWS"]', True),
+        ("agent_name =~ '^eu-'", True),
+        ("agent_version == null and agent_missing == null", True),
+        ('agent_id < "text"', False),
+        ("agent_id == 1.0", True),
+        ("agent_id == 1 and (agent_id == 2 or agent_id == 1)", True),
+    ],
+)
+def test_where_matches(expression, expected):
+    assert Where(expression).matches(AGENT) is expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "agent_id ==",
+        "agent_id = 1",
+        "agent_id == 1 and",
+        "(agent_id == 1",
+        "agent_id in [1,",
+        "agent_name =~ 1",
+        "agent_name =~ '('",
+        "agent_id == 1 $",
+    ],
+)
+def test_where_errors(expression):
+    with pytest.raises(WhereError):
+        Where(expression)
+
+
+def test_where_select():
+    where = Where("agent_id > 1")
+    pages = iter(
+        [
+            [{"agent_id": 1}, {"agent_id": 2}],
+            [{"agent_id": 3}, {"agent_id": 4}],
+            [{"agent_id": 5}],
+        ]
+    )
+    assert where.select(pages, skip=1, take=1) == [{"agent_id": 3}]
+    # Pages after the last needed match are not consumed.
+    assert next(pages) == [{"agent_id": 5}]
+    assert where.select([[{"agent_id": 2}, {"agent_id": 3}]]) == [
+        {"agent_id": 2},
+        {"agent_id": 3},
+    ]
+
+
+def test_where_agent_filter():
+    where = Where(
+        "agent_id in [1, 2, 3] and agent_id != 5 and agent_id in [2, 3]"
+        ' and agent_tags.agent_tag_name == "a" and agent_tags.agent_tag_name == "b"'
+        ' and agent_name == "eu" and agent_modified_at >= "2022-01-01T00:00:00"'
+        ' and (agent_location_country == "LT" or agent_id == 7)'
+    )
+    filters = where.agent_filter(models.V1AgentFilter(agent_provider_id=[4]))
+    assert filters.agent_id == [2, 3]
+    assert filters.agent_tag_name == ["a"]
+    assert filters.agent_name == "eu"
+    assert filters.agent_provider_id == [4]
+    assert filters.agent_modified_at_from == datetime(2022, 1, 1, tzinfo=timezone.utc)
+    assert filters.agent_location_country is None
+    assert has_criteria(filters)
+    assert not has_criteria(Where("agent_is_online == true").agent_filter())
+
+
+def test_where_agent_filter__enum():
+    assert Where('agent_type == "LINUX"').agent_filter().agent_type == ["LINUX"]
+    assert Where('agent_type == "linux"').agent_filter().agent_type is None
+    assert Where('agent_type in ["LINUX", "DEBIAN"]').agent_filter().agent_type is None
+
+
+def test_where_matches_nothing():
+    filters = Where("agent_id == 2").agent_filter(models.V1AgentFilter(agent_id=[1]))
+    assert filters.agent_id == []
+    assert matches_nothing(filters)
+    assert not matches_nothing(Where("agent_id == 1").agent_filter())
+    filters = Where(
+        "agent_connection_group_id == 1 and agent_connection_group_id == 2"
+    ).connection_filter()
+    assert matches_nothing(filters)
+
+
+def test_where_connection_filter():
+    filters = Where(
+        "agent_1.agent_id == 1 and agent_2.agent_id == 2"
+        ' and agent_connection_group_id in [5, 6] and agent_connection_group_status == "ERROR"'
+    ).connection_filter()
+    assert filters.agent_id == [1, 2]
+    assert filters.agent_connection_group_id == [5, 6]
+    assert not has_criteria(Where('agent_1.agent_id == "1"').connection_filter())